@@ -1,18 +1,46 @@
+import asyncio
+import hashlib
+import itertools
 import os
+import time
 from pathlib import Path
-from typing import TYPE_CHECKING, List, Optional, Type
+from types import ModuleType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
 
-from tortoise import Tortoise, generate_schema_for_client
+from tortoise import BaseDBAsyncClient, Tortoise, generate_schema_for_client, timezone
+from tortoise.backends.base.client import TransactionalDBClient
 from tortoise.exceptions import OperationalError
 from tortoise.transactions import in_transaction
 from tortoise.utils import get_schema_sql
 
-from aerich.exceptions import DowngradeError
+from aerich.capabilities import Capabilities
+from aerich.exceptions import DowngradeError, NotSupportError, SnapshotError, UpgradeError
+from aerich.inspectdb import TableIndex
 from aerich.inspectdb.mysql import InspectMySQL
 from aerich.inspectdb.postgres import InspectPostgres
+from aerich.inspectdb.snapshot import (
+    Difference,
+    diff_tables,
+    dump_tables,
+    get_describe_tables,
+    get_models_tables,
+    load_tables,
+)
 from aerich.inspectdb.sqlite import InspectSQLite
-from aerich.migrate import MIGRATE_TEMPLATE, Migrate
-from aerich.models import Aerich
+from aerich.migrate import MIGRATE_TEMPLATE, SQUASHED_SUFFIX, Migrate
+from aerich.models import Aerich, AerichCheckpoint
+from aerich.profiler import phase
 from aerich.utils import (
     get_app_connection,
     get_app_connection_name,
@@ -25,6 +53,11 @@ if TYPE_CHECKING:
 
 
 class Command:
+    #: seconds to wait before the first retry on lock timeout, doubled for each retry
+    lock_retry_delay = 0.1
+    #: length of the statements saved in the timings
+    timing_sql_length = 200
+
     def __init__(
         self,
         tortoise_config: dict,
@@ -34,24 +67,249 @@ class Command:
         self.tortoise_config = tortoise_config
         self.app = app
         self.location = location
+        #: {version file: seconds} of the migrations executed by upgrade/downgrade
+        self.durations: Dict[str, float] = {}
+        #: changes made to the aerich table of an older aerich by upgrade/downgrade
+        self.aerich_table_changes: List[str] = []
+        self._listeners: List[Callable[[dict], None]] = []
         Migrate.app = app
 
-    async def init(self) -> None:
-        await Migrate.init(self.tortoise_config, self.app, self.location)
+    async def init(self, offline: bool = False) -> None:
+        await Migrate.init(self.tortoise_config, self.app, self.location, offline)
+
+    @staticmethod
+    def _get_lock_options(
+        m: ModuleType, lock_timeout: Optional[int], lock_retries: int
+    ) -> Tuple[Optional[int], int]:
+        """
+        `LOCK_TIMEOUT` and `LOCK_RETRIES` of the migration file override the options
+        """
+        return getattr(m, "LOCK_TIMEOUT", lock_timeout), getattr(m, "LOCK_RETRIES", lock_retries)
+
+    async def _retry_on_lock_timeout(
+        self, retries: int, func: Callable[..., Awaitable[Any]], *args
+    ) -> Any:
+        """
+        Run again with exponential backoff when a statement fails waiting for locks
+        """
+        for attempt in itertools.count():
+            try:
+                return await func(*args)
+            except Exception as e:
+                if attempt >= retries or not Migrate.ddl.is_lock_timeout(e):
+                    raise
+                await asyncio.sleep(self.lock_retry_delay * 2**attempt)
+
+    @staticmethod
+    async def _create_checkpoint_table() -> None:
+        # the table is missing in the databases that initialized before it's added
+        conn = AerichCheckpoint._meta.db
+        schema = conn.schema_generator(conn)._get_table_sql(AerichCheckpoint, safe=True)
+        await conn.execute_script(schema["table_creation_string"])
 
-    async def _upgrade(self, conn, version_file, fake: bool = False) -> None:
-        file_path = Path(Migrate.migrate_location, version_file)
-        m = import_py_file(file_path)
+    def _emit(self, event: str, version_file: str, **kwargs: Any) -> None:
+        if self._listeners:
+            data = {"event": event, "version": version_file, **kwargs}
+            for listener in self._listeners:
+                listener(data)
+
+    async def _execute_statement(
+        self,
+        conn: BaseDBAsyncClient,
+        version_file: str,
+        seq: int,
+        statement: str,
+        lock_timeout: Optional[int],
+        script: bool = False,
+    ) -> dict:
+        """
+        :param script: the statement is a script of statements, its rows are not reported
+        :return: timing of the statement, rows is None if the client doesn't report it
+        """
+        timing_sql = statement.strip()[: self.timing_sql_length]
+        started_at = timezone.now().isoformat()
+        self._emit("statement_start", version_file, seq=seq, sql=timing_sql, start=started_at)
+        transactional = isinstance(conn, TransactionalDBClient)
+        if lock_timeout and (set_sql := Migrate.ddl.set_lock_timeout(lock_timeout, transactional)):
+            # on its own, a script of several statements runs in an implicit transaction
+            await conn.execute_script(set_sql)
+        rows = None
+        start = time.perf_counter()
+        with phase("execute"):
+            try:
+                if not script and Migrate.ddl.has_row_count(statement):
+                    rows, _ = await conn.execute_query(statement)
+                else:
+                    await conn.execute_script(statement)
+            finally:
+                if lock_timeout and (reset_sql := Migrate.ddl.reset_lock_timeout(transactional)):
+                    await conn.execute_script(reset_sql)
+        duration = time.perf_counter() - start
+        self._emit(
+            "statement_end",
+            version_file,
+            seq=seq,
+            sql=timing_sql,
+            start=started_at,
+            end=timezone.now().isoformat(),
+            duration=duration,
+            rows=rows,
+        )
+        return {"sql": timing_sql, "duration": duration, "rows": rows}
+
+    async def _execute_statements(
+        self,
+        conn: BaseDBAsyncClient,
+        version_file: str,
+        sql: str,
+        lock_timeout: Optional[int],
+        lock_retries: int,
+    ) -> List[dict]:
+        """
+        Execute the statements one by one and save a checkpoint after each, the next run skips
+        the statements that have been executed by the failed run
+        :return: timings of the statements executed by this run
+        """
+        await self._create_checkpoint_table()
+        statements = Migrate.ddl.split_statements(sql)
+        checkpoints = await AerichCheckpoint.filter(app=self.app, version=version_file)
+        for seq, checkpoint in enumerate(checkpoints):
+            if (
+                checkpoint.seq != seq
+                or seq >= len(statements)
+                or checkpoint.checksum != self._get_checksum(statements[seq])
+            ):
+                raise UpgradeError(
+                    f"Statement {seq + 1} of {version_file} has been changed after executed, "
+                    f"delete the rows of it from {AerichCheckpoint._meta.db_table} to run all again"
+                )
+        timings = []
+        for seq in range(len(checkpoints), len(statements)):
+            timing = await self._retry_on_lock_timeout(
+                lock_retries,
+                self._execute_statement,
+                conn,
+                version_file,
+                seq,
+                statements[seq],
+                lock_timeout,
+            )
+            timings.append(timing)
+            await AerichCheckpoint.create(
+                version=version_file,
+                app=self.app,
+                seq=seq,
+                checksum=self._get_checksum(statements[seq]),
+            )
+        return timings
+
+    async def _execute_script(
+        self,
+        conn: BaseDBAsyncClient,
+        version_file: str,
+        sql: str,
+        lock_timeout: Optional[int],
+    ) -> List[dict]:
+        """
+        Execute the statements one by one in the transaction of conn, or the whole script at once
+        if the DDL can't split it
+        :return: timings of the statements
+        """
+        try:
+            statements = Migrate.ddl.split_statements(sql)
+        except NotSupportError:
+            return [await self._execute_statement(conn, version_file, 0, sql, lock_timeout, True)]
+        return [
+            await self._execute_statement(conn, version_file, seq, statement, lock_timeout)
+            for seq, statement in enumerate(statements)
+        ]
+
+    @staticmethod
+    def _get_checksum(statement: str) -> str:
+        return hashlib.sha256(statement.encode()).hexdigest()
+
+    async def _upgrade(
+        self,
+        conn,
+        version_file,
+        m: ModuleType,
+        fake: bool = False,
+        lock_timeout: Optional[int] = None,
+        lock_retries: Optional[int] = None,
+    ) -> None:
+        """
+        :param conn:
+        :param version_file:
+        :param m: the imported version file
+        :param fake:
+        :param lock_timeout:
+        :param lock_retries: execute the statements one by one with checkpoints if not None,
+            and retry each statement that fails by lock timeout
+        :return:
+        """
         upgrade = m.upgrade
+        applied_at = timezone.now()
+        self._emit("file_start", version_file, start=applied_at.isoformat(), fake=fake)
+        duration = timings = None
         if not fake:
-            await conn.execute_script(await upgrade(conn))
+            start = time.perf_counter()
+            sql = await upgrade(conn)
+            if lock_retries is not None:
+                timings = await self._execute_statements(
+                    conn, version_file, sql, lock_timeout, lock_retries
+                )
+            else:
+                timings = await self._execute_script(conn, version_file, sql, lock_timeout)
+            duration = time.perf_counter() - start
+            self.durations[version_file] = duration
+        with phase("describe"):
+            content = get_models_describe(self.app)
         await Aerich.create(
             version=version_file,
             app=self.app,
-            content=get_models_describe(self.app),
+            content=content,
+            applied_at=applied_at,
+            duration=duration,
+            timings=timings,
+        )
+        if lock_retries is not None and not fake:
+            await AerichCheckpoint.filter(app=self.app, version=version_file).delete()
+        self._emit(
+            "file_end",
+            version_file,
+            start=applied_at.isoformat(),
+            end=timezone.now().isoformat(),
+            duration=duration,
+            fake=fake,
         )
 
-    async def upgrade(self, run_in_transaction: bool = True, fake: bool = False) -> List[str]:
+    async def _upgrade_in_transaction(
+        self, version_file, m: ModuleType, fake: bool, lock_timeout: Optional[int]
+    ) -> None:
+        app_conn_name = get_app_connection_name(self.tortoise_config, self.app)
+        async with in_transaction(app_conn_name) as conn:
+            await self._upgrade(conn, version_file, m, fake, lock_timeout)
+
+    async def upgrade(
+        self,
+        run_in_transaction: bool = True,
+        fake: bool = False,
+        lock_timeout: Optional[int] = None,
+        lock_retries: int = 3,
+    ) -> List[str]:
+        """
+        :param run_in_transaction: run each migration in a transaction, otherwise the statements
+            are executed one by one, and a rerun resumes from the failed statement
+        :param fake:
+        :param lock_timeout: milliseconds that each statement waits for locks, no limit if None
+        :param lock_retries: times to retry a migration that fails by the lock timeout, or retry
+            the failed statement when not in transaction. Only when the DDL can be rolled back
+            if in transaction.
+        :return: migrated version files
+        """
+        self.aerich_table_changes = await Migrate.migrate_aerich_table()
+        if fake:
+            return await self._fake_upgrade()
         migrated = []
         for version_file in Migrate.get_all_version_files():
             try:
@@ -59,18 +317,126 @@ class Command:
             except OperationalError:
                 exists = False
             if not exists:
-                app_conn_name = get_app_connection_name(self.tortoise_config, self.app)
-                if run_in_transaction:
-                    async with in_transaction(app_conn_name) as conn:
-                        await self._upgrade(conn, version_file, fake=fake)
-                else:
+                m = import_py_file(Path(Migrate.migrate_location, version_file))
+                if await self._record_squashed(version_file, m):
+                    continue
+                timeout, retries = self._get_lock_options(m, lock_timeout, lock_retries)
+                if not run_in_transaction:
                     app_conn = get_app_connection(self.tortoise_config, self.app)
-                    await self._upgrade(app_conn, version_file, fake=fake)
+                    await self._upgrade(app_conn, version_file, m, fake, timeout, retries)
+                else:
+                    if not Migrate.ddl.capabilities.transactional_ddl:
+                        # statements before the failed one have been committed
+                        retries = 0
+                    await self._retry_on_lock_timeout(
+                        retries, self._upgrade_in_transaction, version_file, m, fake, timeout
+                    )
                 migrated.append(version_file)
         return migrated
 
-    async def downgrade(self, version: int, delete: bool, fake: bool = False) -> List[str]:
+    async def _fake_upgrade(self) -> List[str]:
+        """
+        Record all the unapplied migrations as applied with one insert, the files are not
+        imported except the squashed ones, which may be recorded by renaming the versions they
+        squash
+        """
+        try:
+            applied = set(await Aerich.filter(app=self.app).values_list("version", flat=True))
+        except OperationalError:
+            applied = set()
+        migrated = []
+        for version_file in Migrate.get_all_version_files():
+            if version_file in applied:
+                continue
+            if version_file.endswith(SQUASHED_SUFFIX):
+                m = import_py_file(Path(Migrate.migrate_location, version_file))
+                if await self._record_squashed(version_file, m):
+                    continue
+            migrated.append(version_file)
+        if not migrated:
+            return migrated
+        with phase("describe"):
+            content = get_models_describe(self.app)
+        applied_at = timezone.now()
+        for version_file in migrated:
+            self._emit("file_start", version_file, start=applied_at.isoformat(), fake=True)
+        await Aerich.bulk_create(
+            [
+                Aerich(version=version_file, app=self.app, content=content, applied_at=applied_at)
+                for version_file in migrated
+            ]
+        )
+        end = timezone.now().isoformat()
+        for version_file in migrated:
+            self._emit(
+                "file_end",
+                version_file,
+                start=applied_at.isoformat(),
+                end=end,
+                duration=None,
+                fake=True,
+            )
+        return migrated
+
+    async def upgrade_events(
+        self,
+        run_in_transaction: bool = True,
+        fake: bool = False,
+        lock_timeout: Optional[int] = None,
+        lock_retries: int = 3,
+    ) -> AsyncIterator[dict]:
+        """
+        Upgrade like `upgrade`, and yield the events while it's running, e.g.::
+
+            {"event": "file_start", "version": "1_..._update.py", "start": ..., "fake": False}
+            {"event": "statement_start", "version": ..., "seq": 0, "sql": ..., "start": ...}
+            {"event": "statement_end", "version": ..., "seq": 0, "sql": ..., "start": ...,
+             "end": ..., "duration": 0.01, "rows": None}
+            {"event": "file_end", "version": ..., "start": ..., "end": ..., "duration": 0.01,
+             "fake": False}
+
+        The timestamps are in ISO 8601 and the durations are in seconds, the exception of the
+        upgrade is raised after the events before it.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        listener = queue.put_nowait
+        self._listeners.append(listener)
+        task = asyncio.ensure_future(
+            self.upgrade(run_in_transaction, fake, lock_timeout, lock_retries)
+        )
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+            await task
+        finally:
+            self._listeners.remove(listener)
+            task.cancel()
+
+    async def _downgrade_version(
+        self, version_obj: Aerich, m: ModuleType, fake: bool, lock_timeout: Optional[int]
+    ) -> None:
+        async with in_transaction(get_app_connection_name(self.tortoise_config, self.app)) as conn:
+            downgrade = m.downgrade
+            start = time.perf_counter()
+            downgrade_sql = await downgrade(conn)
+            if not downgrade_sql.strip():
+                raise DowngradeError("No downgrade items found")
+            if not fake:
+                await self._execute_script(conn, version_obj.version, downgrade_sql, lock_timeout)
+                self.durations[version_obj.version] = time.perf_counter() - start
+            await version_obj.delete()
+
+    async def downgrade(
+        self,
+        version: int,
+        delete: bool,
+        fake: bool = False,
+        lock_timeout: Optional[int] = None,
+        lock_retries: int = 3,
+    ) -> List[str]:
         ret: List[str] = []
+        self.aerich_table_changes = await Migrate.migrate_aerich_table()
         if version == -1:
             specified_version = await Migrate.get_last_version()
         else:
@@ -85,36 +451,179 @@ class Command:
             versions = await Aerich.filter(app=self.app, pk__gte=specified_version.pk)
         for version_obj in versions:
             file = version_obj.version
-            async with in_transaction(
-                get_app_connection_name(self.tortoise_config, self.app)
-            ) as conn:
-                file_path = Path(Migrate.migrate_location, file)
-                m = import_py_file(file_path)
-                downgrade = m.downgrade
-                downgrade_sql = await downgrade(conn)
-                if not downgrade_sql.strip():
-                    raise DowngradeError("No downgrade items found")
-                if not fake:
-                    await conn.execute_script(downgrade_sql)
-                await version_obj.delete()
-                if delete:
-                    os.unlink(file_path)
-                ret.append(file)
+            file_path = Path(Migrate.migrate_location, file)
+            m = import_py_file(file_path)
+            timeout, retries = self._get_lock_options(m, lock_timeout, lock_retries)
+            if not Migrate.ddl.capabilities.transactional_ddl:
+                retries = 0
+            await self._retry_on_lock_timeout(
+                retries, self._downgrade_version, version_obj, m, fake, timeout
+            )
+            if delete:
+                os.unlink(file_path)
+                Migrate.get_snapshot_file(file_path).unlink(missing_ok=True)
+            ret.append(file)
         return ret
 
+    async def _get_replaced_versions(self, version_file: str, m: ModuleType) -> List[Aerich]:
+        """
+        :return: the applied versions that are squashed into the file
+        """
+        if not (replaces := getattr(m, "REPLACES", None)):
+            return []
+        versions = await Aerich.filter(app=self.app, version__in=replaces).order_by("id")
+        applied = [v.version for v in versions]
+        # an applied squashed version stands for the versions before it, which it replaces
+        squashed = [
+            i for i, v in enumerate(replaces) if v in applied and v.endswith(SQUASHED_SUFFIX)
+        ]
+        required = replaces[squashed[-1] :] if squashed else replaces
+        if versions and not set(applied).issuperset(required):
+            raise UpgradeError(
+                f"{version_file} squashes {replaces}, but only {applied} of them are applied, "
+                f"upgrade with the squashed files first"
+            )
+        return versions
+
+    async def _record_squashed(self, version_file: str, m: ModuleType) -> bool:
+        """
+        Record the squashed file as applied if the versions it squashes are applied, the last of
+        them is renamed to it, so the order of the versions and the last describe are kept
+        :return: whether the file is recorded
+        """
+        if not (versions := await self._get_replaced_versions(version_file, m)):
+            return False
+        *squashed, last = versions
+        async with in_transaction(get_app_connection_name(self.tortoise_config, self.app)):
+            await Aerich.filter(pk__in=[v.pk for v in squashed]).delete()
+            last.version = version_file
+            await last.save(update_fields=["version"])
+        return True
+
+    async def squash(self, to: int) -> str:
+        return await Migrate.squash(to)
+
     async def heads(self) -> List[str]:
         ret = []
         versions = Migrate.get_all_version_files()
         for version in versions:
             if not await Aerich.exists(version=version, app=self.app):
-                ret.append(version)
+                m = import_py_file(Path(Migrate.migrate_location, version))
+                try:
+                    applied = bool(await self._get_replaced_versions(version, m))
+                except UpgradeError:
+                    applied = False
+                if not applied:
+                    ret.append(version)
         return ret
 
     async def history(self) -> List[str]:
         versions = Migrate.get_all_version_files()
         return [version for version in versions]
 
+    async def history_timings(self) -> List[Aerich]:
+        """
+        :return: the applied versions with their timings, in the order of applying
+        """
+        return await Aerich.filter(app=self.app).order_by("id")
+
     async def inspectdb(self, tables: Optional[List[str]] = None) -> str:
+        """
+        :param tables: tables to inspect, all the tables if None
+        """
+        return await self._get_inspect(tables).inspect()
+
+    async def inspectdb_models(
+        self, tables: Optional[List[str]] = None
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Like `inspectdb`, but yield (table, source of the model class) as soon as each table is
+        inspected
+        """
+        async for table, model in self._get_inspect(tables).inspect_models():
+            yield table, model
+
+    async def inspectdb_snapshot(self, tables: Optional[List[str]] = None) -> dict:
+        """
+        Like `inspectdb`, but return a snapshot of the catalog (see `aerich.inspectdb.snapshot`)
+        instead of the models
+        """
+        inspect = self._get_inspect(tables)
+        catalog = [table async for table in inspect.inspect_tables()]
+        return dump_tables(catalog, inspect.conn.schema_generator.DIALECT)
+
+    async def snapshot_diff(self, source: dict, target: Optional[dict] = None) -> List[str]:
+        """
+        Diff the snapshots of `inspectdb_snapshot` without connecting to the database
+        :param source: snapshot of a database
+        :param target: snapshot of another database, the models of the app if None, whose data
+            types are not compared
+        :return: the differences from the source to the target, see `diff_tables`
+        """
+        source_tables = load_tables(source)
+        if target is not None:
+            types = source.get("dialect") == target.get("dialect")
+            differences = diff_tables(source_tables, load_tables(target), types=types)
+        else:
+            if self.app not in Tortoise.apps:
+                Tortoise.init_models(self.tortoise_config["apps"][self.app]["models"], self.app)
+            differences = diff_tables(source_tables, get_models_tables(self.app), types=False)
+        return [str(difference) for difference in differences]
+
+    async def check(self) -> List[Difference]:
+        """
+        Compare the tables of the database with the describe of the last migration, to detect
+        the changes made by hand, e.g.: a dropped index
+        :return: the differences from the last migration to the database, - for the ones missing
+            in the database, + for the extra and ~ for the changed columns
+        """
+        if not (last_version := Migrate._last_version_content):
+            raise SnapshotError("No migration applied to compare the database with")
+        aerich_models = {f"{self.app}.{Aerich.__name__}", f"{self.app}.{AerichCheckpoint.__name__}"}
+        expected = get_describe_tables(
+            {name: describe for name, describe in last_version.items() if name not in aerich_models}
+        )
+        inspect = self._get_inspect([table.name for table in expected])
+        # the missing tables have no columns
+        actual = [table async for table in inspect.inspect_tables() if table.columns]
+        if isinstance(inspect, InspectMySQL):
+            # MySQL indexes the foreign key columns, unless an index starts with them already
+            actual_columns = {
+                (table.name, column.name): column for table in actual for column in table.columns
+            }
+            for table in expected:
+                foreign_keys = {foreign_key.column for foreign_key in table.foreign_keys}
+                for column in table.columns:
+                    if column.name in foreign_keys and (
+                        actual_column := actual_columns.get((table.name, column.name))
+                    ):
+                        column.index = column.index or actual_column.index
+        # the unique index of the through tables is created by init-db but not by the migrations
+        optional_indexes = {
+            (table.name, tuple(index.columns))
+            for table in expected
+            if not any(column.pk for column in table.columns)
+            for index in table.indexes
+        }
+        return [
+            difference
+            for difference in diff_tables(expected, actual, types=False)
+            if not (
+                difference.sign == "-"
+                and isinstance(difference.item, TableIndex)
+                and (difference.table, tuple(difference.item.columns)) in optional_indexes
+            )
+        ]
+
+    async def fix_drift(self, differences: List[Difference], name: str = "fix_drift") -> str:
+        """
+        Generate a migration that restores what the database lost since the last migration
+        :param differences: see `check`
+        :return: the version file, empty if there is nothing to restore
+        """
+        return await Migrate.fix_drift(differences, name)
+
+    def _get_inspect(self, tables: Optional[List[str]]) -> "Inspect":
         connection = get_app_connection(self.tortoise_config, self.app)
         dialect = connection.schema_generator.DIALECT
         if dialect == "mysql":
@@ -125,12 +634,39 @@ class Command:
             cls = InspectSQLite
         else:
             raise NotImplementedError(f"{dialect} is not supported")
-        inspect = cls(connection, tables)
-        return await inspect.inspect()
+        return cls(connection, tables, app=self.app)
 
     async def migrate(self, name: str = "update", empty: bool = False) -> str:
         return await Migrate.migrate(name, empty)
 
+    async def bootstrap_db(self, safe: bool) -> List[str]:
+        """
+        Create the tables from the models and mark the existing migrations as applied in one
+        insert, instead of running them one by one on a new database
+        :param safe: create tables only when they do not already exist
+        :return: migrations marked as applied
+        """
+        Migrate.migrate_location = Path(self.location, self.app)
+        version_files = Migrate.get_all_version_files()
+        if not version_files:
+            raise FileNotFoundError(str(Migrate.migrate_location))
+        with phase("Tortoise.init"):
+            await Tortoise.init(config=self.tortoise_config)
+        connection = get_app_connection(self.tortoise_config, self.app)
+        with phase("execute"):
+            await generate_schema_for_client(connection, safe)
+        applied = set(await Aerich.filter(app=self.app).values_list("version", flat=True))
+        with phase("describe"):
+            content = get_models_describe(self.app)
+        applied_at = timezone.now()
+        versions = [
+            Aerich(version=version, app=self.app, content=content, applied_at=applied_at)
+            for version in version_files
+            if version not in applied
+        ]
+        await Aerich.bulk_create(versions)
+        return [version.version for version in versions]
+
     async def init_db(self, safe: bool) -> None:
         location = self.location
         app = self.app
@@ -142,19 +678,26 @@ class Command:
             for unexpected_file in dirname.glob("*"):
                 raise FileExistsError(str(unexpected_file))
 
-        await Tortoise.init(config=self.tortoise_config)
+        with phase("Tortoise.init"):
+            await Tortoise.init(config=self.tortoise_config)
         connection = get_app_connection(self.tortoise_config, app)
-        await generate_schema_for_client(connection, safe)
+        with phase("execute"):
+            await generate_schema_for_client(connection, safe)
 
         schema = get_schema_sql(connection, safe)
 
         version = await Migrate.generate_version()
+        with phase("describe"):
+            models_describe = get_models_describe(app)
         await Aerich.create(
             version=version,
             app=app,
-            content=get_models_describe(app),
+            content=models_describe,
+            applied_at=timezone.now(),
         )
         version_file = Path(dirname, version)
         content = MIGRATE_TEMPLATE.format(upgrade_sql=schema, downgrade_sql="")
-        with open(version_file, "w", encoding="utf-8") as f:
-            f.write(content)
+        with phase("write"):
+            version_file.write_text(content, encoding="utf-8")
+        capabilities = await Capabilities.detect(connection, connection.schema_generator.DIALECT)
+        Migrate.write_snapshot(version_file, models_describe, capabilities.version)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from tortoise import BaseDBAsyncClient
+
+_VERSION_SQLS = {
+    "mysql": "SELECT VERSION() AS version",
+    "postgres": "SELECT current_setting('server_version') AS version",
+    "sqlite": "SELECT sqlite_version() AS version",
+}
+
+
+def parse_version(version: str) -> tuple[int, ...]:
+    """
+    Parse the leading version numbers of a server version string
+    :param version: e.g.: '8.0.36-0ubuntu0.22.04.1', '16.2 (Debian 16.2-1.pgdg120+2)'
+    :return: e.g.: (8, 0, 36), (16, 2)
+    """
+    if match := re.match(r"\d+(\.\d+)*", version.strip()):
+        return tuple(int(i) for i in match.group().split("."))
+    return ()
+
+
+@dataclass(frozen=True)
+class Capabilities:
+    """
+    Version and feature flags of a database server, `BaseDDL` consults them to pick the DDL.
+    If the version is unknown, the syntax of the latest server is assumed, and the strategies
+    that take extra statements are turned off.
+    """
+
+    dialect: str
+    version: str = ""
+
+    @classmethod
+    async def detect(cls, connection: BaseDBAsyncClient, dialect: str) -> Capabilities:
+        """
+        Query the server version of the connection
+        :param connection:
+        :param dialect:
+        :return:
+        """
+        version = ""
+        if sql := _VERSION_SQLS.get(dialect):
+            _, rows = await connection.execute_query(sql)
+            if rows:
+                version = str(rows[0]["version"])
+        return cls(dialect, version)
+
+    @property
+    def version_info(self) -> tuple[int, ...]:
+        return parse_version(self.version)
+
+    @property
+    def is_mariadb(self) -> bool:
+        return "mariadb" in self.version.lower()
+
+    def _since(self, version: tuple[int, ...], default: bool = True) -> bool:
+        if not (version_info := self.version_info):
+            return default
+        return version_info >= version
+
+    @property
+    def rename_column(self) -> bool:
+        """Support `ALTER TABLE ... RENAME COLUMN`, MySQL8.0/MariaDB10.5.2/SQLite3.25"""
+        if self.dialect == "mysql":
+            return self._since((10, 5, 2) if self.is_mariadb else (8, 0))
+        if self.dialect == "sqlite":
+            return self._since((3, 25))
+        return True
+
+    @property
+    def drop_column(self) -> bool:
+        """Support `ALTER TABLE ... DROP COLUMN`, SQLite3.35"""
+        if self.dialect == "sqlite":
+            return self._since((3, 35))
+        return True
+
+    @property
+    def transactional_ddl(self) -> bool:
+        """DDL statements can be rolled back, MySQL commits implicitly before and after them"""
+        return self.dialect != "mysql"
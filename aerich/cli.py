@@ -1,14 +1,18 @@
+import json
 import os
 import sys
 from pathlib import Path
-from typing import Dict, List, cast
+from typing import Dict, List, Optional, cast
 
 import asyncclick as click
 from asyncclick import Context, UsageError
+from tortoise.exceptions import OperationalError
 
 from aerich import Command
 from aerich.enums import Color
-from aerich.exceptions import DowngradeError
+from aerich.exceptions import DowngradeError, SnapshotError, SquashError, UpgradeError
+from aerich.inspectdb import MODELS_HEADER, Inspect
+from aerich.profiler import Profiler, phase
 from aerich.utils import add_src_path, get_tortoise_config
 from aerich.version import __version__
 
@@ -35,10 +39,27 @@ CONFIG_DEFAULT_VALUES = {
     help="Config file.",
 )
 @click.option("--app", required=False, help="Tortoise-ORM app name.")
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Report the wall-clock time of the phases of the command to stderr.",
+)
+@click.option(
+    "--profile-output",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Dump the cProfile stats of the whole run to the file and report the hot spots, "
+    "implies --profile.",
+)
 @click.pass_context
-async def cli(ctx: Context, config, app) -> None:
+async def cli(ctx: Context, config, app, profile: bool, profile_output: Optional[str]) -> None:
     ctx.ensure_object(dict)
     ctx.obj["config_file"] = config
+    if profile or profile_output:
+        profiler = Profiler(profile_output)
+        profiler.start()
+        ctx.call_on_close(lambda: _report_profile(profiler))
 
     invoked_subcommand = ctx.invoked_subcommand
     if invoked_subcommand != "init":
@@ -58,27 +79,46 @@ async def cli(ctx: Context, config, app) -> None:
             raise UsageError(
                 "You need run `aerich init` again when upgrading to aerich 0.6.0+."
             ) from e
-        add_src_path(src_folder)
-        tortoise_config = get_tortoise_config(ctx, tortoise_orm)
+        with phase("config import"):
+            add_src_path(src_folder)
+            tortoise_config = get_tortoise_config(ctx, tortoise_orm)
         if not app:
             apps_config = cast(dict, tortoise_config.get("apps"))
             app = list(apps_config.keys())[0]
         command = Command(tortoise_config=tortoise_config, app=app, location=location)
         ctx.obj["command"] = command
-        if invoked_subcommand != "init-db":
+        # snapshot-diff works offline, and migrate initializes by itself for --offline
+        if invoked_subcommand not in ("init-db", "snapshot-diff"):
             if not Path(location, app).exists():
                 raise UsageError(
                     "You need to run `aerich init-db` first to initialize the database.", ctx=ctx
                 )
-            await command.init()
+            if invoked_subcommand != "migrate":
+                await command.init()
+
+
+def _report_profile(profiler: Profiler) -> None:
+    profiler.stop()
+    click.echo(profiler.report(), err=True)
 
 
 @cli.command(help="Generate a migration file for the current state of the models.")
 @click.option("--name", default="update", show_default=True, help="Migration name.")
 @click.option("--empty", default=False, is_flag=True, help="Generate an empty migration file.")
+@click.option(
+    "--offline",
+    default=False,
+    is_flag=True,
+    help="Diff with the snapshot of the last migration file, without connecting to the database.",
+)
 @click.pass_context
-async def migrate(ctx: Context, name, empty) -> None:
+async def migrate(ctx: Context, name, empty, offline: bool) -> None:
     command = ctx.obj["command"]
+    try:
+        await command.init(offline)
+    except SnapshotError as e:
+        click.secho(str(e), fg=Color.red)
+        ctx.exit(1)
     ret = await command.migrate(name, empty)
     if not ret:
         return click.secho("No changes detected", fg=Color.yellow)
@@ -91,7 +131,7 @@ async def migrate(ctx: Context, name, empty) -> None:
     "-i",
     default=True,
     type=bool,
-    help="Make migrations in a single transaction or not. Can be helpful for large migrations or creating concurrent indexes.",
+    help="Make migrations in a single transaction or not. Can be helpful for large migrations or creating concurrent indexes. If not, statements are executed one by one and a rerun resumes from the failed one.",
 )
 @click.option(
     "--fake",
@@ -99,20 +139,86 @@ async def migrate(ctx: Context, name, empty) -> None:
     is_flag=True,
     help="Mark migrations as run without actually running them.",
 )
+@click.option(
+    "--lock-timeout",
+    default=None,
+    type=int,
+    help="Milliseconds that each statement waits for table locks, no limit by default.",
+)
+@click.option(
+    "--lock-retries",
+    default=3,
+    type=int,
+    show_default=True,
+    help="Times to retry a migration that fails by the lock timeout, with exponential backoff.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    default="text",
+    type=click.Choice(["text", "json"]),
+    show_default=True,
+    help="Output format, json prints the events of each file and statement as JSON lines "
+    "while running.",
+)
 @click.pass_context
-async def upgrade(ctx: Context, in_transaction: bool, fake: bool) -> None:
+async def upgrade(
+    ctx: Context,
+    in_transaction: bool,
+    fake: bool,
+    lock_timeout: Optional[int],
+    lock_retries: int,
+    output_format: str,
+) -> None:
     command = ctx.obj["command"]
-    migrated = await command.upgrade(run_in_transaction=in_transaction, fake=fake)
-    if not migrated:
-        click.secho("No upgrade items found", fg=Color.yellow)
-    else:
-        for version_file in migrated:
+    events = command.upgrade_events(
+        run_in_transaction=in_transaction,
+        fake=fake,
+        lock_timeout=lock_timeout,
+        lock_retries=lock_retries,
+    )
+    if output_format == "json":
+        try:
+            async for event in events:
+                _echo_aerich_table_changes(command, err=True)
+                click.echo(json.dumps(event))
+        except (UpgradeError, OperationalError) as e:
+            click.echo(json.dumps({"event": "error", "error": str(e)}))
+            ctx.exit(1)
+        finally:
+            _echo_aerich_table_changes(command, err=True)
+        return
+    migrated = False
+    try:
+        async for event in events:
+            _echo_aerich_table_changes(command)
+            if event["event"] != "file_end":
+                continue
+            migrated = True
+            version_file = event["version"]
             if fake:
                 click.echo(
                     f"Upgrading to {version_file}... " + click.style("FAKED", fg=Color.green)
                 )
             else:
-                click.secho(f"Success upgrading to {version_file}", fg=Color.green)
+                click.secho(
+                    f"Success upgrading to {version_file} in {event['duration']:.3f}s",
+                    fg=Color.green,
+                )
+    except UpgradeError as e:
+        # e.g.: a checksum mismatch, which must fail the deployment
+        click.secho(str(e), fg=Color.red, err=True)
+        ctx.exit(1)
+    finally:
+        _echo_aerich_table_changes(command)
+    if not migrated:
+        click.secho("No upgrade items found", fg=Color.yellow)
+
+
+def _echo_aerich_table_changes(command: Command, err: bool = False) -> None:
+    for change in command.aerich_table_changes:
+        click.secho(change, fg=Color.yellow, err=err)
+    command.aerich_table_changes = []
 
 
 @cli.command(help="Downgrade to specified version.")
@@ -138,21 +244,63 @@ async def upgrade(ctx: Context, in_transaction: bool, fake: bool) -> None:
     is_flag=True,
     help="Mark migrations as run without actually running them.",
 )
+@click.option(
+    "--lock-timeout",
+    default=None,
+    type=int,
+    help="Milliseconds that each statement waits for table locks, no limit by default.",
+)
+@click.option(
+    "--lock-retries",
+    default=3,
+    type=int,
+    show_default=True,
+    help="Times to retry a migration that fails by the lock timeout, with exponential backoff.",
+)
 @click.pass_context
 @click.confirmation_option(
     prompt="Downgrade is dangerous: you might lose your data! Are you sure?",
 )
-async def downgrade(ctx: Context, version: int, delete: bool, fake: bool) -> None:
+async def downgrade(
+    ctx: Context,
+    version: int,
+    delete: bool,
+    fake: bool,
+    lock_timeout: Optional[int],
+    lock_retries: int,
+) -> None:
     command = ctx.obj["command"]
     try:
-        files = await command.downgrade(version, delete, fake=fake)
+        files = await command.downgrade(
+            version, delete, fake=fake, lock_timeout=lock_timeout, lock_retries=lock_retries
+        )
     except DowngradeError as e:
         return click.secho(str(e), fg=Color.yellow)
+    finally:
+        _echo_aerich_table_changes(command)
     for file in files:
         if fake:
             click.echo(f"Downgrading to {file}... " + click.style("FAKED", fg=Color.green))
         else:
-            click.secho(f"Success downgrading to {file}", fg=Color.green)
+            duration = command.durations[file]
+            click.secho(f"Success downgrading to {file} in {duration:.3f}s", fg=Color.green)
+
+
+@cli.command(help="Squash the migrations up to the specified version into one migration.")
+@click.option(
+    "--to",
+    required=True,
+    type=int,
+    help="Version to squash up to, the migrations from the first one to it are squashed.",
+)
+@click.pass_context
+async def squash(ctx: Context, to: int) -> None:
+    command = ctx.obj["command"]
+    try:
+        version_file = await command.squash(to)
+    except SquashError as e:
+        return click.secho(str(e), fg=Color.yellow)
+    click.secho(f"Success squashing migrations into {version_file}", fg=Color.green)
 
 
 @cli.command(help="Show currently available heads (unapplied migrations).")
@@ -167,9 +315,17 @@ async def heads(ctx: Context) -> None:
 
 
 @cli.command(help="List all migrations.")
+@click.option(
+    "--timings",
+    is_flag=True,
+    default=False,
+    help="Show when the applied migrations ran and the durations of them and their statements.",
+)
 @click.pass_context
-async def history(ctx: Context) -> None:
+async def history(ctx: Context, timings: bool) -> None:
     command = ctx.obj["command"]
+    if timings:
+        return await _show_timings(command)
     versions = await command.history()
     if not versions:
         return click.secho("No migrations created yet.", fg=Color.green)
@@ -177,6 +333,25 @@ async def history(ctx: Context) -> None:
         click.secho(version, fg=Color.green)
 
 
+async def _show_timings(command: Command) -> None:
+    versions = await command.history_timings()
+    if not versions:
+        return click.secho("No migrations applied yet.", fg=Color.green)
+    for version in versions:
+        applied_at = f", applied at {version.applied_at}" if version.applied_at else ""
+        if version.duration is None:
+            # faked, or applied by init-db or the aerich without timings
+            click.echo(
+                f"{version.version}: " + click.style("no timings", fg=Color.yellow) + applied_at
+            )
+            continue
+        click.secho(f"{version.version}: {version.duration:.3f}s{applied_at}", fg=Color.green)
+        for timing in version.timings or []:
+            rows = "" if timing["rows"] is None else f", {timing['rows']} rows"
+            sql = " ".join(timing["sql"].split())
+            click.echo(f"  {timing['duration']:.3f}s{rows}: {sql}")
+
+
 def _write_config(config_path, doc, table) -> None:
     try:
         import tomli_w as tomlkit
@@ -250,8 +425,15 @@ async def init(ctx: Context, tortoise_orm, location, src_folder) -> None:
     help="Create tables only when they do not already exist.",
     show_default=True,
 )
+@click.option(
+    "--bootstrap",
+    is_flag=True,
+    default=False,
+    help="If the app has migrations, create the tables from the models and mark the migrations "
+    "as applied, instead of running them one by one on a new database.",
+)
 @click.pass_context
-async def init_db(ctx: Context, safe: bool) -> None:
+async def init_db(ctx: Context, safe: bool, bootstrap: bool) -> None:
     command = ctx.obj["command"]
     app = command.app
     dirname = Path(command.location, app)
@@ -260,6 +442,19 @@ async def init_db(ctx: Context, safe: bool) -> None:
         click.secho(f"Success creating app migration folder {dirname}", fg=Color.green)
         click.secho(f'Success generating initial migration file for app "{app}"', fg=Color.green)
     except FileExistsError:
+        if bootstrap:
+            try:
+                versions = await command.bootstrap_db(safe)
+            except FileNotFoundError:
+                click.secho(
+                    f"App {app} has no migrations in {dirname} to bootstrap from.", fg=Color.red
+                )
+                ctx.exit(1)
+            return click.secho(
+                f'Success generating schema for app "{app}" and marking {len(versions)} '
+                "migrations as applied",
+                fg=Color.green,
+            )
         return click.secho(
             f"App {app} is already initialized. Delete {dirname} and try again.", fg=Color.yellow
         )
@@ -273,11 +468,112 @@ async def init_db(ctx: Context, safe: bool) -> None:
     multiple=True,
     required=False,
 )
+@click.option(
+    "-o",
+    "--output-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Write the model of each table to a module in the directory, with an __init__.py "
+    "importing all the models, instead of printing them.",
+)
+@click.option(
+    "--snapshot",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write a snapshot of the tables, columns, indexes and foreign keys to the JSON file "
+    "instead of the models, to diff it offline by `aerich snapshot-diff`.",
+)
 @click.pass_context
-async def inspectdb(ctx: Context, table: List[str]) -> None:
+async def inspectdb(
+    ctx: Context,
+    table: List[str],
+    output_dir: Optional[Path],
+    snapshot: Optional[Path],
+) -> None:
     command = ctx.obj["command"]
-    ret = await command.inspectdb(table)
-    click.secho(ret)
+    if snapshot is not None:
+        if output_dir is not None:
+            raise UsageError("--snapshot and --output-dir are mutually exclusive.", ctx=ctx)
+        content = await command.inspectdb_snapshot(table)
+        snapshot.write_text(json.dumps(content, separators=(",", ":")), encoding="utf-8")
+        return click.secho(
+            f"Success writing the snapshot of {len(content['tables'])} tables to {snapshot}",
+            fg=Color.green,
+        )
+    models = command.inspectdb_models(table)
+    if output_dir is None:
+        # print each model as soon as it's inspected
+        click.echo(MODELS_HEADER, nl=False)
+        async for _, model in models:
+            click.echo("\n\n" + model)
+        return
+    output_dir.mkdir(parents=True, exist_ok=True)
+    imports = []
+    async for table_name, model in models:
+        output_dir.joinpath(f"{table_name}.py").write_text(
+            MODELS_HEADER + "\n\n" + model + "\n", encoding="utf-8"
+        )
+        imports.append(f"from .{table_name} import {Inspect.get_model_name(table_name)}\n")
+    output_dir.joinpath("__init__.py").write_text("".join(imports), encoding="utf-8")
+    click.secho(f"Success writing {len(imports)} models to {output_dir}", fg=Color.green)
+
+
+@cli.command(
+    help="Compare the tables of the database with the last migration, to detect the missing or "
+    "extra indexes, columns and constraints. Exit with 1 if they differ."
+)
+@click.option(
+    "--fix",
+    default=False,
+    is_flag=True,
+    help="Generate a migration that restores the missing ones, the extra ones are kept.",
+)
+@click.option("--name", default="fix_drift", show_default=True, help="Name of the migration.")
+@click.pass_context
+async def check(ctx: Context, fix: bool, name: str) -> None:
+    command = ctx.obj["command"]
+    try:
+        differences = await command.check()
+    except SnapshotError as e:
+        click.secho(str(e), fg=Color.red)
+        ctx.exit(1)
+    if not differences:
+        return click.secho("No differences detected", fg=Color.green)
+    colors = {"+": Color.green, "-": Color.red, "~": Color.yellow}
+    for difference in differences:
+        click.secho(str(difference), fg=colors[difference.sign])
+    if fix:
+        if version := await command.fix_drift(differences, name):
+            click.secho(f"Success creating migration file {version}", fg=Color.green)
+        else:
+            click.secho("Nothing to restore", fg=Color.yellow)
+    ctx.exit(1)
+
+
+@cli.command(
+    name="snapshot-diff",
+    help="Compare a snapshot of `aerich inspectdb --snapshot` with the models of the app, or "
+    "with another snapshot, without connecting to the database. Exit with 1 if they differ.",
+)
+@click.argument("source", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument(
+    "target", required=False, type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.pass_context
+async def snapshot_diff(ctx: Context, source: Path, target: Optional[Path]) -> None:
+    command = ctx.obj["command"]
+    try:
+        differences = await command.snapshot_diff(
+            json.loads(source.read_text("utf-8")),
+            json.loads(target.read_text("utf-8")) if target else None,
+        )
+    except (SnapshotError, ValueError) as e:
+        click.secho(str(e), fg=Color.red)
+        ctx.exit(1)
+    if not differences:
+        return click.secho("No differences detected", fg=Color.green)
+    colors = {"+": Color.green, "-": Color.red, "~": Color.yellow}
+    for line in differences:
+        click.secho(line, fg=colors[line[0]])
+    ctx.exit(1)
 
 
 def main() -> None:
@@ -2,15 +2,23 @@ from __future__ import annotations
 
 import re
 from enum import Enum
-from typing import TYPE_CHECKING, Any, cast
+from typing import TYPE_CHECKING, Any, Iterable, cast
 
 import tortoise
 from tortoise.backends.base.schema_generator import BaseSchemaGenerator
 
+from aerich.capabilities import Capabilities
+from aerich.exceptions import NotSupportError
 from aerich.utils import is_default_function
 
 if TYPE_CHECKING:
     from tortoise import BaseDBAsyncClient, Model
+    from tortoise.indexes import Index
+
+    from aerich.operations import Operation
+
+#: separator of the statements in the migration files
+STATEMENT_SEPARATOR = ";\n        "
 
 
 class BaseDDL:
@@ -25,6 +33,7 @@ class BaseDDL:
     )
     _ADD_INDEX_TEMPLATE = 'ALTER TABLE "{table_name}" ADD {index_type}{unique}INDEX "{index_name}" ({column_names}){extra}'
     _DROP_INDEX_TEMPLATE = 'ALTER TABLE "{table_name}" DROP INDEX IF EXISTS "{index_name}"'
+    _SELECT_INDEX_TEMPLATE = "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = '{table_name}' AND index_name = '{index_name}'"
     _ADD_FK_TEMPLATE = 'ALTER TABLE "{table_name}" ADD CONSTRAINT "{fk_name}" FOREIGN KEY ("{db_column}") REFERENCES "{table}" ("{field}") ON DELETE {on_delete}'
     _DROP_FK_TEMPLATE = 'ALTER TABLE "{table_name}" DROP FOREIGN KEY "{fk_name}"'
     _M2M_TABLE_TEMPLATE = (
@@ -38,10 +47,26 @@ class BaseDDL:
         'ALTER TABLE "{table_name}" CHANGE {old_column_name} {new_column_name} {new_column_type}'
     )
     _RENAME_TABLE_TEMPLATE = 'ALTER TABLE "{old_table_name}" RENAME TO "{new_table_name}"'
+    # `;` in the comments, strings and quoted identifiers doesn't end a statement
+    _COMMENT_PATTERN = r"--[^\n]*|/\*.*?\*/"
+    # nor in the `BEGIN ... END` blocks of triggers and procedures, `CASE ... END` is counted
+    # since `END` closes it too, `BEGIN` of transactions and `END IF` etc. don't count
+    _BLOCK_PATTERN = (
+        r"(?i:(?P<block_start>\bBEGIN\b(?!\s*(?:;|$|TRANSACTION\b|WORK\b|DEFERRED\b|IMMEDIATE\b"
+        r"|EXCLUSIVE\b|ISOLATION\b|READ\b))|\bCASE\b)"
+        r"|(?P<block_end>\bEND\b(?:\s+CASE\b)?(?!\s+(?:IF|LOOP|WHILE|REPEAT)\b)))"
+    )
+    _STATEMENT_TOKEN_REGEX = re.compile(
+        rf"{_COMMENT_PATTERN}|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`(?:[^`]|``)*`|{_BLOCK_PATTERN}|;",
+        re.S,
+    )
+    # statements that the client reports the affected rows of
+    _ROW_COUNT_REGEX = re.compile(r"(INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
 
-    def __init__(self, client: BaseDBAsyncClient) -> None:
+    def __init__(self, client: BaseDBAsyncClient, capabilities: Capabilities | None = None) -> None:
         self.client = client
         self.schema_generator = self.schema_generator_cls(client)
+        self.capabilities = capabilities or Capabilities(self.DIALECT)
 
     def create_table(self, model: type[Model]) -> str:
         schema = self.schema_generator._get_table_sql(model, True)["table_creation_string"]
@@ -118,6 +143,24 @@ class BaseDDL:
 
     def _add_or_modify_column(
         self, model: type[Model], field_describe: dict, is_pk: bool, modify: bool = False
+    ) -> str:
+        if modify:
+            unique = False
+            template = self._MODIFY_COLUMN_TEMPLATE
+        else:
+            # sqlite does not support alter table to add unique column
+            unique = bool(field_describe.get("unique")) and self.DIALECT != "sqlite"
+            template = self._ADD_COLUMN_TEMPLATE
+        column = self._get_column_sql(model, field_describe, is_pk, unique)
+        return template.format(table_name=model._meta.db_table, column=column)
+
+    def _get_column_sql(
+        self,
+        model: type[Model],
+        field_describe: dict,
+        is_pk: bool,
+        unique: bool,
+        with_comment: bool = True,
     ) -> str:
         db_table = model._meta.db_table
         description = field_describe.get("description")
@@ -126,25 +169,18 @@ class BaseDDL:
         default = self._get_default(model, field_describe)
         if default is None:
             default = ""
-        if modify:
-            unique = ""
-            template = self._MODIFY_COLUMN_TEMPLATE
-        else:
-            # sqlite does not support alter table to add unique column
-            unique = " UNIQUE" if field_describe.get("unique") and self.DIALECT != "sqlite" else ""
-            template = self._ADD_COLUMN_TEMPLATE
         column = self.schema_generator._create_string(
             db_column=db_column,
             field_type=db_field_types.get(self.DIALECT, db_field_types.get("")),
             nullable=" NOT NULL" if not field_describe.get("nullable") else "",
-            unique=unique,
+            unique=" UNIQUE" if unique else "",
             comment=(
                 self.schema_generator._column_comment_generator(
                     table=db_table,
                     column=db_column,
                     comment=description,
                 )
-                if description
+                if description and with_comment
                 else ""
             ),
             is_primary_key=is_pk,
@@ -152,7 +188,7 @@ class BaseDDL:
         )
         if tortoise.__version__ <= "0.23.0":
             column = column.replace("  ", " ")
-        return template.format(table_name=db_table, column=column)
+        return column
 
     def drop_column(self, model: type[Model], column_name: str) -> str:
         return self._DROP_COLUMN_TEMPLATE.format(
@@ -214,9 +250,35 @@ class BaseDDL:
             table_name=model._meta.db_table,
         )
 
+    def select_index(
+        self,
+        model: type[Model],
+        field_names: list[str],
+        unique: bool | None = False,
+        name: str | None = None,
+    ) -> str:
+        """
+        :return: query that returns rows if the index exists
+        """
+        return self._SELECT_INDEX_TEMPLATE.format(
+            index_name=name or self._index_name(unique, model, field_names),
+            table_name=model._meta.db_table,
+            column_names=",".join(field_names),
+            unique=int(bool(unique)),
+        )
+
     def drop_index_by_name(self, model: type[Model], index_name: str) -> str:
         return self.drop_index(model, [], name=index_name)
 
+    def add_index_object(self, model: type[Model], index: Index) -> str:
+        sql = index.get_sql(self.schema_generator, model, safe=True)
+        if tortoise.__version__ < "0.24":
+            sql = sql.replace("  ", " ")
+        return sql
+
+    def drop_index_object(self, model: type[Model], index: Index) -> str:
+        return self.drop_index_by_name(model, index.index_name(self.schema_generator, model))
+
     def _generate_fk_name(
         self, db_table: str, field_describe: dict, reference_table_describe: dict
     ) -> str:
@@ -276,3 +338,101 @@ class BaseDDL:
         return self._RENAME_TABLE_TEMPLATE.format(
             table_name=db_table, old_table_name=old_table_name, new_table_name=new_table_name
         )
+
+    def requires_rebuild(self, operation: Operation) -> bool:
+        """
+        Whether the operation can only be done by recreating the table
+        :param operation:
+        :return:
+        """
+        return False
+
+    def rebuild_table(
+        self,
+        model: type[Model],
+        old_model_describe: dict,
+        new_model_describe: dict,
+        renamed_columns: dict[str, str],
+        reference_table_describes: dict[str, dict],
+    ) -> str:
+        raise NotSupportError(f"Rebuild table is unsupported in {self.DIALECT}.")
+
+    def set_lock_timeout(self, lock_timeout: int, in_transaction: bool) -> str:
+        """
+        Limit how long the next statement waits for table locks, executed before it on its own
+        :param lock_timeout: milliseconds
+        :param in_transaction: whether the statement runs in a transaction
+        :return: empty if unsupported
+        """
+        return ""
+
+    def reset_lock_timeout(self, in_transaction: bool) -> str:
+        """
+        Restore the lock timeout set by `set_lock_timeout`, executed even if the statement fails
+        :param in_transaction: whether the statement runs in a transaction
+        :return: empty if the timeout ends with the transaction
+        """
+        return ""
+
+    def is_lock_timeout(self, exc: BaseException) -> bool:
+        """
+        Whether the exception is raised by `set_lock_timeout`
+        :param exc:
+        :return:
+        """
+        return False
+
+    @staticmethod
+    def _get_db_errors(exc: BaseException) -> list[BaseException]:
+        """the exception and the driver errors wrapped by it"""
+        return [e for e in (exc, exc.__cause__, *exc.args) if isinstance(e, BaseException)]
+
+    def has_row_count(self, statement: str) -> bool:
+        """
+        Whether `execute_query` of the client returns the affected rows of the statement
+        :param statement:
+        :return:
+        """
+        return bool(self._ROW_COUNT_REGEX.match(statement))
+
+    def split_statements(self, sql: str) -> list[str]:
+        """
+        Split sql script into statements
+        :param sql:
+        :return: statements without the ending `;`, the empty ones are dropped
+        :raises NotSupportError: if the dialect can't split its scripts, which are executed as a
+            whole then and can't be run out of transaction
+        """
+        statements = []
+        start = depth = 0
+        for match in self._STATEMENT_TOKEN_REGEX.finditer(sql + ";"):
+            if match.lastgroup == "block_start":
+                depth += 1
+            elif match.lastgroup == "block_end":
+                depth = max(depth - 1, 0)
+            elif match.group() == ";" and not depth:
+                statement = sql[start : match.start()].strip()
+                if re.sub(self._COMMENT_PATTERN, "", statement, flags=re.S).strip():
+                    statements.append(statement)
+                start = match.end()
+        if statement := sql[start:].strip():
+            # an unclosed block
+            statements.append(statement)
+        return statements
+
+    def render_operations(self, operations: Iterable[Operation]) -> list[str]:
+        """
+        Render operations to sql statements, duplicated statements are dropped
+        :param operations: ordered operations
+        :return:
+        """
+        return list(dict.fromkeys(operation.render(self).rstrip(";") for operation in operations))
+
+    def merge_alter_operators(self, operators: list[str]) -> list[str]:
+        """
+        Combine adjacent ALTER TABLE statements of the same table into one statement,
+        only dialects that support multiple alter specifications will override it
+        :param operators: ordered sql statements
+        :return:
+        """
+        return operators
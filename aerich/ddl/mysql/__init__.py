@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import math
+import re
 from typing import TYPE_CHECKING
 
 from tortoise.backends.mysql.schema_generator import MySQLSchemaGenerator
@@ -8,6 +10,7 @@ from aerich.ddl import BaseDDL
 
 if TYPE_CHECKING:
     from tortoise import Model  # noqa:F401
+    from tortoise.indexes import Index
 
 
 class MysqlDDL(BaseDDL):
@@ -35,6 +38,27 @@ class MysqlDDL(BaseDDL):
     )
     _MODIFY_COLUMN_TEMPLATE = "ALTER TABLE `{table_name}` MODIFY COLUMN {column}"
     _RENAME_TABLE_TEMPLATE = "ALTER TABLE `{old_table_name}` RENAME TO `{new_table_name}`"
+    _ALTER_TABLE_TEMPLATE = "ALTER TABLE `{table_name}` {clauses}"
+    _LOCK_TIMEOUT_TEMPLATE = (
+        "SET SESSION lock_wait_timeout = {timeout};\n"
+        "SET SESSION innodb_lock_wait_timeout = {timeout}"
+    )
+    _LOCK_WAIT_TIMEOUT = 1205  # ER_LOCK_WAIT_TIMEOUT, for both metadata locks and row locks
+    # backslash escapes in strings
+    _STATEMENT_TOKEN_REGEX = re.compile(
+        rf"{BaseDDL._COMMENT_PATTERN}|'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|`(?:[^`]|``)*`|{BaseDDL._BLOCK_PATTERN}|;",
+        re.S,
+    )
+    _ALTER_TABLE_PATTERN = re.compile(r"^ALTER TABLE `(?P<table_name>[^`]+)` (?P<clause>.+)$", re.S)
+    _COLUMN_CLAUSE_PATTERN = re.compile(
+        r"^(?:ADD|DROP COLUMN|MODIFY COLUMN|ALTER COLUMN|RENAME COLUMN) `(?P<column>[^`]+)`"
+        r"(?: TO `(?P<new_column>[^`]+)`)?"
+    )
+    _CHANGE_CLAUSE_PATTERN = re.compile(r"^CHANGE (?P<column>\S+) (?P<new_column>\S+) ")
+    _KEY_CLAUSE_PATTERN = re.compile(
+        r"^(?:ADD|DROP) (?:[A-Z]+ )*?(?:INDEX|CONSTRAINT|FOREIGN KEY) `(?P<name>[^`]+)`"
+        r"(?: FOREIGN KEY)?(?: \((?P<columns>[^)]*)\))?"
+    )
 
     def _index_name(self, unique: bool | None, model: type[Model], field_names: list[str]) -> str:
         if unique:
@@ -47,3 +71,96 @@ class MysqlDDL(BaseDDL):
         else:
             index_prefix = "idx"
         return self.schema_generator._generate_index_name(index_prefix, model, field_names)
+
+    @staticmethod
+    def _get_index_fields(index: Index) -> list[str]:
+        # schema_generator of MySQL return a empty index sql
+        if hasattr(index, "field_names"):
+            # tortoise>=0.24
+            return index.field_names
+        # TODO: remove else when drop support for tortoise<0.24
+        if not (fields := index.fields):
+            fields = [getattr(i, "get_sql")() for i in index.expressions]
+        return list(fields)
+
+    def add_index_object(self, model: type[Model], index: Index) -> str:
+        return self.add_index(
+            model,
+            self._get_index_fields(index),
+            name=index.name,
+            index_type=index.INDEX_TYPE,
+            extra=index.extra,
+        )
+
+    def drop_index_object(self, model: type[Model], index: Index) -> str:
+        return self.drop_index(model, self._get_index_fields(index), name=index.name)
+
+    @classmethod
+    def _parse_alter_clause(cls, operator: str) -> tuple[str, str, set[str], set[str], bool] | None:
+        """
+        Parse `ALTER TABLE` statement that can be merged with others
+        :param operator: sql statement
+        :return: (table_name, clause, altered names, referred columns, is rename) or None
+        """
+        if not (m := cls._ALTER_TABLE_PATTERN.match(operator)):
+            return None
+        table_name, clause = m.group("table_name"), m.group("clause")
+        if m := cls._COLUMN_CLAUSE_PATTERN.match(clause) or cls._CHANGE_CLAUSE_PATTERN.match(
+            clause
+        ):
+            columns = {c.strip("`") for c in m.group("column", "new_column") if c}
+            return table_name, clause, columns, set(), bool(m.group("new_column"))
+        if m := cls._KEY_CLAUSE_PATTERN.match(clause):
+            key_columns = m.group("columns")
+            referred = {c.strip(" `") for c in key_columns.split(",")} if key_columns else set()
+            return table_name, clause, {m.group("name")}, referred, False
+        return None
+
+    def merge_alter_operators(self, operators: list[str]) -> list[str]:
+        # Each `ALTER TABLE` may rebuild the whole table in MySQL, so adjacent statements of
+        # the same table are merged into `ALTER TABLE t ADD ..., DROP ..., ADD INDEX ...`.
+        # Only adjacent statements are merged to keep the order between tables (e.g.: fk),
+        # and a new statement is started when a column/index is altered twice or an index
+        # refers to a renamed column.
+        groups: list[tuple[str | None, list[str]]] = []
+        altered: set[str] = set()
+        renamed: set[str] = set()
+        for operator in operators:
+            if (parsed := self._parse_alter_clause(operator)) is None:
+                groups.append((None, [operator]))
+                continue
+            table_name, clause, names, referred, is_rename = parsed
+            if (
+                groups
+                and groups[-1][0] == table_name
+                and not names & altered
+                and not referred & renamed
+            ):
+                groups[-1][1].append(clause)
+            else:
+                groups.append((table_name, [clause]))
+                altered, renamed = set(), set()
+            altered |= names
+            if is_rename:
+                renamed |= names
+        return [
+            (
+                self._ALTER_TABLE_TEMPLATE.format(table_name=table_name, clauses=", ".join(clauses))
+                if table_name is not None
+                else clauses[0]
+            )
+            for table_name, clauses in groups
+        ]
+
+    def set_lock_timeout(self, lock_timeout: int, in_transaction: bool) -> str:
+        # the timeouts are in whole seconds, at least 1
+        return self._LOCK_TIMEOUT_TEMPLATE.format(timeout=max(1, math.ceil(lock_timeout / 1000)))
+
+    def reset_lock_timeout(self, in_transaction: bool) -> str:
+        # session variables, which are kept by the connection when it's back to the pool
+        return self._LOCK_TIMEOUT_TEMPLATE.format(timeout="DEFAULT")
+
+    def is_lock_timeout(self, exc: BaseException) -> bool:
+        return any(
+            e.args and e.args[0] == self._LOCK_WAIT_TIMEOUT for e in self._get_db_errors(exc)
+        )
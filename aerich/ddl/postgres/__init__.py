@@ -1,24 +1,48 @@
 from __future__ import annotations
 
-from typing import cast
+import re
+from typing import TYPE_CHECKING, cast
 
+import tortoise
 from tortoise import Model
 from tortoise.backends.asyncpg.schema_generator import AsyncpgSchemaGenerator
 
 from aerich.ddl import BaseDDL
 
+if TYPE_CHECKING:
+    from tortoise.indexes import Index
+
 
 class PostgresDDL(BaseDDL):
     schema_generator_cls = AsyncpgSchemaGenerator
     DIALECT = AsyncpgSchemaGenerator.DIALECT
     _ADD_INDEX_TEMPLATE = 'CREATE {unique}INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" {index_type}({column_names}){extra}'
     _DROP_INDEX_TEMPLATE = 'DROP INDEX IF EXISTS "{index_name}"'
+    _SELECT_INDEX_TEMPLATE = "SELECT 1 FROM pg_indexes WHERE schemaname = current_schema() AND tablename = '{table_name}' AND indexname = '{index_name}'"
     _ALTER_NULL_TEMPLATE = 'ALTER TABLE "{table_name}" ALTER COLUMN "{column}" {set_drop} NOT NULL'
     _MODIFY_COLUMN_TEMPLATE = (
         'ALTER TABLE "{table_name}" ALTER COLUMN "{column}" TYPE {datatype}{using}'
     )
     _SET_COMMENT_TEMPLATE = 'COMMENT ON COLUMN "{table_name}"."{column}" IS {comment}'
     _DROP_FK_TEMPLATE = 'ALTER TABLE "{table_name}" DROP CONSTRAINT IF EXISTS "{fk_name}"'
+    _LOCK_TIMEOUT_TEMPLATE = "SET {scope}lock_timeout = '{lock_timeout}ms'"
+    _RESET_LOCK_TIMEOUT_TEMPLATE = "RESET lock_timeout"
+    _LOCK_NOT_AVAILABLE = "55P03"
+    # dollar-quoted strings, e.g.: the body of functions
+    _STATEMENT_TOKEN_REGEX = re.compile(
+        rf"{BaseDDL._COMMENT_PATTERN}|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\$\$.*?\$\$"
+        rf"|\$(?P<tag>[A-Za-z_]\w*)\$.*?\$(?P=tag)\$|{BaseDDL._BLOCK_PATTERN}|;",
+        re.S,
+    )
+    # the asyncpg client only counts the rows of the statements starting with them
+    _ROW_COUNT_REGEX = re.compile(r"(UPDATE|DELETE)\b")
+
+    def add_index_object(self, model: type[Model], index: Index) -> str:
+        sql = super().add_index_object(model, index)
+        if tortoise.__version__ < "0.24" and (exists := "IF NOT EXISTS ") not in sql:
+            idx = " INDEX "
+            sql = sql.replace(idx, idx + exists)
+        return sql
 
     def alter_column_null(self, model: type[Model], field_describe: dict) -> str:
         db_table = model._meta.db_table
@@ -51,3 +75,19 @@ class PostgresDDL(BaseDDL):
                 else "NULL"
             ),
         )
+
+    def set_lock_timeout(self, lock_timeout: int, in_transaction: bool) -> str:
+        # `SET LOCAL` is reset at the end of the transaction, which can't run `RESET` after a
+        # failed statement
+        return self._LOCK_TIMEOUT_TEMPLATE.format(
+            scope="LOCAL " if in_transaction else "", lock_timeout=lock_timeout
+        )
+
+    def reset_lock_timeout(self, in_transaction: bool) -> str:
+        return "" if in_transaction else self._RESET_LOCK_TIMEOUT_TEMPLATE
+
+    def is_lock_timeout(self, exc: BaseException) -> bool:
+        return any(
+            getattr(e, "sqlstate", None) == self._LOCK_NOT_AVAILABLE
+            for e in self._get_db_errors(exc)
+        )
@@ -1,10 +1,25 @@
-from typing import Type
+from __future__ import annotations
+
+from typing import Type, cast
 
 from tortoise import Model
 from tortoise.backends.sqlite.schema_generator import SqliteSchemaGenerator
+from tortoise.indexes import Index
 
-from aerich.ddl import BaseDDL
+from aerich.coder import load_index
+from aerich.ddl import STATEMENT_SEPARATOR, BaseDDL
 from aerich.exceptions import NotSupportError
+from aerich.operations import (
+    AddFK,
+    AlterColumnDefault,
+    AlterColumnNull,
+    DropColumn,
+    DropFK,
+    ModifyColumn,
+    Operation,
+    RenameColumn,
+    SetComment,
+)
 
 
 class SqliteDDL(BaseDDL):
@@ -12,6 +27,22 @@ class SqliteDDL(BaseDDL):
     DIALECT = SqliteSchemaGenerator.DIALECT
     _ADD_INDEX_TEMPLATE = 'CREATE {unique}INDEX "{index_name}" ON "{table_name}" ({column_names})'
     _DROP_INDEX_TEMPLATE = 'DROP INDEX IF EXISTS "{index_name}"'
+    # by the columns, the index of an unique constraint is named sqlite_autoindex_*
+    _SELECT_INDEX_TEMPLATE = """SELECT 1 FROM pragma_index_list('{table_name}') AS l WHERE l."unique" = {unique} AND (SELECT group_concat(i.name) FROM pragma_index_info(l.name) AS i) = '{column_names}'"""
+    _CREATE_TABLE_TEMPLATE = 'CREATE TABLE "{table_name}" (\n    {fields}\n){comment}'
+    _COPY_ROWS_TEMPLATE = 'INSERT INTO "{new_table_name}" ({new_columns}) SELECT {old_columns} FROM "{old_table_name}"'
+    _FOREIGN_KEYS_TEMPLATE = "PRAGMA foreign_keys={value}"
+    _GENERATED_PK_TEMPLATE = '"{db_column}" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL'
+    _TMP_TABLE_PREFIX = "_aerich_tmp_"
+    # SQLite has no `ALTER COLUMN` and `ADD CONSTRAINT`, they are done by rebuilding the table
+    _REBUILD_OPERATIONS = (
+        ModifyColumn,
+        AlterColumnDefault,
+        AlterColumnNull,
+        SetComment,
+        AddFK,
+        DropFK,
+    )
 
     def modify_column(self, model: "Type[Model]", field_object: dict, is_pk: bool = True):
         raise NotSupportError("Modify column is unsupported in SQLite.")
@@ -24,3 +55,165 @@ class SqliteDDL(BaseDDL):
 
     def set_comment(self, model: "Type[Model]", field_describe: dict):
         raise NotSupportError("Alter column comment is unsupported in SQLite.")
+
+    def requires_rebuild(self, operation: Operation) -> bool:
+        if isinstance(operation, RenameColumn):
+            return not self.capabilities.rename_column
+        if isinstance(operation, DropColumn):
+            return not self.capabilities.drop_column
+        return isinstance(operation, self._REBUILD_OPERATIONS)
+
+    @staticmethod
+    def _get_table_fields(model_describe: dict) -> list[dict]:
+        """pk field first, then the data fields that have columns"""
+        return [cast(dict, model_describe.get("pk_field"))] + [
+            f for f in model_describe.get("data_fields", []) if f.get("db_field_types") is not None
+        ]
+
+    @staticmethod
+    def _get_fk_fields(model_describe: dict) -> dict[str, dict]:
+        """{fk column: fk/o2o field describe}"""
+        return {
+            f["raw_field"]: f
+            for f in model_describe.get("fk_fields", []) + model_describe.get("o2o_fields", [])
+        }
+
+    def _get_columns(self, model_describe: dict) -> dict[str, str]:
+        """{field name: column name}"""
+        columns = {f["name"]: f["db_column"] for f in self._get_table_fields(model_describe)}
+        for column, fk_field in self._get_fk_fields(model_describe).items():
+            columns[fk_field["name"]] = column
+        return columns
+
+    def _create_table_from_describe(
+        self,
+        model: type[Model],
+        model_describe: dict,
+        table_name: str,
+        reference_table_describes: dict[str, dict],
+    ) -> str:
+        fk_fields = self._get_fk_fields(model_describe)
+        fields = []
+        for i, field_describe in enumerate(self._get_table_fields(model_describe)):
+            db_column = field_describe["db_column"]
+            is_pk = i == 0
+            if is_pk and field_describe.get("generated"):
+                fields.append(self._GENERATED_PK_TEMPLATE.format(db_column=db_column))
+                continue
+            unique = bool(field_describe.get("unique")) and not is_pk
+            reference = reference_table_describes.get(db_column)
+            column = self._get_column_sql(
+                model, field_describe, is_pk, unique, with_comment=reference is None
+            )
+            if reference is not None:
+                description = field_describe.get("description")
+                column += self.schema_generator._create_fk_string(
+                    constraint_name="",
+                    db_column=db_column,
+                    table=reference["table"],
+                    field=reference["pk_field"]["db_column"],
+                    on_delete=fk_fields[db_column]["on_delete"],
+                    comment=(
+                        self.schema_generator._column_comment_generator(
+                            table=table_name, column=db_column, comment=description
+                        )
+                        if description
+                        else ""
+                    ),
+                )
+            fields.append(column)
+        columns = self._get_columns(model_describe)
+        for unique_together in model_describe.get("unique_together", []):
+            field_names = [columns.get(name, name) for name in unique_together]
+            fields.append(
+                self.schema_generator.UNIQUE_CONSTRAINT_CREATE_TEMPLATE.format(
+                    index_name=self.schema_generator._generate_index_name(
+                        "uid", model_describe["table"], field_names
+                    ),
+                    fields=", ".join(self.schema_generator.quote(f) for f in field_names),
+                )
+            )
+        description = model_describe.get("description")
+        return self._CREATE_TABLE_TEMPLATE.format(
+            table_name=table_name,
+            fields=",\n    ".join(fields),
+            comment=(
+                self.schema_generator._table_comment_generator(
+                    table=table_name, comment=description
+                )
+                if description
+                else ""
+            ),
+        )
+
+    def _get_indexes_from_describe(self, model: type[Model], model_describe: dict) -> list[str]:
+        table_name = model_describe["table"]
+        indexes: list[tuple[str | None, list[str]]] = [
+            (None, [f["db_column"]])
+            for f in self._get_table_fields(model_describe)[1:]
+            # unique field has been created with `UNIQUE`
+            if f.get("indexed") and not f.get("unique")
+        ]
+        columns = self._get_columns(model_describe)
+        sqls = []
+        for index in model_describe.get("indexes", []):
+            if isinstance(index, dict):
+                index = load_index(index)
+            if not isinstance(index, Index):
+                indexes.append((None, [columns.get(f, f) for f in index]))
+            elif index.fields:
+                indexes.append((index.name, [columns.get(f, f) for f in index.fields]))
+            else:
+                # expression index can't be resolved from describe
+                sqls.append(self.add_index_object(model, index))
+        return [
+            self._ADD_INDEX_TEMPLATE.format(
+                unique="",
+                index_name=name
+                or self.schema_generator._generate_index_name("idx", table_name, field_names),
+                table_name=table_name,
+                column_names=", ".join(self.schema_generator.quote(f) for f in field_names),
+            )
+            for name, field_names in indexes
+        ] + sqls
+
+    def rebuild_table(
+        self,
+        model: type[Model],
+        old_model_describe: dict,
+        new_model_describe: dict,
+        renamed_columns: dict[str, str],
+        reference_table_describes: dict[str, dict],
+    ) -> str:
+        # See "Making Other Kinds Of Table Schema Changes" of https://www.sqlite.org/lang_altertable.html
+        old_table_name = old_model_describe["table"]
+        new_table_name = new_model_describe["table"]
+        tmp_table_name = self._TMP_TABLE_PREFIX + new_table_name
+        old_columns = {f["db_column"] for f in self._get_table_fields(old_model_describe)}
+        copy_columns = []  # [(new_column, old_column)], new added columns are left to default
+        for field_describe in self._get_table_fields(new_model_describe):
+            column = field_describe["db_column"]
+            if (old_column := renamed_columns.get(column, column)) in old_columns:
+                copy_columns.append((column, old_column))
+        quote = self.schema_generator.quote
+        return STATEMENT_SEPARATOR.join(
+            [
+                # foreign_keys must be off, or dropping the old table will cascade delete rows
+                self._FOREIGN_KEYS_TEMPLATE.format(value="OFF"),
+                self._create_table_from_describe(
+                    model, new_model_describe, tmp_table_name, reference_table_describes
+                ),
+                self._COPY_ROWS_TEMPLATE.format(
+                    new_table_name=tmp_table_name,
+                    new_columns=", ".join(quote(c) for c, _ in copy_columns),
+                    old_columns=", ".join(quote(c) for _, c in copy_columns),
+                    old_table_name=old_table_name,
+                ),
+                self.drop_table(old_table_name),
+                self._RENAME_TABLE_TEMPLATE.format(
+                    old_table_name=tmp_table_name, new_table_name=new_table_name
+                ),
+                *self._get_indexes_from_describe(model, new_model_describe),
+                self._FOREIGN_KEYS_TEMPLATE.format(value="ON"),
+            ]
+        )
@@ -8,3 +8,21 @@ class DowngradeError(Exception):
     """
     raise when downgrade error
     """
+
+
+class UpgradeError(Exception):
+    """
+    raise when upgrade error
+    """
+
+
+class SquashError(Exception):
+    """
+    raise when squash error
+    """
+
+
+class SnapshotError(Exception):
+    """
+    raise when a snapshot can't be loaded
+    """
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import contextlib
-from typing import Any, Callable, Dict, Optional, TypedDict
+import dataclasses
+import sys
+from functools import cached_property
+from typing import Any, AsyncIterator, Callable, Dict, Optional, TypedDict
 
-from pydantic import BaseModel
 from tortoise import BaseDBAsyncClient
 
 
@@ -18,17 +21,22 @@ class ColumnInfoDict(TypedDict):
 
 
 FieldMapDict = Dict[str, Callable[..., str]]
+#: imports of the module of the inspected models
+MODELS_HEADER = "from tortoise import Model, fields\n"
+# the records of the catalog are many and not validated, slots make them smaller where supported
+_dataclass_options: dict[str, bool] = {"slots": True} if sys.version_info >= (3, 10) else {}
 
 
-class Column(BaseModel):
+@dataclasses.dataclass(**_dataclass_options)
+class Column:
     name: str
     data_type: str
     null: bool
     default: Any
-    comment: Optional[str] = None
     pk: bool
     unique: bool
     index: bool
+    comment: Optional[str] = None
     length: Optional[int] = None
     extra: Optional[str] = None
     decimal_places: Optional[int] = None
@@ -90,37 +98,276 @@ class Column(BaseModel):
         }
 
 
+@dataclasses.dataclass(**_dataclass_options)
+class TableIndex:
+    """
+    Index of multiple columns or of a method other than the default, the other indexes of a
+    single column are `Column.index/unique`
+    """
+
+    name: str
+    columns: list[str]
+    unique: bool = False
+    #: index method, e.g.: hash, None for the default (btree)
+    type: Optional[str] = None
+
+
+@dataclasses.dataclass(**_dataclass_options)
+class TableForeignKey:
+    """
+    Foreign key of a single column
+    """
+
+    column: str
+    to_table: str
+    #: None for the primary key of `to_table`
+    to_column: Optional[str] = None
+    #: CASCADE, SET NULL, RESTRICT, NO ACTION or SET DEFAULT
+    on_delete: str = "NO ACTION"
+
+
+@dataclasses.dataclass(**_dataclass_options)
+class Table:
+    name: str
+    columns: list[Column]
+    indexes: list[TableIndex] = dataclasses.field(default_factory=list)
+    foreign_keys: list[TableForeignKey] = dataclasses.field(default_factory=list)
+
+
+def fold_indexes(columns: list[Column], indexes: list[TableIndex]) -> list[TableIndex]:
+    """
+    Set the indexes of a single column without method to `Column.index/unique`
+    :return: the other indexes
+    """
+    columns_map = {column.name: column for column in columns}
+    ret = []
+    for index in indexes:
+        if (
+            len(index.columns) == 1
+            and not index.type
+            and (column := columns_map.get(index.columns[0]))
+        ):
+            if index.unique:
+                column.unique = True
+            else:
+                column.index = True
+        else:
+            ret.append(index)
+    return ret
+
+
 class Inspect:
     _table_template = "class {table}(Model):\n"
+    _meta_template = "\n\n    class Meta:\n"
+    #: index method -> path of the index class
+    _index_classes: dict[str, str] = {}
 
-    def __init__(self, conn: BaseDBAsyncClient, tables: list[str] | None = None) -> None:
+    def __init__(
+        self,
+        conn: BaseDBAsyncClient,
+        tables: list[str] | None = None,
+        concurrency: int = 5,
+        app: str = "models",
+    ) -> None:
+        """
+        :param conn:
+        :param tables: tables to inspect, all the tables if None
+        :param concurrency: max number of the tables inspected concurrently when the backend
+            queries the catalog per table, no more than the connection pool size is useful
+        :param app: app of the models that the relation fields refer to
+        """
         self.conn = conn
         with contextlib.suppress(AttributeError):
             self.database = conn.database  # type:ignore[attr-defined]
         self.tables = tables
+        self.concurrency = concurrency
+        self.app = app
 
-    @property
+    @cached_property
     def field_map(self) -> FieldMapDict:
+        """
+        :return: field of each data type, built once as it's looked up for every column
+        """
         raise NotImplementedError
 
     async def inspect(self) -> str:
+        models = [model async for _, model in self.inspect_models()]
+        return MODELS_HEADER + "\n\n" + "\n\n\n".join(models)
+
+    async def inspect_models(self, batch_size: int = 100) -> AsyncIterator[tuple[str, str]]:
+        """
+        Yield the model of each table as soon as it's inspected, the columns are got in batches
+        of tables, so the memory doesn't grow with the number of the tables
+        :param batch_size: number of the tables to get the columns of at a time
+        :return: (table, source of the model class)
+        """
+        async for table in self.inspect_tables(batch_size):
+            yield table.name, self.get_model(table)
+
+    async def inspect_tables(self, batch_size: int = 100) -> AsyncIterator[Table]:
+        """
+        Yield the catalog of each table, in batches of tables like `inspect_models`
+        """
         if not self.tables:
             self.tables = await self.get_all_tables()
-        result = "from tortoise import Model, fields\n\n\n"
-        tables = []
-        for table in self.tables:
-            columns = await self.get_columns(table)
-            fields = []
-            model = self._table_template.format(table=table.title().replace("_", ""))
-            for column in columns:
+        for i in range(0, len(self.tables), batch_size):
+            for table in await self.get_tables(self.tables[i : i + batch_size]):
+                yield table
+
+    @staticmethod
+    def get_model_name(table: str) -> str:
+        return table.title().replace("_", "")
+
+    def get_model(self, table: Table) -> str:
+        """
+        :return: source of the model class of the table
+        """
+        fields = []
+        model = self._table_template.format(table=self.get_model_name(table.name))
+        foreign_keys = {foreign_key.column: foreign_key for foreign_key in table.foreign_keys}
+        for column in table.columns:
+            if (foreign_key := foreign_keys.get(column.name)) and not column.pk:
+                kwargs = self._translate_foreign_key(table, column, foreign_key)
+                if column.unique:
+                    field = self.one_to_one_field(**kwargs)
+                else:
+                    field = self.foreign_key_field(**kwargs)
+            else:
                 field = self.field_map[column.data_type](**column.translate())
-                fields.append("    " + field)
-            tables.append(model + "\n".join(fields))
-        return result + "\n\n\n".join(tables)
+            fields.append("    " + field)
+        # imports of the index classes before the model, so that each model can be used alone
+        imports: dict[str, list[str]] = {}
+        for path in sorted({self._get_index_class(index) for index in table.indexes} - {""}):
+            module, name = path.rsplit(".", 1)
+            imports.setdefault(module, []).append(name)
+        imports_source = "".join(
+            f"from {module} import {', '.join(names)}\n\n\n" for module, names in imports.items()
+        )
+        return imports_source + model + "\n".join(fields) + self.get_meta(table)
+
+    def _translate_foreign_key(
+        self, table: Table, column: Column, foreign_key: TableForeignKey
+    ) -> dict[str, str]:
+        info = column.translate()
+        name = self._get_relation_name(column.name)
+        source_field = ""
+        if name == column.name:
+            source_field = f'source_field="{column.name}", '
+        to_field = ""
+        if foreign_key.to_column and foreign_key.to_column != "id":
+            to_field = f'to_field="{foreign_key.to_column}", '
+        related_name = ""
+        if sum(fk.to_table == foreign_key.to_table for fk in table.foreign_keys) > 1:
+            # the default related names of the relations to the same model conflict
+            related_name = f'related_name="{table.name}_{name}", '
+        on_delete = ""
+        if foreign_key.on_delete != "CASCADE":
+            on_delete = f"on_delete=fields.{foreign_key.on_delete.replace(' ', '_')}, "
+        return {
+            "name": name,
+            "model": f'"{self.app}.{self.get_model_name(foreign_key.to_table)}", ',
+            "related_name": related_name,
+            "source_field": source_field,
+            "to_field": to_field,
+            "on_delete": on_delete,
+            "null": info["null"],
+            "comment": info["comment"],
+        }
+
+    @staticmethod
+    def _get_relation_name(column: str) -> str:
+        """
+        :return: name of the relation field of the foreign key column, whose default source
+            field is the column if it ends with _id
+        """
+        return column[:-3] if column.endswith("_id") and len(column) > 3 else column
+
+    def _get_index_class(self, index: TableIndex) -> str:
+        """
+        :return: path of the index class of the method, empty for a tuple of the fields
+        """
+        return self._index_classes.get(index.type, "") if index.type else ""
+
+    def get_meta(self, table: Table) -> str:
+        """
+        :return: source of the Meta class of the indexes in `Table.indexes`, empty if no one
+        """
+        pks = {column.name for column in table.columns if column.pk}
+        # the foreign key columns are the relation fields in the model
+        fields_map = {
+            foreign_key.column: self._get_relation_name(foreign_key.column)
+            for foreign_key in table.foreign_keys
+            if foreign_key.column not in pks
+        }
+        unique_together, indexes = [], []
+        for index in table.indexes:
+            fields = repr(tuple(fields_map.get(column, column) for column in index.columns))
+            if index_class := self._get_index_class(index):
+                indexes.append(f"{index_class.rsplit('.', 1)[1]}(fields={fields})")
+            elif index.unique:
+                unique_together.append(fields)
+            else:
+                indexes.append(fields)
+        options = []
+        for option, items in (("unique_together", unique_together), ("indexes", indexes)):
+            if items:
+                trailing_comma = "," if len(items) == 1 else ""
+                options.append(f"        {option} = ({', '.join(items)}{trailing_comma})")
+        if not options:
+            return ""
+        return self._meta_template + "\n".join(options)
 
     async def get_columns(self, table: str) -> list[Column]:
         raise NotImplementedError
 
+    async def get_tables_columns(self, tables: list[str]) -> dict[str, list[Column]]:
+        """
+        Override to get the columns of all the tables in a constant number of catalog queries,
+        otherwise `get_columns` of the tables run concurrently
+        :return: columns of each table, in the order of the tables
+        """
+        semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+
+        async def get_columns(table: str) -> tuple[str, list[Column]]:
+            async with semaphore:
+                return table, await self.get_columns(table)
+
+        return dict(await asyncio.gather(*map(get_columns, tables)))
+
+    async def get_tables_indexes(self, tables: list[str]) -> dict[str, list[TableIndex]]:
+        """
+        :return: indexes of each table, `get_tables` sets the ones of a single column without
+            method to `Column.index/unique`
+        """
+        return {}
+
+    async def get_tables_foreign_keys(self, tables: list[str]) -> dict[str, list[TableForeignKey]]:
+        """
+        :return: foreign keys of a single column of each table
+        """
+        return {}
+
+    async def get_tables(self, tables: list[str]) -> list[Table]:
+        """
+        Override to get the columns, the indexes and the foreign keys of the tables together
+        :return: the tables, in the order of `tables`
+        """
+        tables_columns = await self.get_tables_columns(tables)
+        tables_indexes = await self.get_tables_indexes(tables)
+        tables_foreign_keys = await self.get_tables_foreign_keys(tables)
+        ret = []
+        for table in tables:
+            columns = tables_columns.get(table, [])
+            ret.append(
+                Table(
+                    name=table,
+                    columns=columns,
+                    indexes=fold_indexes(columns, tables_indexes.get(table, [])),
+                    foreign_keys=tables_foreign_keys.get(table, []),
+                )
+            )
+        return ret
+
     async def get_all_tables(self) -> list[str]:
         raise NotImplementedError
 
@@ -156,6 +403,20 @@ class Inspect:
             **kwargs
         )
 
+    @classmethod
+    def foreign_key_field(cls, **kwargs) -> str:
+        return (
+            "{name} = fields.ForeignKeyField({model}{related_name}{source_field}{to_field}"
+            "{on_delete}{null}{comment})".format(**kwargs)
+        )
+
+    @classmethod
+    def one_to_one_field(cls, **kwargs) -> str:
+        return (
+            "{name} = fields.OneToOneField({model}{related_name}{source_field}{to_field}"
+            "{on_delete}{null}{comment})".format(**kwargs)
+        )
+
     @classmethod
     def int_field(cls, **kwargs) -> str:
         return "{name} = fields.IntField({pk}{index}{default}{comment})".format(**kwargs)
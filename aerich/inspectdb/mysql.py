@@ -1,10 +1,17 @@
 from __future__ import annotations
 
-from aerich.inspectdb import Column, FieldMapDict, Inspect
+from functools import cached_property
+
+from aerich.inspectdb import Column, FieldMapDict, Inspect, TableForeignKey, TableIndex
 
 
 class InspectMySQL(Inspect):
-    @property
+    _index_classes = {
+        "fulltext": "tortoise.contrib.mysql.indexes.FullTextIndex",
+        "spatial": "tortoise.contrib.mysql.indexes.SpatialIndex",
+    }
+
+    @cached_property
     def field_map(self) -> FieldMapDict:
         return {
             "int": self.int_field,
@@ -30,22 +37,21 @@ class InspectMySQL(Inspect):
         return list(map(lambda x: x["TABLE_NAME"], ret))
 
     async def get_columns(self, table: str) -> list[Column]:
-        columns = []
-        sql = """select c.*, s.NON_UNIQUE, s.INDEX_NAME
+        return (await self.get_tables_columns([table])).get(table, [])
+
+    async def get_tables_columns(self, tables: list[str]) -> dict[str, list[Column]]:
+        if not tables:
+            return {}
+        columns: dict[str, list[Column]] = {}
+        # the unique and the index of the columns are set from `get_tables_indexes`
+        sql = f"""select c.*
 from information_schema.COLUMNS c
-         left join information_schema.STATISTICS s on c.TABLE_NAME = s.TABLE_NAME
-    and c.TABLE_SCHEMA = s.TABLE_SCHEMA
-    and c.COLUMN_NAME = s.COLUMN_NAME
 where c.TABLE_SCHEMA = %s
-  and c.TABLE_NAME = %s"""
-        ret = await self.conn.execute_query_dict(sql, [self.database, table])
+  and c.TABLE_NAME in ({", ".join(["%s"] * len(tables))})
+order by c.TABLE_NAME, c.ORDINAL_POSITION"""  # nosec:B608
+        ret = await self.conn.execute_query_dict(sql, [self.database, *tables])
         for row in ret:
-            unique = index = False
-            if (non_unique := row["NON_UNIQUE"]) is not None:
-                unique = not non_unique
-            if (index_name := row["INDEX_NAME"]) is not None:
-                index = index_name != "PRIMARY"
-            columns.append(
+            columns.setdefault(row["TABLE_NAME"], []).append(
                 Column(
                     name=row["COLUMN_NAME"],
                     data_type=row["DATA_TYPE"],
@@ -53,14 +59,76 @@ where c.TABLE_SCHEMA = %s
                     default=row["COLUMN_DEFAULT"],
                     pk=row["COLUMN_KEY"] == "PRI",
                     comment=row["COLUMN_COMMENT"],
-                    unique=row["COLUMN_KEY"] == "UNI",
+                    unique=False,
                     extra=row["EXTRA"],
-                    # TODO: why `unque`?
-                    unque=unique,  # type:ignore
-                    index=index,
+                    index=False,
                     length=row["CHARACTER_MAXIMUM_LENGTH"],
                     max_digits=row["NUMERIC_PRECISION"],
                     decimal_places=row["NUMERIC_SCALE"],
                 )
             )
         return columns
+
+    async def get_tables_indexes(self, tables: list[str]) -> dict[str, list[TableIndex]]:
+        if not tables:
+            return {}
+        sql = f"""select s.TABLE_NAME, s.INDEX_NAME, s.NON_UNIQUE, s.INDEX_TYPE, s.COLUMN_NAME
+from information_schema.STATISTICS s
+where s.TABLE_SCHEMA = %s
+  and s.TABLE_NAME in ({", ".join(["%s"] * len(tables))})
+  and s.INDEX_NAME != 'PRIMARY'
+order by s.TABLE_NAME, s.INDEX_NAME, s.SEQ_IN_INDEX"""  # nosec:B608
+        indexes: dict[tuple[str, str], list[dict]] = {}
+        for row in await self.conn.execute_query_dict(sql, [self.database, *tables]):
+            indexes.setdefault((row["TABLE_NAME"], row["INDEX_NAME"]), []).append(row)
+        ret: dict[str, list[TableIndex]] = {}
+        for (table, name), rows in indexes.items():
+            if any(row["COLUMN_NAME"] is None for row in rows):
+                # the functional key parts are not supported by the models
+                continue
+            index_type = rows[0]["INDEX_TYPE"].lower()
+            ret.setdefault(table, []).append(
+                TableIndex(
+                    name=name,
+                    columns=[row["COLUMN_NAME"] for row in rows],
+                    unique=not int(rows[0]["NON_UNIQUE"]),
+                    type=None if index_type == "btree" else index_type,
+                )
+            )
+        return ret
+
+    async def get_tables_foreign_keys(self, tables: list[str]) -> dict[str, list[TableForeignKey]]:
+        if not tables:
+            return {}
+        sql = f"""select k.TABLE_NAME,
+       k.CONSTRAINT_NAME,
+       k.COLUMN_NAME,
+       k.REFERENCED_TABLE_NAME,
+       k.REFERENCED_COLUMN_NAME,
+       r.DELETE_RULE
+from information_schema.KEY_COLUMN_USAGE k
+         join information_schema.REFERENTIAL_CONSTRAINTS r
+              on r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA
+                  and r.TABLE_NAME = k.TABLE_NAME
+                  and r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+where k.TABLE_SCHEMA = %s
+  and k.TABLE_NAME in ({", ".join(["%s"] * len(tables))})
+  and k.REFERENCED_TABLE_NAME is not null
+order by k.TABLE_NAME, k.CONSTRAINT_NAME, k.ORDINAL_POSITION"""  # nosec:B608
+        constraints: dict[tuple[str, str], list[dict]] = {}
+        for row in await self.conn.execute_query_dict(sql, [self.database, *tables]):
+            constraints.setdefault((row["TABLE_NAME"], row["CONSTRAINT_NAME"]), []).append(row)
+        ret: dict[str, list[TableForeignKey]] = {}
+        for (table, _), rows in constraints.items():
+            if len(rows) != 1:
+                # the foreign key of multiple columns is not supported by the models
+                continue
+            ret.setdefault(table, []).append(
+                TableForeignKey(
+                    column=rows[0]["COLUMN_NAME"],
+                    to_table=rows[0]["REFERENCED_TABLE_NAME"],
+                    to_column=rows[0]["REFERENCED_COLUMN_NAME"],
+                    on_delete=rows[0]["DELETE_RULE"],
+                )
+            )
+        return ret
@@ -1,19 +1,46 @@
 from __future__ import annotations
 
+from functools import cached_property
 from typing import TYPE_CHECKING
 
-from aerich.inspectdb import Column, FieldMapDict, Inspect
+from aerich.inspectdb import Column, FieldMapDict, Inspect, TableForeignKey, TableIndex
 
 if TYPE_CHECKING:
     from tortoise.backends.base_postgres.client import BasePostgresClient
 
 
 class InspectPostgres(Inspect):
-    def __init__(self, conn: "BasePostgresClient", tables: list[str] | None = None) -> None:
-        super().__init__(conn, tables)
+    _index_classes = {
+        method: f"tortoise.contrib.postgres.indexes.{name}Index"
+        for method, name in (
+            ("bloom", "Bloom"),
+            ("brin", "Brin"),
+            ("gin", "Gin"),
+            ("gist", "Gist"),
+            ("hash", "Hash"),
+            ("spgist", "SpGist"),
+        )
+    }
+
+    _on_delete_rules = {
+        "a": "NO ACTION",
+        "r": "RESTRICT",
+        "c": "CASCADE",
+        "n": "SET NULL",
+        "d": "SET DEFAULT",
+    }
+
+    def __init__(
+        self,
+        conn: "BasePostgresClient",
+        tables: list[str] | None = None,
+        concurrency: int = 5,
+        app: str = "models",
+    ) -> None:
+        super().__init__(conn, tables, concurrency, app)
         self.schema = conn.server_settings.get("schema") or "public"
 
-    @property
+    @cached_property
     def field_map(self) -> FieldMapDict:
         return {
             "int2": self.smallint_field,
@@ -43,9 +70,16 @@ class InspectPostgres(Inspect):
         return list(map(lambda x: x["table_name"], ret))
 
     async def get_columns(self, table: str) -> list[Column]:
-        columns = []
-        sql = f"""select c.column_name,
-       col_description('public.{table}'::regclass, ordinal_position) as column_comment,
+        return (await self.get_tables_columns([table])).get(table, [])
+
+    async def get_tables_columns(self, tables: list[str]) -> dict[str, list[Column]]:
+        columns: dict[str, list[Column]] = {}
+        sql = """select c.table_name,
+       c.column_name,
+       col_description(
+           (quote_ident(c.table_schema) || '.' || quote_ident(c.table_name))::regclass,
+           c.ordinal_position
+       ) as column_comment,
        t.constraint_type as column_key,
        udt_name as data_type,
        is_nullable,
@@ -58,11 +92,12 @@ from information_schema.constraint_column_usage const
               using (table_catalog, table_schema, table_name, constraint_catalog, constraint_schema, constraint_name)
          right join information_schema.columns c using (column_name, table_catalog, table_schema, table_name)
 where c.table_catalog = $1
-  and c.table_name = $2
-  and c.table_schema = $3"""  # nosec:B608
-        ret = await self.conn.execute_query_dict(sql, [self.database, table, self.schema])
+  and c.table_name::text = any($2::text[])
+  and c.table_schema = $3
+order by c.table_name, c.ordinal_position"""
+        ret = await self.conn.execute_query_dict(sql, [self.database, tables, self.schema])
         for row in ret:
-            columns.append(
+            columns.setdefault(row["table_name"], []).append(
                 Column(
                     name=row["column_name"],
                     data_type=row["data_type"],
@@ -73,8 +108,70 @@ where c.table_catalog = $1
                     decimal_places=row["numeric_scale"],
                     comment=row["column_comment"],
                     pk=row["column_key"] == "PRIMARY KEY",
-                    unique=False,  # can't get this simply
-                    index=False,  # can't get this simply
+                    unique=False,
+                    index=False,
                 )
             )
         return columns
+
+    async def get_tables_indexes(self, tables: list[str]) -> dict[str, list[TableIndex]]:
+        # the indexes of expressions and the partial indexes are not supported by the models
+        sql = """select t.relname as table_name,
+       i.relname as index_name,
+       ix.indisunique as is_unique,
+       am.amname as method,
+       array(select a.attname
+             from unnest(ix.indkey::int2[]) with ordinality as k(attnum, n)
+                      join pg_attribute a on a.attrelid = t.oid and a.attnum = k.attnum
+             order by k.n) as columns
+from pg_index ix
+         join pg_class t on t.oid = ix.indrelid
+         join pg_class i on i.oid = ix.indexrelid
+         join pg_am am on am.oid = i.relam
+         join pg_namespace n on n.oid = t.relnamespace
+where n.nspname = $1
+  and t.relname = any($2::text[])
+  and not ix.indisprimary
+  and ix.indexprs is null
+  and ix.indpred is null
+order by t.relname, i.relname"""
+        ret: dict[str, list[TableIndex]] = {}
+        for row in await self.conn.execute_query_dict(sql, [self.schema, tables]):
+            ret.setdefault(row["table_name"], []).append(
+                TableIndex(
+                    name=row["index_name"],
+                    columns=list(row["columns"]),
+                    unique=row["is_unique"],
+                    type=None if row["method"] == "btree" else row["method"],
+                )
+            )
+        return ret
+
+    async def get_tables_foreign_keys(self, tables: list[str]) -> dict[str, list[TableForeignKey]]:
+        sql = """select t.relname as table_name,
+       a.attname as column_name,
+       rt.relname as to_table,
+       ra.attname as to_column,
+       c.confdeltype as on_delete
+from pg_constraint c
+         join pg_class t on t.oid = c.conrelid
+         join pg_namespace n on n.oid = t.relnamespace
+         join pg_class rt on rt.oid = c.confrelid
+         join pg_attribute a on a.attrelid = c.conrelid and a.attnum = c.conkey[1]
+         join pg_attribute ra on ra.attrelid = c.confrelid and ra.attnum = c.confkey[1]
+where c.contype = 'f'
+  and cardinality(c.conkey) = 1
+  and n.nspname = $1
+  and t.relname = any($2::text[])
+order by t.relname, c.conname"""
+        ret: dict[str, list[TableForeignKey]] = {}
+        for row in await self.conn.execute_query_dict(sql, [self.schema, tables]):
+            ret.setdefault(row["table_name"], []).append(
+                TableForeignKey(
+                    column=row["column_name"],
+                    to_table=row["to_table"],
+                    to_column=row["to_column"],
+                    on_delete=self._on_delete_rules[row["on_delete"]],
+                )
+            )
+        return ret
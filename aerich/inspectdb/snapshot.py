@@ -0,0 +1,325 @@
+"""
+Snapshots of the catalog of a database: the tables with their columns, indexes and foreign keys,
+dumped to a compact dict (JSON), to compare a database with another one or with the models
+offline, without querying the catalog again.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+from typing import Any, Iterable, Sequence
+
+from aerich.exceptions import SnapshotError
+from aerich.inspectdb import Column, Table, TableForeignKey, TableIndex, fold_indexes
+from aerich.utils import get_models_describe
+
+#: version of the format of the snapshots
+SNAPSHOT_VERSION = 1
+#: values of the fields of `Column` that are omitted in the snapshots
+_COLUMN_DEFAULTS: dict[str, Any] = {
+    "null": False,
+    "default": None,
+    "pk": False,
+    "unique": False,
+    "index": False,
+}
+
+
+def _compact(obj: Any) -> dict:
+    """
+    :return: fields of the dataclass, without the ones that are None, False or empty
+    """
+    return {
+        name: value
+        for name, value in dataclasses.asdict(obj).items()
+        if value is not None and value is not False and value != []
+    }
+
+
+def dump_tables(tables: Iterable[Table], dialect: str) -> dict:
+    """
+    :param tables: tables of the catalog, e.g.: from `Inspect.inspect_tables`
+    :param dialect: dialect of the database, the data types and the defaults are specific to it
+    :return: the snapshot, which can be dumped to JSON
+    """
+    return {
+        "version": SNAPSHOT_VERSION,
+        "dialect": dialect,
+        "tables": [
+            {
+                "name": table.name,
+                "columns": [_compact(column) for column in table.columns],
+                "indexes": [_compact(index) for index in table.indexes],
+                "foreign_keys": [_compact(foreign_key) for foreign_key in table.foreign_keys],
+            }
+            for table in tables
+        ],
+    }
+
+
+def load_tables(snapshot: dict) -> list[Table]:
+    """
+    :param snapshot: the snapshot of `dump_tables`
+    :return: tables of the snapshot
+    """
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version: {snapshot.get('version')!r}")
+    try:
+        return [
+            Table(
+                name=table["name"],
+                columns=[Column(**{**_COLUMN_DEFAULTS, **column}) for column in table["columns"]],
+                indexes=[TableIndex(**index) for index in table.get("indexes", [])],
+                foreign_keys=[TableForeignKey(**fk) for fk in table.get("foreign_keys", [])],
+            )
+            for table in snapshot["tables"]
+        ]
+    except (KeyError, TypeError) as e:
+        raise SnapshotError(f"Invalid snapshot: {e}") from e
+
+
+def get_describe_columns(describe: dict) -> dict[str, str]:
+    """
+    :param describe: describe of a model
+    :return: column of each field, the relation fields are the columns of their source fields
+    """
+    fields = [describe["pk_field"], *describe["data_fields"]]
+    ret = {field["name"]: field["db_column"] for field in fields}
+    for field in describe.get("fk_fields", []) + describe.get("o2o_fields", []):
+        ret[field["name"]] = ret[field["raw_field"]]
+    return ret
+
+
+def get_describe_index(index: Any) -> tuple[Sequence[str], str | None]:
+    """
+    :param index: index of the describe, a tuple of the fields, an `Index` or its describe
+    :return: fields and method of the index, no fields for the indexes of expressions
+    """
+    if isinstance(index, (tuple, list)):
+        return index, None
+    if isinstance(index, dict):
+        return index.get("fields") or [], (index.get("type") or "").lower() or None
+    return index.fields, getattr(index, "INDEX_TYPE", "").lower() or None
+
+
+def _get_model_table(describe: dict, describes: dict[str, dict]) -> Table:
+    pk_field = describe["pk_field"]
+    fields_map = get_describe_columns(describe)
+    columns = []
+    for field in [pk_field, *describe["data_fields"]]:
+        pk = field is pk_field
+        unique = bool(field.get("unique")) and not pk
+        columns.append(
+            Column(
+                name=field["db_column"],
+                data_type=field["field_type"],
+                null=field["nullable"],
+                default=None,
+                pk=pk,
+                unique=unique,
+                index=bool(field.get("indexed")) and not unique and not pk,
+                comment=field.get("description"),
+            )
+        )
+    indexes = [
+        TableIndex(name="", columns=[fields_map[name] for name in fields], unique=True)
+        for fields in describe.get("unique_together", [])
+    ]
+    for index in describe.get("indexes", []):
+        fields, index_type = get_describe_index(index)
+        if fields:
+            # the indexes of expressions are not in the catalog of inspectdb either
+            indexes.append(
+                TableIndex(name="", columns=[fields_map[name] for name in fields], type=index_type)
+            )
+    foreign_keys = []
+    for field in describe.get("fk_fields", []) + describe.get("o2o_fields", []):
+        if not field.get("db_constraint") or not (to := describes.get(field["python_type"])):
+            continue
+        foreign_keys.append(
+            TableForeignKey(
+                column=fields_map[field["raw_field"]],
+                to_table=to["table"],
+                to_column=to["pk_field"]["db_column"],
+                on_delete=str(field["on_delete"]),
+            )
+        )
+    return Table(
+        name=describe["table"],
+        columns=columns,
+        indexes=fold_indexes(columns, indexes),
+        foreign_keys=foreign_keys,
+    )
+
+
+def _get_through_table(describe: dict, field: dict, to: dict) -> Table:
+    columns, foreign_keys = [], []
+    for key, related in ((field["backward_key"], describe), (field["forward_key"], to)):
+        columns.append(
+            Column(
+                name=key,
+                data_type=related["pk_field"]["field_type"],
+                null=False,
+                default=None,
+                pk=False,
+                unique=False,
+                index=False,
+            )
+        )
+        foreign_keys.append(
+            TableForeignKey(
+                column=key,
+                to_table=related["table"],
+                to_column=related["pk_field"]["db_column"],
+                on_delete=str(field["on_delete"]),
+            )
+        )
+    return Table(
+        name=field["through"],
+        columns=columns,
+        # the unique index that tortoise creates by default
+        indexes=[TableIndex(name="", columns=[column.name for column in columns], unique=True)],
+        foreign_keys=foreign_keys,
+    )
+
+
+def get_describe_tables(describes: dict[str, dict]) -> list[Table]:
+    """
+    The tables that the models create, from their describe (e.g.: `Aerich.content`), without a
+    connection. The data types are the names of the field classes, which can't be compared with
+    the ones of a database
+    :param describes: describe of each model, see `aerich.utils.get_models_describe`
+    :return: tables of the models, and of their many to many relations
+    """
+    tables = {describe["table"] for describe in describes.values()}
+    ret = []
+    for describe in describes.values():
+        ret.append(_get_model_table(describe, describes))
+        for field in describe.get("m2m_fields", []):
+            # the through table of the both sides once, unless it's a model
+            if field.get("_generated") or field["through"] in tables:
+                continue
+            if to := describes.get(field["model_name"]):
+                tables.add(field["through"])
+                ret.append(_get_through_table(describe, field, to))
+    return ret
+
+
+def get_models_tables(app: str) -> list[Table]:
+    """
+    :param app: app of the models, which only need to be initialized (e.g.:
+        `Tortoise.init_models`)
+    :return: tables of the models of the app, see `get_describe_tables`
+    """
+    return get_describe_tables(get_models_describe(app))
+
+
+@dataclasses.dataclass
+class Difference:
+    """
+    Difference of two catalogs
+    """
+
+    #: + for the one only in the target, - only in the source and ~ for the changed column
+    sign: str
+    table: str
+    #: the column, index or foreign key, of the source if changed, None for the table
+    item: Column | TableIndex | TableForeignKey | None
+    description: str
+    #: the changed attribute of the column
+    attr: str | None = None
+
+    def __str__(self) -> str:
+        return f"{self.sign} {self.description}"
+
+
+def _get_pks(tables: list[Table]) -> dict[str, str]:
+    """
+    :return: the primary key column of each table, to which the foreign keys without `to_column`
+        refer
+    """
+    return {table.name: column.name for table in tables for column in table.columns if column.pk}
+
+
+def _diff_keys(table: str, source: dict[Any, tuple], target: dict[Any, tuple]) -> list[Difference]:
+    """
+    :param source: (item, description) of each key of the source
+    :param target: (item, description) of each key of the target
+    :return: the keys only in the source and only in the target, sorted by the descriptions
+    """
+    ret = [Difference("-", table, *source[key]) for key in source.keys() - target.keys()]
+    ret.sort(key=str)
+    added = [Difference("+", table, *target[key]) for key in target.keys() - source.keys()]
+    return ret + sorted(added, key=str)
+
+
+def _get_indexes(table: Table) -> dict[Any, tuple]:
+    ret = {}
+    for index in table.indexes:
+        description = f"index {table.name}({', '.join(index.columns)})"
+        if index.unique:
+            description += " unique"
+        if index.type:
+            description += f" using {index.type}"
+        ret[(tuple(index.columns), index.unique, index.type)] = (index, description)
+    return ret
+
+
+def _get_foreign_keys(table: Table, pks: dict[str, str]) -> dict[Any, tuple]:
+    ret = {}
+    for fk in table.foreign_keys:
+        to_column = fk.to_column or pks.get(fk.to_table)
+        description = (
+            f"foreign key {table.name}.{fk.column} -> {fk.to_table}.{to_column}"
+            f" on delete {fk.on_delete}"
+        )
+        ret[(fk.column, fk.to_table, to_column, fk.on_delete)] = (fk, description)
+    return ret
+
+
+def diff_tables(source: list[Table], target: list[Table], types: bool = True) -> list[Difference]:
+    """
+    Diff the tables of two catalogs, the names of the indexes are ignored
+    :param source: e.g.: the tables of a snapshot of production, or of the models
+    :param target: e.g.: the tables of a snapshot of staging
+    :param types: compare the data types, the lengths, the defaults and the comments, which are
+        only comparable between the catalogs of the same dialect
+    :return: the differences, the tables first and then the ones in each table
+    """
+    source_tables = {table.name: table for table in source}
+    target_tables = {table.name: table for table in target}
+    source_pks, target_pks = _get_pks(source), _get_pks(target)
+    ret = [
+        Difference("-", name, None, f"table {name}")
+        for name in sorted(source_tables.keys() - target_tables.keys())
+    ]
+    ret += [
+        Difference("+", name, None, f"table {name}")
+        for name in sorted(target_tables.keys() - source_tables.keys())
+    ]
+    attrs = ["null", "pk", "unique", "index"]
+    if types:
+        attrs += ["data_type", "length", "max_digits", "decimal_places", "default", "comment"]
+    for name in sorted(source_tables.keys() & target_tables.keys()):
+        source_table, target_table = source_tables[name], target_tables[name]
+        source_columns = {column.name: column for column in source_table.columns}
+        target_columns = {column.name: column for column in target_table.columns}
+        ret += _diff_keys(
+            name,
+            {key: (column, f"column {name}.{key}") for key, column in source_columns.items()},
+            {key: (column, f"column {name}.{key}") for key, column in target_columns.items()},
+        )
+        for key in sorted(source_columns.keys() & target_columns.keys()):
+            for attr in attrs:
+                old = getattr(source_columns[key], attr)
+                new = getattr(target_columns[key], attr)
+                if old != new:
+                    description = f"column {name}.{key}: {attr} {old!r} -> {new!r}"
+                    ret.append(Difference("~", name, source_columns[key], description, attr))
+        ret += _diff_keys(name, _get_indexes(source_table), _get_indexes(target_table))
+        ret += _diff_keys(
+            name,
+            _get_foreign_keys(source_table, source_pks),
+            _get_foreign_keys(target_table, target_pks),
+        )
+    return ret
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
-from aerich.inspectdb import Column, FieldMapDict, Inspect
+import json
+from functools import cached_property
+
+from aerich.inspectdb import Column, FieldMapDict, Inspect, Table, TableForeignKey, TableIndex
 
 
 class InspectSQLite(Inspect):
-    @property
+    @cached_property
     def field_map(self) -> FieldMapDict:
         return {
             "INTEGER": self.int_field,
@@ -22,37 +25,101 @@ class InspectSQLite(Inspect):
         }
 
     async def get_columns(self, table: str) -> list[Column]:
-        columns = []
-        sql = f"PRAGMA table_info({table})"
-        ret = await self.conn.execute_query_dict(sql)
-        columns_index = await self._get_columns_index(table)
-        for row in ret:
-            try:
-                length = row["type"].split("(")[1].split(")")[0]
-            except IndexError:
-                length = None
-            columns.append(
-                Column(
-                    name=row["name"],
-                    data_type=row["type"].split("(")[0],
-                    null=row["notnull"] == 0,
-                    default=row["dflt_value"],
-                    length=length,
-                    pk=row["pk"] == 1,
-                    unique=columns_index.get(row["name"]) == "unique",
-                    index=columns_index.get(row["name"]) == "index",
+        return (await self.get_tables_columns([table])).get(table, [])
+
+    async def get_tables_columns(self, tables: list[str]) -> dict[str, list[Column]]:
+        return {table.name: table.columns for table in await self.get_tables(tables)}
+
+    async def get_tables_indexes(self, tables: list[str]) -> dict[str, list[TableIndex]]:
+        return {table.name: table.indexes for table in await self.get_tables(tables)}
+
+    async def get_tables_foreign_keys(self, tables: list[str]) -> dict[str, list[TableForeignKey]]:
+        return {table.name: table.foreign_keys for table in await self.get_tables(tables)}
+
+    async def get_tables(self, tables: list[str]) -> list[Table]:
+        # one row of the catalog of each table, the names are passed as one json array, which
+        # isn't limited by the max number of the parameters. json() keeps the nested arrays as
+        # json instead of strings
+        sql = """select m.name as table_name,
+       (select json_group_array(json_object(
+                   'name', p.name, 'type', p.type, 'notnull', p."notnull",
+                   'dflt_value', p.dflt_value, 'pk', p.pk))
+        from pragma_table_info(m.name) p) as columns,
+       (select json_group_array(json_object(
+                   'name', l.name, 'unique', l."unique", 'origin', l.origin,
+                   'columns', json((select json_group_array(i.name)
+                                    from (select name from pragma_index_info(l.name)
+                                          order by seqno) i))))
+        from pragma_index_list(m.name) l) as indexes,
+       (select json_group_array(json_object(
+                   'id', f.id, 'from', f."from", 'table', f."table", 'to', f."to",
+                   'on_delete', f.on_delete))
+        from pragma_foreign_key_list(m.name) f) as foreign_keys
+from sqlite_master m
+where m.type = 'table' and m.name in (select value from json_each(?))"""
+        rows = {
+            row["table_name"]: row
+            for row in await self.conn.execute_query_dict(sql, [json.dumps(tables)])
+        }
+        ret = []
+        for table in tables:
+            if not (row := rows.get(table)):
+                ret.append(Table(name=table, columns=[]))
+                continue
+            columns_index, indexes = {}, []
+            # in the order of index_list, the same as the previous PRAGMA index_list
+            for index in json.loads(row["indexes"]):
+                if index["origin"] == "pk":
+                    continue
+                if len(index["columns"]) == 1:
+                    columns_index[index["columns"][0]] = "unique" if index["unique"] else "index"
+                else:
+                    indexes.append(
+                        TableIndex(
+                            name=index["name"],
+                            columns=index["columns"],
+                            unique=bool(index["unique"]),
+                        )
+                    )
+            columns = []
+            for column in json.loads(row["columns"]):
+                try:
+                    length = int(column["type"].split("(")[1].split(")")[0])
+                except (IndexError, ValueError):
+                    length = None
+                columns.append(
+                    Column(
+                        name=column["name"],
+                        data_type=column["type"].split("(")[0],
+                        null=column["notnull"] == 0,
+                        default=column["dflt_value"],
+                        length=length,
+                        pk=column["pk"] == 1,
+                        unique=columns_index.get(column["name"]) == "unique",
+                        index=columns_index.get(column["name"]) == "index",
+                    )
+                )
+            foreign_keys: dict[int, list[dict]] = {}
+            for foreign_key in json.loads(row["foreign_keys"]):
+                foreign_keys.setdefault(foreign_key["id"], []).append(foreign_key)
+            ret.append(
+                Table(
+                    name=table,
+                    columns=columns,
+                    indexes=indexes,
+                    foreign_keys=[
+                        TableForeignKey(
+                            column=fks[0]["from"],
+                            to_table=fks[0]["table"],
+                            to_column=fks[0]["to"],
+                            on_delete=fks[0]["on_delete"],
+                        )
+                        # the foreign key of multiple columns is not supported by the models
+                        for fks in foreign_keys.values()
+                        if len(fks) == 1
+                    ],
                 )
             )
-        return columns
-
-    async def _get_columns_index(self, table: str) -> dict[str, str]:
-        sql = f"PRAGMA index_list ({table})"
-        indexes = await self.conn.execute_query_dict(sql)
-        ret = {}
-        for index in indexes:
-            sql = f"PRAGMA index_info({index['name']})"
-            index_info = (await self.conn.execute_query_dict(sql))[0]
-            ret[index_info["name"]] = "unique" if index["unique"] else "index"
         return ret
 
     async def get_all_tables(self) -> list[str]:
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import importlib
+import json
 import os
+from copy import deepcopy
 from datetime import datetime
 from pathlib import Path
 from typing import Iterable, Optional, Union, cast
@@ -9,23 +11,85 @@ from typing import Iterable, Optional, Union, cast
 import asyncclick as click
 import tortoise
 from dictdiffer import diff
-from tortoise import BaseDBAsyncClient, Model, Tortoise
+from tortoise import Model, Tortoise
 from tortoise.exceptions import OperationalError
 from tortoise.indexes import Index
-
-from aerich.coder import load_index
-from aerich.ddl import BaseDDL
-from aerich.models import MAX_VERSION_LENGTH, Aerich
+from tortoise.utils import get_schema_sql
+
+from aerich.capabilities import Capabilities
+from aerich.coder import JsonEncoder, decoder, load_index
+from aerich.ddl import STATEMENT_SEPARATOR, BaseDDL
+from aerich.exceptions import SnapshotError, SquashError
+from aerich.inspectdb import TableForeignKey, TableIndex
+from aerich.inspectdb.snapshot import (
+    Difference,
+    diff_tables,
+    get_describe_columns,
+    get_describe_index,
+    get_describe_tables,
+    get_models_tables,
+)
+from aerich.models import (
+    AERICH_TABLE_APP,
+    AERICH_TABLE_VERSION,
+    MAX_VERSION_LENGTH,
+    Aerich,
+    AerichCheckpoint,
+)
+from aerich.operations import (
+    AddColumn,
+    AddFK,
+    AddIndex,
+    AlterColumnDefault,
+    AlterColumnNull,
+    ChangeColumn,
+    CreateM2M,
+    CreateTable,
+    DropColumn,
+    DropFK,
+    DropIndex,
+    DropM2M,
+    DropTable,
+    ModelOperation,
+    ModifyColumn,
+    Operation,
+    RebuildTable,
+    RenameColumn,
+    RenameTable,
+    SetComment,
+)
+from aerich.profiler import phase
 from aerich.utils import (
     get_app_connection,
     get_dict_diff_by_key,
     get_models_describe,
+    import_py_file,
     is_default_function,
 )
 
 MIGRATE_TEMPLATE = """from tortoise import BaseDBAsyncClient
 
 
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return \"\"\"
+        {upgrade_sql}\"\"\"
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return \"\"\"
+        {downgrade_sql}\"\"\"
+"""
+
+#: suffix of the files generated by `Migrate.squash`
+SQUASHED_SUFFIX = "_squashed.py"
+
+SQUASH_TEMPLATE = """from tortoise import BaseDBAsyncClient
+
+# the squashed versions, the databases that have applied them treat this file as applied
+REPLACES = {replaces}
+{lock_settings}
+
+
 async def upgrade(db: BaseDBAsyncClient) -> str:
     return \"\"\"
         {upgrade_sql}\"\"\"
@@ -40,11 +104,14 @@ async def downgrade(db: BaseDBAsyncClient) -> str:
 class Migrate:
     upgrade_operators: list[str] = []
     downgrade_operators: list[str] = []
-    _upgrade_fk_m2m_index_operators: list[str] = []
-    _downgrade_fk_m2m_index_operators: list[str] = []
+    _upgrade_operations: list[Operation] = []
+    _downgrade_operations: list[Operation] = []
     _upgrade_m2m: list[str] = []
     _downgrade_m2m: list[str] = []
     _aerich = Aerich.__name__
+    _aerich_checkpoint = AerichCheckpoint.__name__
+    # columns added to the aerich table after it's released
+    _aerich_new_fields = ("applied_at", "duration", "timings")
     _rename_fields: dict[str, dict[str, str]] = {}  # {'model': {'old_field': 'new_field'}}
 
     ddl: BaseDDL
@@ -53,7 +120,8 @@ class Migrate:
     app: str
     migrate_location: Path
     dialect: str
-    _db_version: Optional[str] = None
+    #: generate the migrations from the snapshot of the last migration file, without a database
+    offline: bool = False
 
     @staticmethod
     def get_field_by_name(name: str, fields: list[dict]) -> dict:
@@ -78,42 +146,141 @@ class Migrate:
     def _get_model(cls, model: str) -> type[Model]:
         return Tortoise.apps[cls.app].get(model)  # type: ignore
 
+    @staticmethod
+    def get_snapshot_file(version_file: Path) -> Path:
+        """
+        :return: the snapshot of the models of the migration file, which is written next to it
+        """
+        return version_file.with_suffix(".json")
+
+    @classmethod
+    def write_snapshot(cls, version_file: Path, content: dict, server_version: str) -> None:
+        """
+        Write the describe of the models that the migration file leads to, compact since it's
+        committed with the migrations
+        :param server_version: of the database that the DDL is picked for, see `Capabilities`,
+            so the next migration generated offline picks the same DDL
+        """
+        snapshot = {"server_version": server_version, "models": content}
+        cls.get_snapshot_file(version_file).write_text(
+            json.dumps(snapshot, cls=JsonEncoder, separators=(",", ":")), encoding="utf-8"
+        )
+
+    @classmethod
+    def load_snapshot(cls) -> dict:
+        """
+        :return: the snapshot of the last migration file, see `write_snapshot`
+        """
+        version_files = cls.get_all_version_files()
+        if not version_files:
+            raise SnapshotError("No migration file, you need to run `aerich init-db` first")
+        snapshot_file = cls.get_snapshot_file(Path(cls.migrate_location, version_files[-1]))
+        if not snapshot_file.exists():
+            raise SnapshotError(
+                f"No snapshot of {version_files[-1]}, generate a migration with the database "
+                "connected once"
+            )
+        return decoder(snapshot_file.read_text(encoding="utf-8"))
+
     @classmethod
     async def get_last_version(cls) -> Optional[Aerich]:
         try:
-            return await Aerich.filter(app=cls.app).first()
+            # without the columns that the aerich table created by an older aerich lacks until
+            # `migrate_aerich_table`
+            return await Aerich.filter(app=cls.app).only("id", "version", "app", "content").first()
         except OperationalError:
             return None
 
-    @classmethod
-    async def _get_db_version(cls, connection: BaseDBAsyncClient) -> None:
-        if cls.dialect == "mysql":
-            sql = "select version() as version"
-            ret = await connection.execute_query(sql)
-            cls._db_version = ret[1][0].get("version")
-
     @classmethod
     async def load_ddl_class(cls) -> type[BaseDDL]:
         ddl_dialect_module = importlib.import_module(f"aerich.ddl.{cls.dialect}")
         return getattr(ddl_dialect_module, f"{cls.dialect.capitalize()}DDL")
 
     @classmethod
-    async def init(cls, config: dict, app: str, location: str) -> None:
-        await Tortoise.init(config=config)
-        last_version = await cls.get_last_version()
+    async def init(cls, config: dict, app: str, location: str, offline: bool = False) -> None:
+        """
+        :param offline: don't connect to the database, the last version and the server version
+            are loaded from the snapshot of the last migration file
+        """
+        with phase("Tortoise.init"):
+            # the connections are created lazily, on the first query
+            await Tortoise.init(config=config)
+        connection = get_app_connection(config, app)
+        cls.dialect = connection.schema_generator.DIALECT
+        cls.ddl_class = await cls.load_ddl_class()
+        cls.offline = offline
+        if offline:
+            cls.app = app
+            cls.migrate_location = Path(location, app)
+            with phase("snapshot load"):
+                snapshot = cls.load_snapshot()
+            cls.ddl = cls.ddl_class(
+                connection, Capabilities(cls.dialect, snapshot["server_version"])
+            )
+            cls._last_version_content = snapshot["models"]
+            return
+        capabilities = await Capabilities.detect(connection, cls.dialect)
+        cls.ddl = cls.ddl_class(connection, capabilities)
+
+        with phase("snapshot load"):
+            last_version = await cls.get_last_version()
         cls.app = app
         cls.migrate_location = Path(location, app)
         if last_version:
             cls._last_version_content = cast(dict, last_version.content)
 
-        connection = get_app_connection(config, app)
-        cls.dialect = connection.schema_generator.DIALECT
-        cls.ddl_class = await cls.load_ddl_class()
-        cls.ddl = cls.ddl_class(connection)
-        await cls._get_db_version(connection)
+    @classmethod
+    async def migrate_aerich_table(cls) -> list[str]:
+        """
+        Evolve the aerich table created by an older aerich: add the missing columns, and the
+        unique index of (app, version) after deleting the duplicated versions. Run once, a row of
+        `AERICH_TABLE_APP` marks the table as evolved
+        :return: the changes made to the aerich table
+        """
+        conn = Aerich._meta.db
+        quote = cls.ddl.schema_generator.quote
+        table = quote(Aerich._meta.db_table)
+        try:
+            if await Aerich.exists(app=AERICH_TABLE_APP, version=AERICH_TABLE_VERSION):
+                return []
+        except OperationalError:
+            # not initialized yet
+            return []
+        changes = []
+        for name in cls._aerich_new_fields:
+            db_column = Aerich._meta.fields_db_projection[name]
+            # qualified, or sqlite takes the unknown column in double quotes as a string
+            column = quote(db_column)
+            try:
+                await conn.execute_query(f"SELECT {table}.{column} FROM {table} WHERE 1 = 0")
+            except OperationalError:
+                field_describe = Aerich._meta.fields_map[name].describe(False)
+                await conn.execute_script(cls.ddl.add_column(Aerich, field_describe))
+                changes.append(f"Added column {Aerich._meta.db_table}.{db_column}")
+        for unique_together in Aerich._meta.unique_together:
+            field_names = list(unique_together)
+            if await conn.execute_query_dict(cls.ddl.select_index(Aerich, field_names, True)):
+                continue
+            rows = await Aerich.all().order_by("id").values_list("id", *field_names)
+            # keep the last applied one of the duplicates, whose content is the latest
+            last = {tuple(values): pk for pk, *values in rows}
+            duplicated = [(pk, values) for pk, *values in rows if last[tuple(values)] != pk]
+            if duplicated:
+                await Aerich.filter(pk__in=[pk for pk, _ in duplicated]).delete()
+                changes.extend(
+                    f"Deleted duplicated row {pk} of {tuple(values)} from {Aerich._meta.db_table}"
+                    for pk, values in duplicated
+                )
+            await conn.execute_script(cls.ddl.add_index(Aerich, field_names, True))
+            changes.append(f"Added unique index of {tuple(field_names)} to {Aerich._meta.db_table}")
+        await Aerich.create(app=AERICH_TABLE_APP, version=AERICH_TABLE_VERSION, content={})
+        return changes
 
     @classmethod
     async def _get_last_version_num(cls) -> Optional[int]:
+        if cls.offline:
+            version_files = cls.get_all_version_files()
+            return int(version_files[-1].split("_", 1)[0]) if version_files else None
         last_version = await cls.get_last_version()
         if not last_version:
             return None
@@ -132,15 +299,26 @@ class Migrate:
         return version
 
     @classmethod
-    async def _generate_diff_py(cls, name) -> str:
+    async def _generate_diff_py(cls, name, snapshot: Optional[dict]) -> str:
+        """
+        :param snapshot: describe of the models after the migration, see `write_snapshot`
+        """
         version = await cls.generate_version(name)
         # delete if same version exists
         for version_file in cls.get_all_version_files():
             if version_file.startswith(version.split("_")[0]):
                 os.unlink(Path(cls.migrate_location, version_file))
+                cls.get_snapshot_file(Path(cls.migrate_location, version_file)).unlink(
+                    missing_ok=True
+                )
 
-        content = cls._get_diff_file_content()
-        Path(cls.migrate_location, version).write_text(content, encoding="utf-8")
+        with phase("write"):
+            content = cls._get_diff_file_content()
+            Path(cls.migrate_location, version).write_text(content, encoding="utf-8")
+            if snapshot is not None:
+                cls.write_snapshot(
+                    Path(cls.migrate_location, version), snapshot, cls.ddl.capabilities.version
+                )
         return version
 
     @classmethod
@@ -168,55 +346,201 @@ class Migrate:
         :return:
         """
         if empty:
-            return await cls._generate_diff_py(name)
-        new_version_content = get_models_describe(cls.app)
+            # the models are not migrated by it
+            return await cls._generate_diff_py(name, cls._last_version_content)
+        with phase("describe"):
+            new_version_content = get_models_describe(cls.app)
         last_version = cast(dict, cls._last_version_content)
-        cls.diff_models(last_version, new_version_content)
-        cls.diff_models(new_version_content, last_version, False)
+        with phase("diff"):
+            cls.diff_models(last_version, new_version_content)
+            cls.diff_models(new_version_content, last_version, False)
+
+        return await cls._render_diff_py(name, new_version_content)
 
-        cls._merge_operators()
+    @classmethod
+    async def _render_diff_py(cls, name: str, snapshot: dict) -> str:
+        """
+        render the operators of the diff and write them to a migration file
+        :param snapshot: see `_generate_diff_py`
+        :return: the version file, empty if there are no operators
+        """
+        with phase("render"):
+            cls._merge_operators()
+            cls.upgrade_operators = cls.ddl.merge_alter_operators(cls.upgrade_operators)
+            cls.downgrade_operators = cls.ddl.merge_alter_operators(cls.downgrade_operators)
 
         if not cls.upgrade_operators:
             return ""
 
-        return await cls._generate_diff_py(name)
+        return await cls._generate_diff_py(name, snapshot)
 
     @classmethod
-    def _get_diff_file_content(cls) -> str:
+    async def fix_drift(cls, differences: list[Difference], name: str) -> str:
         """
-        builds content for diff file from template
+        Generate a migration file that restores the tables, columns, indexes, foreign keys and
+        nullability that the database lost since the last migration. The extra ones in the
+        database are left as they are, they may be added on purpose
+        :param differences: from the last migration to the database, see `Command.check`
+        :param name: name of the migration
+        :return: the version file, empty if there is nothing to restore
         """
+        last_version = cast(dict, cls._last_version_content)
+        # the models that are gone can't be restored
+        expected = {
+            model: describe
+            for model, describe in last_version.items()
+            if cls._get_model(model.split(".")[1])
+        }
+        # the describe that the database matches
+        actual = deepcopy(expected)
+        tables = {describe["table"]: describe for describe in actual.values()}
+        through_tables = {
+            field["through"]: (describe, field)
+            for describe in actual.values()
+            for field in describe.get("m2m_fields", [])
+            if not field.get("_generated")
+        }
+        for difference in differences:
+            if difference.sign == "+":
+                continue
+            item = difference.item
+            describe = tables.get(difference.table)
+            if item is None:
+                if describe:
+                    actual.pop(describe["name"])
+                elif through := through_tables.get(difference.table):
+                    through[0]["m2m_fields"].remove(through[1])
+                continue
+            if describe is None:
+                # the columns of the through tables are not fields
+                continue
+            columns = get_describe_columns(describe)
+            if isinstance(item, TableIndex):
+                for key in ("unique_together", "indexes"):
+                    describe[key] = [
+                        index
+                        for index in describe.get(key, [])
+                        if [columns[field] for field in get_describe_index(index)[0]]
+                        != item.columns
+                    ]
+            elif isinstance(item, TableForeignKey):
+                cls._drop_relation_fields(describe, columns, item.column)
+            elif data_field := next(
+                (field for field in describe["data_fields"] if field["db_column"] == item.name),
+                None,
+            ):
+                if difference.sign == "-":
+                    describe["data_fields"].remove(data_field)
+                    cls._drop_relation_fields(describe, columns, item.name)
+                elif difference.attr in ("index", "unique") and getattr(item, difference.attr):
+                    data_field["indexed"] = data_field["unique"] = False
+                elif difference.attr == "null":
+                    data_field["nullable"] = not item.null
+        with phase("diff"):
+            cls.diff_models(deepcopy(actual), deepcopy(expected))
+            cls.diff_models(deepcopy(expected), actual, False)
+        # the models are not changed
+        return await cls._render_diff_py(name, last_version)
+
+    @staticmethod
+    def _drop_relation_fields(describe: dict, columns: dict[str, str], column: str) -> None:
+        """
+        drop the foreign key and one to one fields of the column from the describe of the model
+        """
+        for key in ("fk_fields", "o2o_fields"):
+            describe[key] = [
+                field for field in describe.get(key, []) if columns[field["raw_field"]] != column
+            ]
+
+    @classmethod
+    async def squash(cls, to: int) -> str:
+        """
+        Squash the migration files from the first one to the specified version into one file that
+        creates the tables of the models at the version, like `init-db`
+        :param to: number of the last version to squash, the models must be the ones in its
+            snapshot since the tables are created from them
+        :return: the squashed version file
+        """
+        version_files = [f for f in cls.get_all_version_files() if int(f.split("_", 1)[0]) <= to]
+        if len(version_files) < 2:
+            raise SquashError("Squash needs at least two migration files")
+        snapshot_file = cls.get_snapshot_file(Path(cls.migrate_location, version_files[-1]))
+        if not snapshot_file.exists():
+            raise SquashError(
+                f"No snapshot of {version_files[-1]}, generate a migration with aerich 0.9+ first"
+            )
+        snapshot = decoder(snapshot_file.read_text(encoding="utf-8"))
+        if diff_tables(get_describe_tables(snapshot["models"]), get_models_tables(cls.app)):
+            raise SquashError(
+                f"The models have changed since {version_files[-1]}, squash up to the version "
+                "that the models are at"
+            )
+        replaces: list[str] = []
+        lock_settings: dict[str, set] = {}
+        for version_file in version_files:
+            m = import_py_file(Path(cls.migrate_location, version_file))
+            # the versions squashed into a squashed file are replaced too
+            replaces.extend(getattr(m, "REPLACES", []))
+            replaces.append(version_file)
+            for name in ("LOCK_TIMEOUT", "LOCK_RETRIES"):
+                if hasattr(m, name):
+                    lock_settings.setdefault(name, set()).add(getattr(m, name))
+        if conflicts := [name for name, values in lock_settings.items() if len(values) > 1]:
+            raise SquashError(
+                f"The squashed files set different {', '.join(conflicts)}, make them the same "
+                "first"
+            )
+
+        last_version = version_files[-1].split("_", 1)[0]
+        now = datetime.now().strftime("%Y%m%d%H%M%S")
+        version = f"{last_version}_{now}{SQUASHED_SUFFIX}"
+        schema = get_schema_sql(cls.ddl.client, safe=True)
+        # the sql is evaluated from the string literals, escape it to write back
+        content = SQUASH_TEMPLATE.format(
+            replaces=repr(replaces),
+            lock_settings="".join(
+                f"{name} = {values.pop()!r}\n" for name, values in lock_settings.items()
+            ),
+            upgrade_sql=cls._join_sql(cls.ddl.split_statements(schema)).replace("\\", "\\\\"),
+            # like the file of init-db, downgrading it drops nothing
+            downgrade_sql="",
+        )
+        Path(cls.migrate_location, version).write_text(content, encoding="utf-8")
+        # the snapshot of the last squashed one is of the squashed file
+        snapshot_file.replace(cls.get_snapshot_file(Path(cls.migrate_location, version)))
+        for version_file in version_files:
+            os.unlink(Path(cls.migrate_location, version_file))
+            cls.get_snapshot_file(Path(cls.migrate_location, version_file)).unlink(missing_ok=True)
+        return version
 
-        def join_lines(lines: list[str]) -> str:
-            if not lines:
-                return ""
-            return ";\n        ".join(lines) + ";"
+    @staticmethod
+    def _join_sql(lines: list[str]) -> str:
+        if not lines:
+            return ""
+        return STATEMENT_SEPARATOR.join(lines) + ";"
 
+    @classmethod
+    def _get_diff_file_content(cls) -> str:
+        """
+        builds content for diff file from template
+        """
         return MIGRATE_TEMPLATE.format(
-            upgrade_sql=join_lines(cls.upgrade_operators),
-            downgrade_sql=join_lines(cls.downgrade_operators),
+            upgrade_sql=cls._join_sql(cls.upgrade_operators),
+            downgrade_sql=cls._join_sql(cls.downgrade_operators),
         )
 
     @classmethod
-    def _add_operator(cls, operator: str, upgrade: bool = True, fk_m2m_index: bool = False) -> None:
+    def _add_operator(cls, operator: Operation, upgrade: bool = True) -> None:
         """
-        add operator,differentiate fk because fk is order limit
+        add operator, it will be ordered and rendered to sql by `_merge_operators`
         :param operator:
         :param upgrade:
-        :param fk_m2m_index:
         :return:
         """
-        operator = operator.rstrip(";")
         if upgrade:
-            if fk_m2m_index:
-                cls._upgrade_fk_m2m_index_operators.append(operator)
-            else:
-                cls.upgrade_operators.append(operator)
+            cls._upgrade_operations.append(operator)
         else:
-            if fk_m2m_index:
-                cls._downgrade_fk_m2m_index_operators.append(operator)
-            else:
-                cls.downgrade_operators.append(operator)
+            cls._downgrade_operations.append(operator)
 
     @classmethod
     def _handle_indexes(cls, model: type[Model], indexes: list[Union[tuple[str], Index]]) -> list:
@@ -289,11 +613,7 @@ class Migrate:
                         add = True
                 if add:
                     ref_desc = cast(dict, new_models.get(new_value.get("model_name")))
-                    cls._add_operator(
-                        cls.create_m2m(model, new_value, ref_desc),
-                        upgrade,
-                        fk_m2m_index=True,
-                    )
+                    cls._add_operator(cls.create_m2m(model, new_value, ref_desc), upgrade)
             elif action == "remove":
                 add = False
                 if upgrade and table not in cls._upgrade_m2m:
@@ -303,7 +623,7 @@ class Migrate:
                     cls._downgrade_m2m.append(table)
                     add = True
                 if add:
-                    cls._add_operator(cls.drop_m2m(table), upgrade, True)
+                    cls._add_operator(cls.drop_m2m(table), upgrade)
 
     @classmethod
     def _handle_relational(
@@ -327,8 +647,7 @@ class Migrate:
             fk_field = cls.get_field_by_name(new_fk_field_name, new_fk_fields)
             if fk_field.get("db_constraint"):
                 ref_describe = cast(dict, new_models[fk_field["python_type"]])
-                sql = cls._add_fk(model, fk_field, ref_describe)
-                cls._add_operator(sql, upgrade, fk_m2m_index=True)
+                cls._add_operator(cls._add_fk(model, fk_field, ref_describe), upgrade)
         # drop
         for old_fk_field_name in set(old_fk_fields_name).difference(set(new_fk_fields_name)):
             old_fk_field = cls.get_field_by_name(
@@ -336,8 +655,7 @@ class Migrate:
             )
             if old_fk_field.get("db_constraint"):
                 ref_describe = cast(dict, old_models[old_fk_field["python_type"]])
-                sql = cls._drop_fk(model, old_fk_field, ref_describe)
-                cls._add_operator(sql, upgrade, fk_m2m_index=True)
+                cls._add_operator(cls._drop_fk(model, old_fk_field, ref_describe), upgrade)
 
     @classmethod
     def _handle_fk_fields(
@@ -380,9 +698,9 @@ class Migrate:
         :param upgrade:
         :return:
         """
-        _aerich = f"{cls.app}.{cls._aerich}"
-        old_models.pop(_aerich, None)
-        new_models.pop(_aerich, None)
+        for name in (cls._aerich, cls._aerich_checkpoint):
+            old_models.pop(f"{cls.app}.{name}", None)
+            new_models.pop(f"{cls.app}.{name}", None)
         models_with_rename_field: set[str] = set()  # models that trigger the click.prompt
 
         for new_model_str, new_model_describe in new_models.items():
@@ -395,6 +713,8 @@ class Migrate:
                     # we can't find origin model when downgrade, so skip
                     pass
             else:
+                operations = cls._upgrade_operations if upgrade else cls._downgrade_operations
+                start = len(operations)
                 old_model_describe = cast(dict, old_models.get(new_model_str))
                 # rename table
                 new_table = cast(str, new_model_describe.get("table"))
@@ -436,16 +756,16 @@ class Migrate:
                 )
                 # add unique_together
                 for index in new_unique_together.difference(old_unique_together):
-                    cls._add_operator(cls._add_index(model, index, True), upgrade, True)
+                    cls._add_operator(cls._add_index(model, index, True), upgrade)
                 # remove unique_together
                 for index in old_unique_together.difference(new_unique_together):
-                    cls._add_operator(cls._drop_index(model, index, True), upgrade, True)
+                    cls._add_operator(cls._drop_index(model, index, True), upgrade)
                 # add indexes
                 for idx in new_indexes.difference(old_indexes):
-                    cls._add_operator(cls._add_index(model, idx), upgrade, fk_m2m_index=True)
+                    cls._add_operator(cls._add_index(model, idx), upgrade)
                 # remove indexes
                 for idx in old_indexes.difference(new_indexes):
-                    cls._add_operator(cls._drop_index(model, idx), upgrade, fk_m2m_index=True)
+                    cls._add_operator(cls._drop_index(model, idx), upgrade)
                 old_data_fields = list(
                     filter(
                         lambda x: x.get("db_field_types") is not None,
@@ -530,8 +850,7 @@ class Migrate:
                                     # only MySQL8+ has rename syntax
                                     if (
                                         cls.dialect == "mysql"
-                                        and cls._db_version
-                                        and cls._db_version.startswith("5.")
+                                        and not cls.ddl.capabilities.rename_column
                                     ):
                                         cls._add_operator(
                                             cls._change_field(
@@ -555,7 +874,6 @@ class Migrate:
                                     model, (new_data_field["db_column"],), new_data_field["unique"]
                                 ),
                                 upgrade,
-                                True,
                             )
                 # remove fields
                 rename_fields = cls._rename_fields.get(new_model_str)
@@ -582,7 +900,6 @@ class Migrate:
                         cls._add_operator(
                             cls._drop_index(model, {db_column}, is_unique_field),
                             upgrade,
-                            True,
                         )
 
                 # change fields
@@ -590,10 +907,64 @@ class Migrate:
                     cls._handle_field_changes(
                         model, field_name, old_data_fields, new_data_fields, upgrade
                     )
+                cls._rebuild_table_if_required(
+                    model, old_model_describe, new_model_describe, new_models, start, upgrade
+                )
 
         for old_model in old_models.keys() - new_models.keys():
             cls._add_operator(cls.drop_model(old_models[old_model]["table"]), upgrade)
 
+    @classmethod
+    def _rebuild_table_if_required(
+        cls,
+        model: type[Model],
+        old_model_describe: dict,
+        new_model_describe: dict,
+        new_models: dict,
+        start: int,
+        upgrade=True,
+    ) -> None:
+        """
+        replace the operations of the model that added after `start` with one `RebuildTable`,
+        if any of them can't be done by `ALTER TABLE` in current dialect
+        :param model:
+        :param old_model_describe:
+        :param new_model_describe:
+        :param new_models:
+        :param start: length of the operations before diffing the model
+        :param upgrade:
+        :return:
+        """
+        operations = cls._upgrade_operations if upgrade else cls._downgrade_operations
+        tables = {model._meta.db_table, old_model_describe["table"], new_model_describe["table"]}
+        model_operations = [
+            op for op in operations[start:] if isinstance(op, ModelOperation) and op.table in tables
+        ]
+        if not any(cls.ddl.requires_rebuild(op) for op in model_operations):
+            return
+        renamed_columns = {
+            op.new_column_name: op.old_column_name
+            for op in model_operations
+            if isinstance(op, RenameColumn)
+        }
+        reference_table_describes = {
+            fk_field["raw_field"]: new_models[fk_field["python_type"]]
+            for fk_field in new_model_describe.get("fk_fields", [])
+            + new_model_describe.get("o2o_fields", [])
+            if fk_field.get("db_constraint") and fk_field["python_type"] in new_models
+        }
+        operations[start:] = [op for op in operations[start:] if op not in model_operations]
+        cls._add_operator(
+            RebuildTable(
+                model,
+                old_model_describe,
+                new_model_describe,
+                renamed_columns,
+                reference_table_describes,
+            ),
+            upgrade,
+        )
+
     @classmethod
     def _handle_field_changes(
         cls,
@@ -614,10 +985,10 @@ class Migrate:
                 # change index
                 if old_new[0] is False and old_new[1] is True:
                     unique = new_data_field.get("unique")
-                    cls._add_operator(cls._add_index(model, (field_name,), unique), upgrade, True)
+                    cls._add_operator(cls._add_index(model, (field_name,), unique), upgrade)
                 else:
                     unique = old_data_field.get("unique")
-                    cls._add_operator(cls._drop_index(model, (field_name,), unique), upgrade, True)
+                    cls._add_operator(cls._drop_index(model, (field_name,), unique), upgrade)
             elif option == "db_field_types.":
                 if new_data_field.get("field_type") == "DecimalField":
                     # modify column
@@ -646,26 +1017,28 @@ class Migrate:
                 modified = True
 
     @classmethod
-    def rename_table(cls, model: type[Model], old_table_name: str, new_table_name: str) -> str:
-        return cls.ddl.rename_table(model, old_table_name, new_table_name)
+    def rename_table(
+        cls, model: type[Model], old_table_name: str, new_table_name: str
+    ) -> RenameTable:
+        return RenameTable(model, old_table_name, new_table_name)
 
     @classmethod
-    def add_model(cls, model: type[Model]) -> str:
-        return cls.ddl.create_table(model)
+    def add_model(cls, model: type[Model]) -> CreateTable:
+        return CreateTable(model)
 
     @classmethod
-    def drop_model(cls, table_name: str) -> str:
-        return cls.ddl.drop_table(table_name)
+    def drop_model(cls, table_name: str) -> DropTable:
+        return DropTable(table_name)
 
     @classmethod
     def create_m2m(
         cls, model: type[Model], field_describe: dict, reference_table_describe: dict
-    ) -> str:
-        return cls.ddl.create_m2m(model, field_describe, reference_table_describe)
+    ) -> CreateM2M:
+        return CreateM2M(model, field_describe, reference_table_describe)
 
     @classmethod
-    def drop_m2m(cls, table_name: str) -> str:
-        return cls.ddl.drop_m2m(table_name)
+    def drop_m2m(cls, table_name: str) -> DropM2M:
+        return DropM2M(table_name)
 
     @classmethod
     def _resolve_fk_fields_name(cls, model: type[Model], fields_name: Iterable[str]) -> list[str]:
@@ -687,105 +1060,67 @@ class Migrate:
     @classmethod
     def _drop_index(
         cls, model: type[Model], fields_name: Union[Iterable[str], Index], unique=False
-    ) -> str:
+    ) -> DropIndex:
         if isinstance(fields_name, Index):
-            if cls.dialect == "mysql":
-                # schema_generator of MySQL return a empty index sql
-                if hasattr(fields_name, "field_names"):
-                    # tortoise>=0.24
-                    fields = fields_name.field_names
-                else:
-                    # TODO: remove else when drop support for tortoise<0.24
-                    if not (fields := fields_name.fields):
-                        fields = [getattr(i, "get_sql")() for i in fields_name.expressions]
-                return cls.ddl.drop_index(model, fields, unique, name=fields_name.name)
-            return cls.ddl.drop_index_by_name(
-                model, fields_name.index_name(cls.ddl.schema_generator, model)
-            )
+            return DropIndex(model, index=fields_name)
         field_names = cls._resolve_fk_fields_name(model, fields_name)
-        return cls.ddl.drop_index(model, field_names, unique)
+        return DropIndex(model, field_names, unique)
 
     @classmethod
     def _add_index(
         cls, model: type[Model], fields_name: Union[Iterable[str], Index], unique=False
-    ) -> str:
+    ) -> AddIndex:
         if isinstance(fields_name, Index):
-            if cls.dialect == "mysql":
-                # schema_generator of MySQL return a empty index sql
-                if hasattr(fields_name, "field_names"):
-                    # tortoise>=0.24
-                    fields = fields_name.field_names
-                else:
-                    # TODO: remove else when drop support for tortoise<0.24
-                    if not (fields := fields_name.fields):
-                        fields = [getattr(i, "get_sql")() for i in fields_name.expressions]
-                return cls.ddl.add_index(
-                    model,
-                    fields,
-                    name=fields_name.name,
-                    index_type=fields_name.INDEX_TYPE,
-                    extra=fields_name.extra,
-                )
-            sql = fields_name.get_sql(cls.ddl.schema_generator, model, safe=True)
-            if tortoise.__version__ < "0.24":
-                sql = sql.replace("  ", " ")
-                if cls.dialect == "postgres" and (exists := "IF NOT EXISTS ") not in sql:
-                    idx = " INDEX "
-                    sql = sql.replace(idx, idx + exists)
-            return sql
+            return AddIndex(model, index=fields_name)
         field_names = cls._resolve_fk_fields_name(model, fields_name)
-        return cls.ddl.add_index(model, field_names, unique)
+        return AddIndex(model, field_names, unique)
 
     @classmethod
-    def _add_field(cls, model: type[Model], field_describe: dict, is_pk: bool = False) -> str:
-        return cls.ddl.add_column(model, field_describe, is_pk)
+    def _add_field(cls, model: type[Model], field_describe: dict, is_pk: bool = False) -> AddColumn:
+        return AddColumn(model, field_describe, is_pk)
 
     @classmethod
-    def _alter_default(cls, model: type[Model], field_describe: dict) -> str:
-        return cls.ddl.alter_column_default(model, field_describe)
+    def _alter_default(cls, model: type[Model], field_describe: dict) -> AlterColumnDefault:
+        return AlterColumnDefault(model, field_describe)
 
     @classmethod
-    def _alter_null(cls, model: type[Model], field_describe: dict) -> str:
-        return cls.ddl.alter_column_null(model, field_describe)
+    def _alter_null(cls, model: type[Model], field_describe: dict) -> AlterColumnNull:
+        return AlterColumnNull(model, field_describe)
 
     @classmethod
-    def _set_comment(cls, model: type[Model], field_describe: dict) -> str:
-        return cls.ddl.set_comment(model, field_describe)
+    def _set_comment(cls, model: type[Model], field_describe: dict) -> SetComment:
+        return SetComment(model, field_describe)
 
     @classmethod
-    def _modify_field(cls, model: type[Model], field_describe: dict) -> str:
-        return cls.ddl.modify_column(model, field_describe)
+    def _modify_field(cls, model: type[Model], field_describe: dict) -> ModifyColumn:
+        return ModifyColumn(model, field_describe)
 
     @classmethod
     def _drop_fk(
         cls, model: type[Model], field_describe: dict, reference_table_describe: dict
-    ) -> str:
-        return cls.ddl.drop_fk(model, field_describe, reference_table_describe)
+    ) -> DropFK:
+        return DropFK(model, field_describe, reference_table_describe)
 
     @classmethod
-    def _remove_field(cls, model: type[Model], column_name: str) -> str:
-        return cls.ddl.drop_column(model, column_name)
+    def _remove_field(cls, model: type[Model], column_name: str) -> DropColumn:
+        return DropColumn(model, column_name)
 
     @classmethod
-    def _rename_field(cls, model: type[Model], old_field_name: str, new_field_name: str) -> str:
-        return cls.ddl.rename_column(model, old_field_name, new_field_name)
+    def _rename_field(
+        cls, model: type[Model], old_field_name: str, new_field_name: str
+    ) -> RenameColumn:
+        return RenameColumn(model, old_field_name, new_field_name)
 
     @classmethod
     def _change_field(
         cls, model: type[Model], old_field_describe: dict, new_field_describe: dict
-    ) -> str:
-        db_field_types = cast(dict, new_field_describe.get("db_field_types"))
-        return cls.ddl.change_column(
-            model,
-            cast(str, old_field_describe.get("db_column")),
-            cast(str, new_field_describe.get("db_column")),
-            cast(str, db_field_types.get(cls.dialect) or db_field_types.get("")),
-        )
+    ) -> ChangeColumn:
+        return ChangeColumn(model, old_field_describe, new_field_describe)
 
     @classmethod
     def _add_fk(
         cls, model: type[Model], field_describe: dict, reference_table_describe: dict
-    ) -> str:
+    ) -> AddFK:
         """
         add fk
         :param model:
@@ -793,22 +1128,51 @@ class Migrate:
         :param reference_table_describe:
         :return:
         """
-        return cls.ddl.add_fk(model, field_describe, reference_table_describe)
+        return AddFK(model, field_describe, reference_table_describe)
 
-    @classmethod
-    def _merge_operators(cls) -> None:
+    @staticmethod
+    def _sort_operations(operations: list[Operation]) -> list[Operation]:
         """
-        fk/m2m/index must be last when add,first when drop
+        fk/m2m/index must be last when add, first when drop,
+        and tables are created after the tables that they refer to
+        :param operations: operations in the order they were generated
         :return:
         """
-        for _upgrade_fk_m2m_operator in cls._upgrade_fk_m2m_index_operators:
-            if "ADD" in _upgrade_fk_m2m_operator or "CREATE" in _upgrade_fk_m2m_operator:
-                cls.upgrade_operators.append(_upgrade_fk_m2m_operator)
+        drops: list[Operation] = []
+        others: list[Operation] = []
+        adds: list[Operation] = []
+        for operation in operations:
+            if not operation.deferred:
+                others.append(operation)
+            elif operation.creates:
+                adds.append(operation)
             else:
-                cls.upgrade_operators.insert(0, _upgrade_fk_m2m_operator)
+                drops.append(operation)
+        # reorder table creations among their own positions
+        positions = [i for i, op in enumerate(others) if isinstance(op, CreateTable)]
+        pending = cast("list[CreateTable]", [others[i] for i in positions])
+        pending_tables = {op.table for op in pending}
+        ordered: list[CreateTable] = []
+        while pending:
+            ready = [op for op in pending if not (op.references & pending_tables)] or pending[:1]
+            for op in ready:
+                pending.remove(op)
+                pending_tables.discard(op.table)
+            ordered.extend(ready)
+        for i, op in zip(positions, ordered):
+            others[i] = op
+        drops.reverse()
+        return drops + others + adds
 
-        for _downgrade_fk_m2m_operator in cls._downgrade_fk_m2m_index_operators:
-            if "ADD" in _downgrade_fk_m2m_operator or "CREATE" in _downgrade_fk_m2m_operator:
-                cls.downgrade_operators.append(_downgrade_fk_m2m_operator)
-            else:
-                cls.downgrade_operators.insert(0, _downgrade_fk_m2m_operator)
+    @classmethod
+    def _merge_operators(cls) -> None:
+        """
+        order operations and render them to sql
+        :return:
+        """
+        cls.upgrade_operators = cls.ddl.render_operations(
+            cls._sort_operations(cls._upgrade_operations)
+        )
+        cls.downgrade_operators = cls.ddl.render_operations(
+            cls._sort_operations(cls._downgrade_operations)
+        )
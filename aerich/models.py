@@ -1,15 +1,43 @@
+from typing import Optional
+
 from tortoise import Model, fields
 
 from aerich.coder import decoder, encoder
 
 MAX_VERSION_LENGTH = 255
 MAX_APP_LENGTH = 100
+#: app and version of the row marking that the aerich table has been evolved to the model,
+#: see `Migrate.migrate_aerich_table`
+AERICH_TABLE_APP = "_aerich"
+AERICH_TABLE_VERSION = "1"
 
 
 class Aerich(Model):
     version = fields.CharField(max_length=MAX_VERSION_LENGTH)
     app = fields.CharField(max_length=MAX_APP_LENGTH)
     content: dict = fields.JSONField(encoder=encoder, decoder=decoder)
+    # null for the versions that applied before the timings are recorded, or faked
+    applied_at = fields.DatetimeField(null=True)
+    #: seconds to run the migration file
+    duration = fields.FloatField(null=True)
+    #: executed statements, e.g.: [{"sql": "ALTER TABLE ...", "duration": 0.01, "rows": None}]
+    timings: Optional[list] = fields.JSONField(null=True)
 
     class Meta:
         ordering = ["-id"]
+        unique_together = (("app", "version"),)
+
+
+class AerichCheckpoint(Model):
+    """
+    Executed statements of the migration that runs not in transaction, to resume it after failure
+    """
+
+    version = fields.CharField(max_length=MAX_VERSION_LENGTH)
+    app = fields.CharField(max_length=MAX_APP_LENGTH)
+    seq = fields.IntField()
+    checksum = fields.CharField(max_length=64)
+
+    class Meta:
+        table = "aerich_checkpoint"
+        ordering = ["seq"]
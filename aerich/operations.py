@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, ClassVar, Optional, cast
+
+if TYPE_CHECKING:
+    from tortoise import Model
+    from tortoise.indexes import Index
+
+    from aerich.ddl import BaseDDL
+
+
+class Operation:
+    """
+    A schema change generated by `Migrate.diff_models`, rendered to sql by `BaseDDL`
+    """
+
+    #: fk/m2m/index operations, run after the others when adding and before them when dropping
+    deferred: ClassVar[bool] = False
+    #: whether the operation creates something, only used to order deferred operations
+    creates: ClassVar[bool] = False
+
+    @property
+    def table(self) -> str:
+        raise NotImplementedError
+
+    def render(self, ddl: BaseDDL) -> str:
+        raise NotImplementedError
+
+
+@dataclass
+class ModelOperation(Operation):
+    model: type[Model]
+
+    @property
+    def table(self) -> str:
+        return self.model._meta.db_table
+
+
+@dataclass
+class CreateTable(ModelOperation):
+    creates = True
+
+    @property
+    def references(self) -> set[str]:
+        """Tables that referred by the fk/o2o fields of the model"""
+        meta = self.model._meta
+        return {
+            meta.fields_map[name].related_model._meta.db_table  # type: ignore[attr-defined]
+            for name in meta.fk_fields | meta.o2o_fields
+        } - {self.table}
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.create_table(self.model)
+
+
+@dataclass
+class DropTable(Operation):
+    table_name: str
+
+    @property
+    def table(self) -> str:
+        return self.table_name
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.drop_table(self.table_name)
+
+
+@dataclass
+class RenameTable(ModelOperation):
+    old_table_name: str
+    new_table_name: str
+
+    @property
+    def table(self) -> str:
+        return self.old_table_name
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.rename_table(self.model, self.old_table_name, self.new_table_name)
+
+
+@dataclass
+class CreateM2M(ModelOperation):
+    deferred = True
+    creates = True
+    field_describe: dict
+    reference_table_describe: dict
+
+    @property
+    def table(self) -> str:
+        return cast(str, self.field_describe.get("through"))
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.create_m2m(self.model, self.field_describe, self.reference_table_describe)
+
+
+@dataclass
+class DropM2M(Operation):
+    deferred = True
+    table_name: str
+
+    @property
+    def table(self) -> str:
+        return self.table_name
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.drop_m2m(self.table_name)
+
+
+@dataclass
+class AddColumn(ModelOperation):
+    creates = True
+    field_describe: dict
+    is_pk: bool = False
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.add_column(self.model, self.field_describe, self.is_pk)
+
+
+@dataclass
+class DropColumn(ModelOperation):
+    column_name: str
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.drop_column(self.model, self.column_name)
+
+
+@dataclass
+class ModifyColumn(ModelOperation):
+    field_describe: dict
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.modify_column(self.model, self.field_describe)
+
+
+@dataclass
+class RenameColumn(ModelOperation):
+    old_column_name: str
+    new_column_name: str
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.rename_column(self.model, self.old_column_name, self.new_column_name)
+
+
+@dataclass
+class ChangeColumn(ModelOperation):
+    """Rename column with the `CHANGE` syntax, for MySQL5.x that has no `RENAME COLUMN`"""
+
+    old_field_describe: dict
+    new_field_describe: dict
+
+    def render(self, ddl: BaseDDL) -> str:
+        db_field_types = cast(dict, self.new_field_describe.get("db_field_types"))
+        return ddl.change_column(
+            self.model,
+            cast(str, self.old_field_describe.get("db_column")),
+            cast(str, self.new_field_describe.get("db_column")),
+            cast(str, db_field_types.get(ddl.DIALECT) or db_field_types.get("")),
+        )
+
+
+@dataclass
+class AlterColumnDefault(ModelOperation):
+    field_describe: dict
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.alter_column_default(self.model, self.field_describe)
+
+
+@dataclass
+class AlterColumnNull(ModelOperation):
+    field_describe: dict
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.alter_column_null(self.model, self.field_describe)
+
+
+@dataclass
+class SetComment(ModelOperation):
+    field_describe: dict
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.set_comment(self.model, self.field_describe)
+
+
+@dataclass
+class AddIndex(ModelOperation):
+    deferred = True
+    creates = True
+    field_names: list[str] = field(default_factory=list)
+    unique: Optional[bool] = False
+    index: Optional[Index] = None
+
+    def render(self, ddl: BaseDDL) -> str:
+        if self.index is not None:
+            return ddl.add_index_object(self.model, self.index)
+        return ddl.add_index(self.model, self.field_names, self.unique)
+
+
+@dataclass
+class DropIndex(ModelOperation):
+    deferred = True
+    field_names: list[str] = field(default_factory=list)
+    unique: Optional[bool] = False
+    index: Optional[Index] = None
+
+    def render(self, ddl: BaseDDL) -> str:
+        if self.index is not None:
+            return ddl.drop_index_object(self.model, self.index)
+        return ddl.drop_index(self.model, self.field_names, self.unique)
+
+
+@dataclass
+class AddFK(ModelOperation):
+    deferred = True
+    creates = True
+    field_describe: dict
+    reference_table_describe: dict
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.add_fk(self.model, self.field_describe, self.reference_table_describe)
+
+
+@dataclass
+class DropFK(ModelOperation):
+    deferred = True
+    field_describe: dict
+    reference_table_describe: dict
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.drop_fk(self.model, self.field_describe, self.reference_table_describe)
+
+
+@dataclass
+class RebuildTable(ModelOperation):
+    """
+    Recreate the table from `new_model_describe` and copy rows into it,
+    for the changes that can't be done by `ALTER TABLE` (e.g.: SQLite modify column)
+    """
+
+    old_model_describe: dict
+    new_model_describe: dict
+    #: {new_column: old_column}
+    renamed_columns: dict[str, str] = field(default_factory=dict)
+    #: {fk column: describe of the referred model}
+    reference_table_describes: dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def table(self) -> str:
+        return cast(str, self.new_model_describe.get("table"))
+
+    def render(self, ddl: BaseDDL) -> str:
+        return ddl.rebuild_table(
+            self.model,
+            self.old_model_describe,
+            self.new_model_describe,
+            self.renamed_columns,
+            self.reference_table_describes,
+        )
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import io
+import pstats
+import time
+from typing import ContextManager, Iterator
+
+#: the profiler of the running command, None if not profiling
+_profiler: Profiler | None = None
+
+
+class Profiler:
+    """
+    Wall-clock time of the phases of a command, and optionally the cProfile stats of the whole
+    run, e.g.: `aerich --profile migrate`
+    """
+
+    def __init__(self, output: str | None = None) -> None:
+        """
+        :param output: file to dump the cProfile stats to, no cProfile if None
+        """
+        self.output = output
+        self.phases: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self.total = 0.0
+        self._start = 0.0
+        self._cprofile = cProfile.Profile() if output else None
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def start(self) -> None:
+        global _profiler
+        _profiler = self
+        self._start = time.perf_counter()
+        if self._cprofile:
+            self._cprofile.enable()
+
+    def stop(self) -> None:
+        global _profiler
+        if self._cprofile and self.output:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.output)
+        self.total = time.perf_counter() - self._start
+        _profiler = None
+
+    def report(self, hot_spots: int = 10) -> str:
+        """
+        :param hot_spots: number of the functions with the most own time to list, only when
+            cProfile is on
+        :return: table of the phases, in the order they first ran
+        """
+        rows = [(name, str(self.calls[name]), seconds) for name, seconds in self.phases.items()]
+        rows.append(("other", "", self.total - sum(self.phases.values())))
+        rows.append(("total", "", self.total))
+        lines = [f"{'phase':<16}{'calls':>8}{'seconds':>10}{'%':>8}"]
+        for name, calls, seconds in rows:
+            percent = seconds / self.total * 100 if self.total else 0.0
+            lines.append(f"{name:<16}{calls:>8}{seconds:>10.3f}{percent:>8.1f}")
+        if self._cprofile:
+            stream = io.StringIO()
+            stats = pstats.Stats(self._cprofile, stream=stream)
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(hot_spots)
+            lines.append(f"\ncProfile stats dumped to {self.output}, hot spots:")
+            lines.append(stream.getvalue().strip())
+        return "\n".join(lines)
+
+
+def phase(name: str) -> ContextManager[None]:
+    """
+    Time the block as the phase of the running profiler, do nothing if not profiling
+    """
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.phase(name)
@@ -0,0 +1,123 @@
+"""
+Benchmark of the catalog queries of `aerich inspectdb` on SQLite.
+
+A database of `--tables` tables is created in a temporary file, each with `--columns` columns,
+`--indexes` single column indexes and a unique index of two columns. The time and the number of
+the queries (round trips) to get the columns and the indexes of all the tables are reported for
+`InspectSQLite.get_tables`, and for the PRAGMA statements per table and per index that it
+replaces (`legacy`).
+
+Usage: python benchmarks/inspectdb.py --tables 100,1000 [--indexes 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from tortoise import Tortoise
+
+from aerich.inspectdb.sqlite import InspectSQLite
+
+
+def create_tables(tables: int, columns: int, indexes: int) -> str:
+    sql = []
+    for i in range(tables):
+        fields = ", ".join(f"c{j} VARCHAR(50) NOT NULL" for j in range(columns))
+        sql.append(f'CREATE TABLE "t{i}" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, {fields});')
+        for j in range(min(indexes, columns)):
+            sql.append(f'CREATE INDEX "idx_t{i}_c{j}" ON "t{i}" ("c{j}");')
+        sql.append(f'CREATE UNIQUE INDEX "uid_t{i}" ON "t{i}" ("c0", "c{columns - 1}");')
+    return "\n".join(sql)
+
+
+async def legacy(inspect: InspectSQLite, tables: list[str]) -> None:
+    """
+    The queries of inspectdb before the catalog is queried in bulk
+    """
+    for table in tables:
+        await inspect.conn.execute_query_dict(f"PRAGMA table_info({table})")
+        for index in await inspect.conn.execute_query_dict(f"PRAGMA index_list ({table})"):
+            await inspect.conn.execute_query_dict(f"PRAGMA index_info({index['name']})")
+
+
+async def bench(args: argparse.Namespace, tables: int) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(
+            db_url=f"sqlite://{os.path.join(tmp, 'bench.sqlite3')}", modules={"models": []}
+        )
+        conn = Tortoise.get_connection("default")
+        await conn.execute_script(create_tables(tables, args.columns, args.indexes))
+        inspect = InspectSQLite(conn)
+        names = await inspect.get_all_tables()
+        # the round trips, the trace callback of SQLite also counts the statements run by the
+        # pragma functions
+        counter = {"queries": 0}
+        execute_query_dict = conn.execute_query_dict
+
+        async def count(*args, **kwargs) -> list[dict]:
+            counter["queries"] += 1
+            return await execute_query_dict(*args, **kwargs)
+
+        conn.execute_query_dict = count  # type:ignore[method-assign]
+        for name, func in (("legacy", legacy), ("get_tables", InspectSQLite.get_tables)):
+            seconds = []
+            for _ in range(args.repeat):
+                counter["queries"] = 0
+                start = time.perf_counter()
+                await func(inspect, names)
+                seconds.append(time.perf_counter() - start)
+            results.append(
+                {
+                    "tables": tables,
+                    "indexes": tables * (min(args.indexes, args.columns) + 1),
+                    "method": name,
+                    "seconds": min(seconds),
+                    "queries": counter["queries"],
+                }
+            )
+        await Tortoise.close_connections()
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    columns = ["tables", "indexes", "method", "seconds", "queries"]
+    if not args.json:
+        print("".join(f"{name:>12}" for name in columns))
+    for tables in args.tables:
+        for result in await bench(args, tables):
+            if args.json:
+                print(json.dumps(result))
+                continue
+            print(
+                "".join(
+                    (
+                        f"{result[name]:>11.3f}s"
+                        if isinstance(result[name], float)
+                        else f"{result[name]:>12}"
+                    )
+                    for name in columns
+                )
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--tables",
+        type=lambda s: [int(i) for i in s.split(",")],
+        default=[100, 1000],
+        help="comma separated numbers of tables, default: 100,1000",
+    )
+    parser.add_argument("--columns", type=int, default=10, help="columns of each table")
+    parser.add_argument("--indexes", type=int, default=5, help="single column indexes per table")
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of the runs")
+    parser.add_argument("--json", action="store_true", help="print a JSON line for each result")
+    asyncio.run(main(parser.parse_args()))
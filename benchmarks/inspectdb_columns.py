@@ -0,0 +1,159 @@
+"""
+Benchmark of the per-column cost of `aerich inspectdb` once the catalog is queried.
+
+`--columns` rows of the catalog are turned into `Column` records and rendered to fields through
+`Inspect.field_map`, without a database. The time per column and the size of a record are
+reported for the dataclass records with the cached `field_map`, and for the pydantic models with
+the `field_map` built for every column that they replace (`legacy`, skipped if pydantic isn't
+installed).
+
+Usage: python benchmarks/inspectdb_columns.py --columns 10000,100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, Optional
+
+from aerich.inspectdb import Column
+from aerich.inspectdb.sqlite import InspectSQLite
+
+TYPES = ["INTEGER", "VARCHAR(50)", "TEXT", "TIMESTAMP", "REAL", "BIGINT", "INT", "JSON"]
+
+
+def build_rows(columns: int) -> list[dict]:
+    return [
+        {
+            "name": f"c{i}",
+            "type": TYPES[i % len(TYPES)],
+            "notnull": i % 2,
+            "dflt_value": None,
+            "pk": int(i == 0),
+        }
+        for i in range(columns)
+    ]
+
+
+def build_legacy() -> Optional[Callable[..., Any]]:
+    """
+    The pydantic model of the column before the dataclass
+    """
+    try:
+        from pydantic import create_model
+    except ImportError:
+        return None
+    fields: dict[str, Any] = {
+        name: (Optional[int] if name in ("length", "decimal_places", "max_digits") else Any, None)
+        for name in ("comment", "length", "extra", "decimal_places", "max_digits")
+    }
+    model = create_model(
+        "LegacyColumn",
+        name=(str, ...),
+        data_type=(str, ...),
+        null=(bool, ...),
+        default=(Any, ...),
+        pk=(bool, ...),
+        unique=(bool, ...),
+        index=(bool, ...),
+        **fields,
+    )
+    # translate() of the dataclass, the fields are the same
+    model.translate = Column.translate  # type:ignore[attr-defined]
+    return model
+
+
+def render(
+    inspect: InspectSQLite, rows: list[dict], column_class: Callable[..., Any], cached: bool
+) -> None:
+    for row in rows:
+        try:
+            length: Optional[int] = int(row["type"].split("(")[1].split(")")[0])
+        except IndexError:
+            length = None
+        column = column_class(
+            name=row["name"],
+            data_type=row["type"].split("(")[0],
+            null=row["notnull"] == 0,
+            default=row["dflt_value"],
+            length=length,
+            pk=row["pk"] == 1,
+            unique=False,
+            index=False,
+        )
+        # the property rebuilt the map for every column
+        field_map = inspect.field_map if cached else InspectSQLite.field_map.func(inspect)
+        field_map[column.data_type](**column.translate())
+
+
+def bench(args: argparse.Namespace, columns: int) -> list[dict]:
+    rows = build_rows(columns)
+    inspect = InspectSQLite(None)  # type:ignore[arg-type]
+    methods: list[tuple[str, Callable[..., Any], bool]] = [("dataclass", Column, True)]
+    if legacy := build_legacy():
+        methods.insert(0, ("legacy", legacy, False))
+    results = []
+    for name, column_class, cached in methods:
+        seconds = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            render(inspect, rows, column_class, cached)
+            seconds.append(time.perf_counter() - start)
+        column = column_class(
+            name="c",
+            data_type="INTEGER",
+            null=False,
+            default=None,
+            pk=False,
+            unique=False,
+            index=False,
+        )
+        size = sys.getsizeof(column) + sys.getsizeof(getattr(column, "__dict__", {}))
+        results.append(
+            {
+                "columns": columns,
+                "method": name,
+                "seconds": min(seconds),
+                "us_per_column": min(seconds) / columns * 1_000_000,
+                "bytes_per_column": size,
+            }
+        )
+    return results
+
+
+def main(args: argparse.Namespace) -> None:
+    columns = ["columns", "method", "seconds", "us_per_column", "bytes_per_column"]
+    if not args.json:
+        print("".join(f"{name:>18}" for name in columns))
+    for count in args.columns:
+        for result in bench(args, count):
+            if args.json:
+                print(json.dumps(result))
+                continue
+            print(
+                "".join(
+                    (
+                        f"{result[name]:>18.3f}"
+                        if isinstance(result[name], float)
+                        else f"{result[name]:>18}"
+                    )
+                    for name in columns
+                )
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--columns",
+        type=lambda s: [int(i) for i in s.split(",")],
+        default=[10000, 100000],
+        help="comma separated numbers of columns, default: 10000,100000",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of the runs")
+    parser.add_argument("--json", action="store_true", help="print a JSON line for each result")
+    main(parser.parse_args())
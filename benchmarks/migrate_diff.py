@@ -0,0 +1,255 @@
+"""
+Benchmark of the diff engine of `aerich migrate` on synthetic apps.
+
+An app of `--models` models is generated, each with `--fields` data fields (`--indexes` of them
+indexed), a foreign key to the previous model and `--m2m` many-to-many fields. The old snapshot
+is the describe of the app with `--mutate` of the models changed (added/dropped/altered columns,
+indexes, m2m and tables), then the time of `get_models_describe`, decoding the snapshot,
+`Migrate.diff_models` and the rendering of the DDL, and the peak memory of them are reported.
+
+Usage: python benchmarks/migrate_diff.py --models 50,200,1000,2000 [--dialect postgres]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import json
+import sys
+import time
+import tracemalloc
+from types import ModuleType
+from typing import Callable
+
+from tortoise import Model, Tortoise, fields
+
+from aerich.coder import decoder, encoder
+from aerich.ddl import BaseDDL
+from aerich.ddl.mysql import MysqlDDL
+from aerich.ddl.postgres import PostgresDDL
+from aerich.ddl.sqlite import SqliteDDL
+from aerich.migrate import Migrate
+from aerich.utils import get_models_describe
+
+APP = "models"
+DDL_CLASSES: dict[str, type[BaseDDL]] = {
+    "mysql": MysqlDDL,
+    "postgres": PostgresDDL,
+    "sqlite": SqliteDDL,
+}
+
+
+def build_module(name: str, models: int, data_fields: int, indexes: int, m2m: int) -> ModuleType:
+    module = ModuleType(name)
+    module.__models__ = []  # type:ignore[attr-defined]
+    for i in range(models):
+        attrs: dict = {"__module__": name, "Meta": type("Meta", (), {"table": f"model_{i}"})}
+        for j in range(data_fields):
+            index = j < indexes
+            kind = j % 4
+            if kind == 0:
+                field: fields.Field = fields.CharField(max_length=100, index=index)
+            elif kind == 1:
+                field = fields.IntField(default=0, index=index)
+            elif kind == 2:
+                field = fields.DatetimeField(null=True, index=index)
+            else:
+                field = fields.TextField(null=True)
+            attrs[f"field_{j}"] = field
+        if i:
+            attrs["parent"] = fields.ForeignKeyField(
+                f"{APP}.Model{i - 1}", null=True, related_name=f"children_{i}"
+            )
+        for k in range(m2m if models > 1 else 0):
+            attrs[f"m2m_{k}"] = fields.ManyToManyField(
+                f"{APP}.Model{(i + k + 1) % models}",
+                related_name=f"m2m_{i}_{k}",
+                through=f"m2m_{i}_{k}",
+            )
+        model = type(f"Model{i}", (Model,), attrs)
+        setattr(module, model.__name__, model)
+        module.__models__.append(model)  # type:ignore[attr-defined]
+    sys.modules[name] = module
+    return module
+
+
+def _add_column(describe: dict, old: dict) -> None:
+    describe["data_fields"].pop()
+
+
+def _drop_column(describe: dict, old: dict) -> None:
+    field = copy.deepcopy(describe["data_fields"][-1])
+    field["name"] = field["db_column"] = "legacy"
+    describe["data_fields"].append(field)
+
+
+def _alter_null(describe: dict, old: dict) -> None:
+    for field in describe["data_fields"]:
+        if field["nullable"]:
+            field["nullable"] = False
+            return
+
+
+def _alter_default(describe: dict, old: dict) -> None:
+    for field in describe["data_fields"]:
+        if field["default"] is not None:
+            field["default"] = 1
+            return
+
+
+def _modify_column(describe: dict, old: dict) -> None:
+    for field in describe["data_fields"]:
+        if "max_length" in field["constraints"]:
+            field["constraints"]["max_length"] = 50
+            field["db_field_types"][""] = "VARCHAR(50)"
+            return
+
+
+def _add_index(describe: dict, old: dict) -> None:
+    for field in describe["data_fields"]:
+        if field["indexed"]:
+            field["indexed"] = False
+            return
+
+
+def _add_m2m(describe: dict, old: dict) -> None:
+    if not describe["m2m_fields"]:
+        return
+    through = describe["m2m_fields"][0]["through"]
+    for model_describe in old.values():
+        model_describe["m2m_fields"] = [
+            f for f in model_describe["m2m_fields"] if f["through"] != through
+        ]
+
+
+#: changes from the old snapshot to the models, applied to the mutated models in turn
+MUTATIONS: list[Callable[[dict, dict], None]] = [
+    _add_column,
+    _drop_column,
+    _alter_null,
+    _alter_default,
+    _modify_column,
+    _add_index,
+    _add_m2m,
+]
+
+
+def mutate(new: dict, ratio: float) -> dict:
+    """
+    :return: the old snapshot, adding a model to it makes the table created
+    """
+    old = copy.deepcopy(new)
+    step = max(1, round(1 / ratio)) if ratio else 0
+    names = list(old)
+    for n, name in enumerate(names[::step] if step else []):
+        if n % (len(MUTATIONS) + 1) == len(MUTATIONS):
+            old.pop(name)
+        else:
+            MUTATIONS[n % (len(MUTATIONS) + 1)](old[name], old)
+    return old
+
+
+def run_diff(ddl: BaseDDL, old: dict, new: dict) -> int:
+    Migrate.upgrade_operators = []
+    Migrate.downgrade_operators = []
+    Migrate._upgrade_operations = []
+    Migrate._downgrade_operations = []
+    Migrate._upgrade_m2m = []
+    Migrate._downgrade_m2m = []
+    Migrate._rename_fields = {}
+    Migrate.ddl = ddl
+    Migrate.diff_models(old, new)
+    Migrate.diff_models(new, old, False)
+    return len(Migrate._upgrade_operations)
+
+
+def run_render(ddl: BaseDDL) -> int:
+    Migrate._merge_operators()
+    Migrate.upgrade_operators = ddl.merge_alter_operators(Migrate.upgrade_operators)
+    Migrate.downgrade_operators = ddl.merge_alter_operators(Migrate.downgrade_operators)
+    return len(Migrate.upgrade_operators)
+
+
+async def bench(args: argparse.Namespace, models: int) -> dict:
+    module = build_module(f"_aerich_bench_{models}", models, args.fields, args.indexes, args.m2m)
+    await Tortoise.init(db_url="sqlite://:memory:", modules={APP: [module.__name__]})
+    Migrate.app = APP
+    Migrate.dialect = args.dialect
+    ddl = DDL_CLASSES[args.dialect](Tortoise.get_connection("default"))
+    timings: dict[str, list[float]] = {"describe": [], "decode": [], "diff": [], "render": []}
+    operations = statements = 0
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        new = get_models_describe(APP)
+        timings["describe"].append(time.perf_counter() - start)
+        snapshot = encoder(mutate(new, args.mutate))
+        start = time.perf_counter()
+        old = decoder(snapshot)
+        timings["decode"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        operations = run_diff(ddl, old, new)
+        timings["diff"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        statements = run_render(ddl)
+        timings["render"].append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    new = get_models_describe(APP)
+    run_diff(ddl, decoder(encoder(mutate(new, args.mutate))), new)
+    run_render(ddl)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    await Tortoise._reset_apps()
+    await Tortoise.close_connections()
+    del sys.modules[module.__name__]
+    return {
+        "models": models,
+        **{name: min(seconds) for name, seconds in timings.items()},
+        "operations": operations,
+        "statements": statements,
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    columns = ["models", "describe", "decode", "diff", "render", "operations", "statements"]
+    if not args.json:
+        print("".join(f"{name:>11}" for name in [*columns, "peak_mb"]))
+    for models in args.models:
+        result = await bench(args, models)
+        if args.json:
+            print(json.dumps(result))
+            continue
+        print(
+            "".join(
+                (
+                    f"{result[name]:>10.3f}s"
+                    if isinstance(result[name], float)
+                    else f"{result[name]:>11}"
+                )
+                for name in columns
+            )
+            + f"{result['peak_mb']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--models",
+        type=lambda s: [int(i) for i in s.split(",")],
+        default=[50, 200, 1000],
+        help="comma separated numbers of models, default: 50,200,1000",
+    )
+    parser.add_argument("--fields", type=int, default=10, help="data fields of each model")
+    parser.add_argument("--indexes", type=int, default=2, help="indexed fields of each model")
+    parser.add_argument("--m2m", type=int, default=1, help="m2m fields of each model")
+    parser.add_argument("--mutate", type=float, default=0.1, help="ratio of the changed models")
+    parser.add_argument("--dialect", choices=sorted(DDL_CLASSES), default="sqlite")
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of the runs")
+    parser.add_argument("--json", action="store_true", help="print a JSON line for each size")
+    asyncio.run(main(parser.parse_args()))
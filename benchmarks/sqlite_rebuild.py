@@ -0,0 +1,81 @@
+"""
+Benchmark of the rows copy throughput of the SQLite table rebuild.
+
+Usage: python benchmarks/sqlite_rebuild.py --rows 5000000 [--path bench.sqlite3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import os
+import sqlite3
+import tempfile
+import time
+
+from tortoise import Model, Tortoise, fields
+
+from aerich.ddl.sqlite import SqliteDDL
+
+
+class Event(Model):
+    name = fields.CharField(max_length=100, index=True)
+    payload = fields.TextField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    count = fields.IntField(default=0)
+
+
+def populate(path: str, rows: int) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            'DROP TABLE IF EXISTS "event";'
+            'CREATE TABLE "event" ("id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,'
+            ' "name" VARCHAR(100) NOT NULL, "payload" TEXT, "created_at" TIMESTAMP NOT NULL,'
+            ' "count" INT NOT NULL);'
+            'CREATE INDEX "idx_event_name" ON "event" ("name");'
+        )
+        conn.execute(
+            'INSERT INTO "event" ("name", "payload", "created_at", "count")'
+            " WITH RECURSIVE seq(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < ?)"
+            " SELECT 'event-' || (i % 1000), hex(randomblob(32)), datetime('now'), i FROM seq",
+            (rows,),
+        )
+
+
+async def main(path: str, rows: int) -> None:
+    await Tortoise.init(db_url=f"sqlite://{path}", modules={"models": [__name__]})
+    ddl = SqliteDDL(Tortoise.get_connection("default"))
+    new_describe = Event.describe(False)
+    # `count` has default and `payload` is not null in the old table
+    old_describe = copy.deepcopy(new_describe)
+    for field in old_describe["data_fields"]:
+        if field["name"] == "count":
+            field["default"] = None
+        elif field["name"] == "payload":
+            field["nullable"] = False
+    sql = ddl.rebuild_table(Event, old_describe, new_describe, {}, {})
+    await Tortoise.close_connections()
+
+    start = time.perf_counter()
+    populate(path, rows)
+    print(f"populate {rows} rows: {time.perf_counter() - start:.2f}s")
+    with sqlite3.connect(path) as conn:
+        start = time.perf_counter()
+        conn.executescript(sql)
+        elapsed = time.perf_counter() - start
+        assert conn.execute('SELECT COUNT(*) FROM "event"').fetchone()[0] == rows
+    print(f"rebuild {rows} rows: {elapsed:.2f}s, {rows / elapsed:,.0f} rows/s")
+    print(f"file size: {os.path.getsize(path) / 1024 / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--path", help="SQLite file, a temporary file is used by default")
+    args = parser.parse_args()
+    if args.path:
+        asyncio.run(main(args.path, args.rows))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(main(os.path.join(tmp, "bench.sqlite3"), args.rows))
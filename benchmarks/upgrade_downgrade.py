@@ -0,0 +1,144 @@
+"""
+Benchmark of the per-file overheads of `aerich upgrade/heads/history/downgrade`.
+
+`--files` migration files that each create a table are written to a temporary location, then
+`Command.upgrade`, `heads`, `history`, `history_timings` and `downgrade` of all of them run
+against SQLite in memory and in a file. The wall time and the number of the statements executed
+by SQLite (including BEGIN/COMMIT) are reported for each. The app has `--models` synthetic models
+(see migrate_diff.py) so that the describe saved for each version is of a realistic size.
+
+Usage: python benchmarks/upgrade_downgrade.py --files 10,100,1000 [--db memory]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable
+
+from migrate_diff import build_module
+from tortoise import Tortoise
+
+from aerich import Command
+from aerich.migrate import MIGRATE_TEMPLATE
+from aerich.utils import get_app_connection
+
+APP = "models"
+
+
+def write_migrations(location: str, files: int) -> list[str]:
+    dirname = os.path.join(location, APP)
+    os.makedirs(dirname)
+    versions = []
+    for i in range(1, files + 1):
+        version = f"{i}_20250101000000_bench.py"
+        content = MIGRATE_TEMPLATE.format(
+            upgrade_sql=f'CREATE TABLE "bench_{i}" ("id" INT NOT NULL PRIMARY KEY);',
+            downgrade_sql=f'DROP TABLE "bench_{i}";',
+        )
+        with open(os.path.join(dirname, version), "w", encoding="utf-8") as f:
+            f.write(content)
+        versions.append(version)
+    return versions
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, statement: str) -> None:
+        self.count += 1
+
+    async def measure(self, func: Callable[..., Awaitable[Any]], *args) -> tuple[float, int]:
+        count = self.count
+        start = time.perf_counter()
+        await func(*args)
+        return time.perf_counter() - start, self.count - count
+
+
+async def bench(db: str, files: int, models: int) -> list[dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        versions = write_migrations(tmp, files)
+        module = build_module(f"_aerich_bench_{files}", models, 10, 2, 1)
+        db_url = "sqlite://:memory:" if db == "memory" else f"sqlite://{tmp}/bench.sqlite3"
+        config = {
+            "connections": {"default": db_url},
+            "apps": {APP: {"models": [module.__name__, "aerich.models"]}},
+        }
+        command = Command(config, APP, tmp)
+        await command.init()
+        await Tortoise.generate_schemas()
+        counter = QueryCounter()
+        await get_app_connection(config, APP)._connection.set_trace_callback(counter)
+
+        results = []
+        for name, func, args in (
+            ("upgrade", command.upgrade, ()),
+            ("heads", command.heads, ()),
+            ("history", command.history, ()),
+            ("history_timings", command.history_timings, ()),
+            ("downgrade", command.downgrade, (int(versions[0].split("_")[0]), False)),
+        ):
+            seconds, queries = await counter.measure(func, *args)
+            results.append(
+                {
+                    "db": db,
+                    "files": files,
+                    "command": name,
+                    "seconds": seconds,
+                    "queries": queries,
+                    "ms_per_file": seconds / files * 1000,
+                }
+            )
+        await Tortoise._reset_apps()
+        await Tortoise.close_connections()
+        del sys.modules[module.__name__]
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    columns = ["db", "files", "command", "seconds", "queries", "ms_per_file"]
+    if not args.json:
+        print("".join(f"{name:>16}" for name in columns))
+    for db in args.db:
+        for files in args.files:
+            for result in await bench(db, files, args.models):
+                if args.json:
+                    print(json.dumps(result))
+                    continue
+                print(
+                    "".join(
+                        (
+                            f"{result[name]:>16.3f}"
+                            if isinstance(result[name], float)
+                            else f"{result[name]:>16}"
+                        )
+                        for name in columns
+                    )
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--files",
+        type=lambda s: [int(i) for i in s.split(",")],
+        default=[10, 100, 1000],
+        help="comma separated numbers of migration files, default: 10,100,1000",
+    )
+    parser.add_argument(
+        "--db",
+        type=lambda s: s.split(","),
+        default=["memory", "file"],
+        help="comma separated SQLite databases to run against, memory and/or file",
+    )
+    parser.add_argument("--models", type=int, default=20, help="synthetic models of the app")
+    parser.add_argument("--json", action="store_true", help="print a JSON line for each result")
+    asyncio.run(main(parser.parse_args()))
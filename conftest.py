@@ -33,8 +33,8 @@ tortoise_orm = {
 def reset_migrate() -> None:
     Migrate.upgrade_operators = []
     Migrate.downgrade_operators = []
-    Migrate._upgrade_fk_m2m_index_operators = []
-    Migrate._downgrade_fk_m2m_index_operators = []
+    Migrate._upgrade_operations = []
+    Migrate._downgrade_operations = []
     Migrate._upgrade_m2m = []
     Migrate._downgrade_m2m = []
 
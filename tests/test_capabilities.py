@@ -0,0 +1,33 @@
+from aerich.capabilities import Capabilities, parse_version
+from aerich.migrate import Migrate
+
+
+def test_parse_version() -> None:
+    assert parse_version("8.0.36-0ubuntu0.22.04.1") == (8, 0, 36)
+    assert parse_version("16.2 (Debian 16.2-1.pgdg120+2)") == (16, 2)
+    assert parse_version("10.11.6-MariaDB-0+deb12u1") == (10, 11, 6)
+    assert parse_version("") == ()
+
+
+def test_flags() -> None:
+    assert not Capabilities("mysql", "5.7.44").rename_column
+    assert Capabilities("mysql", "8.0.36").rename_column
+    assert not Capabilities("mysql", "10.4.32-MariaDB").rename_column
+    assert Capabilities("mysql", "10.11.6-MariaDB").rename_column
+    assert not Capabilities("sqlite", "3.24.0").rename_column
+    assert not Capabilities("sqlite", "3.34.1").drop_column
+    assert Capabilities("sqlite", "3.45.1").drop_column
+
+
+def test_unknown_version() -> None:
+    for dialect in ("mysql", "postgres", "sqlite"):
+        capabilities = Capabilities(dialect)
+        assert capabilities.rename_column
+        assert capabilities.drop_column
+
+
+async def test_detect() -> None:
+    dialect = Migrate.ddl.DIALECT
+    capabilities = await Capabilities.detect(Migrate.ddl.client, dialect)
+    assert capabilities.dialect == dialect
+    assert capabilities.version_info
@@ -0,0 +1,64 @@
+import json
+
+from asyncclick.testing import CliRunner
+from tortoise import Tortoise
+
+from aerich import Command
+from aerich.cli import check, init_db, upgrade
+from aerich.migrate import MIGRATE_TEMPLATE, Migrate
+from aerich.models import Aerich
+from conftest import tortoise_orm as tortoise_config
+
+
+async def test_upgrade_json(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    version_file = "1_20250101000000_json.py"
+    tmp_path.joinpath(version_file).write_text(
+        MIGRATE_TEMPLATE.format(
+            upgrade_sql="CREATE TABLE json_events (id INT);\n"
+            "        INSERT INTO json_events (id) VALUES (1);\n"
+            "        INSERT INTO json_events (id) VALUES (2);",
+            downgrade_sql="DROP TABLE json_events;",
+        )
+    )
+    failed_file = "2_20250101000000_failed.py"
+    tmp_path.joinpath(failed_file).write_text(
+        MIGRATE_TEMPLATE.format(
+            upgrade_sql="INSERT INTO missing (id) VALUES (1);", downgrade_sql=""
+        )
+    )
+    command = Command(tortoise_config)
+    try:
+        result = await CliRunner().invoke(upgrade, ["--format", "json"], obj={"command": command})
+        assert result.exit_code == 1
+        events = [json.loads(line) for line in result.output.splitlines()]
+        # each statement of the file in transaction has its events
+        statement_ends = [
+            e for e in events if e["event"] == "statement_end" and e["version"] == version_file
+        ]
+        assert [e["seq"] for e in statement_ends] == [0, 1, 2]
+        insert_rows = 1 if Migrate.ddl.has_row_count(statement_ends[1]["sql"]) else None
+        assert [e["rows"] for e in statement_ends] == [None, insert_rows, insert_rows]
+        assert events[-1]["event"] == "error"
+    finally:
+        await Aerich.filter(version=version_file).delete()
+        await Tortoise.get_connection("default").execute_script("DROP TABLE IF EXISTS json_events")
+
+
+async def test_init_db_bootstrap_without_migrations(tmp_path) -> None:
+    # the folder of the app exists, but has no migrations to bootstrap from
+    tmp_path.joinpath("models").mkdir()
+    tmp_path.joinpath("models", "__init__.py").touch()
+    command = Command(tortoise_config, location=str(tmp_path))
+    result = await CliRunner().invoke(init_db, ["--bootstrap"], obj={"command": command})
+    assert result.exit_code == 1
+    assert "has no migrations" in result.output
+    assert "already initialized" not in result.output
+
+
+async def test_check_without_migration(mocker) -> None:
+    mocker.patch.object(Migrate, "_last_version_content", None)
+    command = Command(tortoise_config)
+    result = await CliRunner().invoke(check, [], obj={"command": command})
+    assert result.exit_code == 1
+    assert "No migration applied" in result.output
@@ -0,0 +1,493 @@
+import copy
+import re
+
+import pytest
+from tortoise import Tortoise
+from tortoise.exceptions import IntegrityError, OperationalError
+
+import aerich
+from aerich import Command
+from aerich.ddl.mysql import MysqlDDL
+from aerich.ddl.postgres import PostgresDDL
+from aerich.exceptions import SquashError, UpgradeError
+from aerich.inspectdb.mysql import InspectMySQL
+from aerich.inspectdb.snapshot import get_describe_tables
+from aerich.migrate import MIGRATE_TEMPLATE, Migrate
+from aerich.models import AERICH_TABLE_APP, Aerich, AerichCheckpoint
+from aerich.utils import get_models_describe, import_py_file
+from conftest import tortoise_orm as tortoise_config
+
+
+class LockNotAvailableError(Exception):
+    sqlstate = "55P03"
+
+
+async def test_retry_on_lock_timeout(mocker) -> None:
+    mocker.patch.object(Migrate, "ddl", PostgresDDL(Migrate.ddl.client))
+    mocker.patch.object(Command, "lock_retry_delay", 0)
+    command = Command({})
+    calls = []
+
+    async def run(fail_times: int) -> None:
+        calls.append(fail_times)
+        if len(calls) <= fail_times:
+            raise LockNotAvailableError
+
+    await command._retry_on_lock_timeout(3, run, 3)
+    assert len(calls) == 4
+
+    calls.clear()
+    with pytest.raises(LockNotAvailableError):
+        await command._retry_on_lock_timeout(2, run, 3)
+    assert len(calls) == 3
+
+    async def fail() -> None:
+        calls.append(0)
+        raise ValueError
+
+    calls.clear()
+    with pytest.raises(ValueError):
+        await command._retry_on_lock_timeout(3, fail)
+    assert calls == [0]
+
+
+async def test_reset_lock_timeout(mocker) -> None:
+    mocker.patch.object(Migrate, "ddl", MysqlDDL(Migrate.ddl.client))
+    conn = mocker.AsyncMock()
+    conn.execute_script.side_effect = [None, OperationalError("Lock wait timeout exceeded"), None]
+    with pytest.raises(OperationalError):
+        await Command({})._execute_statement(conn, "1_update.py", 0, "DROP TABLE `a`", 500)
+    # the timeout is set on its own, and restored on the pooled connection even though the
+    # statement failed
+    assert [call.args for call in conn.execute_script.call_args_list] == [
+        (Migrate.ddl.set_lock_timeout(500, False),),
+        ("DROP TABLE `a`",),
+        (Migrate.ddl.reset_lock_timeout(False),),
+    ]
+
+
+async def test_lock_timeout_row_count(mocker) -> None:
+    mocker.patch.object(Migrate, "ddl", PostgresDDL(Migrate.ddl.client))
+    conn = mocker.AsyncMock()
+    conn.execute_query.return_value = (2, [])
+    timing = await Command({})._execute_statement(conn, "1_update.py", 0, "UPDATE a SET b = 1", 500)
+    # the rows are reported with the lock timeout too
+    assert timing["rows"] == 2
+    assert conn.execute_query.call_args.args == ("UPDATE a SET b = 1",)
+
+
+async def test_resume_upgrade(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    version_file = "1_20250101000000_resume.py"
+    tmp_path.joinpath(version_file).write_text(
+        MIGRATE_TEMPLATE.format(
+            upgrade_sql="CREATE TABLE resume_a (id INT);\n"
+            "        INSERT INTO resume_a (id) VALUES (1);\n"
+            "        INSERT INTO resume_b (id) VALUES (1);",
+            downgrade_sql="",
+        )
+    )
+    command = Command(tortoise_config)
+    conn = Tortoise.get_connection("default")
+    try:
+        with pytest.raises(OperationalError):
+            await command.upgrade(run_in_transaction=False)
+        assert not await Aerich.exists(version=version_file)
+        assert await AerichCheckpoint.filter(version=version_file).count() == 2
+
+        await conn.execute_script("CREATE TABLE resume_b (id INT)")
+        assert await command.upgrade(run_in_transaction=False) == [version_file]
+        assert await conn.execute_query_dict("SELECT id FROM resume_a") == [{"id": 1}]
+        assert await conn.execute_query_dict("SELECT id FROM resume_b") == [{"id": 1}]
+        assert not await AerichCheckpoint.filter(version=version_file).exists()
+    finally:
+        await Aerich.filter(version=version_file).delete()
+        await AerichCheckpoint.filter(version=version_file).delete()
+        await conn.execute_script("DROP TABLE IF EXISTS resume_a; DROP TABLE IF EXISTS resume_b")
+
+
+async def test_resume_changed_upgrade(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    version_file = "1_20250101000000_changed.py"
+    tmp_path.joinpath(version_file).write_text(
+        MIGRATE_TEMPLATE.format(upgrade_sql="SELECT 2;", downgrade_sql="")
+    )
+    await AerichCheckpoint.create(version=version_file, app="models", seq=0, checksum="")
+    try:
+        with pytest.raises(UpgradeError):
+            await Command(tortoise_config).upgrade(run_in_transaction=False)
+    finally:
+        await AerichCheckpoint.filter(version=version_file).delete()
+
+
+async def test_timings(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    version_file = "1_20250101000000_timings.py"
+    tmp_path.joinpath(version_file).write_text(
+        MIGRATE_TEMPLATE.format(
+            upgrade_sql="CREATE TABLE timings (id INT);\n"
+            "        INSERT INTO timings (id) VALUES (1), (2);",
+            downgrade_sql="DROP TABLE timings;",
+        )
+    )
+    command = Command(tortoise_config)
+    try:
+        # the statements are timed one by one, and checkpointed when not in transaction
+        assert await command.upgrade(run_in_transaction=False) == [version_file]
+        version = (await command.history_timings())[-1]
+        assert version.version == version_file
+        assert version.applied_at is not None
+        assert version.duration == command.durations[version_file] > 0
+        assert version.timings is not None
+        assert [timing["sql"] for timing in version.timings] == [
+            "CREATE TABLE timings (id INT)",
+            "INSERT INTO timings (id) VALUES (1), (2)",
+        ]
+        insert_rows = 2 if Migrate.ddl.has_row_count(version.timings[1]["sql"]) else None
+        assert [timing["rows"] for timing in version.timings] == [None, insert_rows]
+        assert all(timing["duration"] > 0 for timing in version.timings)
+
+        del command.durations[version_file]
+        mocker.patch.object(Migrate, "get_last_version", return_value=version)
+        snapshot_file = Migrate.get_snapshot_file(tmp_path / version_file)
+        snapshot_file.write_text("{}")
+        assert await command.downgrade(-1, True) == [version_file]
+        assert command.durations[version_file] > 0
+        # the snapshot of the migration is deleted with it
+        assert not tmp_path.joinpath(version_file).exists() and not snapshot_file.exists()
+    finally:
+        await Aerich.filter(version=version_file).delete()
+        await Tortoise.get_connection("default").execute_script("DROP TABLE IF EXISTS timings")
+
+
+async def test_migrate_aerich_table(mocker) -> None:
+    conn = Tortoise.get_connection("default")
+    sql = 'SELECT "aerich"."timings" FROM "aerich"'
+    if isinstance(Migrate.ddl, MysqlDDL):
+        sql = sql.replace('"', "`")
+    await Aerich.filter(app=AERICH_TABLE_APP).delete()
+    await Aerich.create(version="0_20250101000000_init.py", app="old", content={"v": 1})
+    await conn.execute_script(Migrate.ddl.drop_column(Aerich, "timings"))
+    with pytest.raises(OperationalError):
+        await conn.execute_query(sql)
+    # the last version is read from the aerich table of an older aerich as it is
+    try:
+        mocker.patch.object(Migrate, "app", "old", create=True)
+        last_version = await Migrate.get_last_version()
+        assert last_version is not None and last_version.content == {"v": 1}
+    finally:
+        await Aerich.filter(app="old").delete()
+
+    assert await Migrate.migrate_aerich_table() == ["Added column aerich.timings"]
+    await conn.execute_query(sql)
+    # skipped once applied, by the query of the marker only
+    execute_query = mocker.spy(conn, "execute_query")
+    assert await Migrate.migrate_aerich_table() == []
+    assert execute_query.call_count == 1
+
+
+async def test_migrate_aerich_unique_index() -> None:
+    conn = Tortoise.get_connection("default")
+    select_index = Migrate.ddl.select_index(Aerich, ["app", "version"], True)
+    assert await conn.execute_query_dict(select_index)
+    try:
+        await Aerich.create(version="0_20250101000000_init.py", app="unique", content={})
+        with pytest.raises(IntegrityError):
+            await Aerich.create(version="0_20250101000000_init.py", app="unique", content={})
+
+        # the aerich table created by an older aerich, without the index and the marker
+        await conn.execute_script(Migrate.ddl.drop_table(Aerich._meta.db_table))
+        create_table = re.sub(
+            r",\s*(CONSTRAINT \S+ UNIQUE|UNIQUE KEY \S+) \([^)]*\)",
+            "",
+            Migrate.ddl.create_table(Aerich),
+        )
+        await conn.execute_script(create_table)
+        assert not await conn.execute_query_dict(select_index)
+        for content in ({"v": 1}, {"v": 2}):
+            await Aerich.create(version="0_20250101000000_init.py", app="unique", content=content)
+        await Aerich.create(version="0_20250101000000_init.py", app="other", content={})
+
+        changes = await Migrate.migrate_aerich_table()
+        assert await conn.execute_query_dict(select_index)
+        assert [(a.app, a.content) for a in await Aerich.filter(app__in=["unique", "other"])] == [
+            ("other", {}),
+            ("unique", {"v": 2}),
+        ]
+        kept = await Aerich.get(app="unique")
+        assert changes == [
+            f"Deleted duplicated row {kept.pk - 1} of ('unique', '0_20250101000000_init.py') "
+            "from aerich",
+            "Added unique index of ('app', 'version') to aerich",
+        ]
+        assert await Migrate.migrate_aerich_table() == []
+    finally:
+        await Aerich.filter(app__in=["unique", "other"]).delete()
+
+
+async def test_upgrade_events(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    version_file = "1_20250101000000_events.py"
+    tmp_path.joinpath(version_file).write_text(
+        MIGRATE_TEMPLATE.format(
+            upgrade_sql="CREATE TABLE events (id INT);\n"
+            "        INSERT INTO events (id) VALUES (1);",
+            downgrade_sql="",
+        )
+    )
+    failed_file = "2_20250101000000_failed.py"
+    tmp_path.joinpath(failed_file).write_text(
+        MIGRATE_TEMPLATE.format(
+            upgrade_sql="INSERT INTO missing (id) VALUES (1);", downgrade_sql=""
+        )
+    )
+    command = Command(tortoise_config)
+    events = []
+    try:
+        with pytest.raises(OperationalError):
+            async for event in command.upgrade_events():
+                events.append(event)
+        # the statements of the file are executed one by one in the transaction
+        assert [(e["event"], e["version"], e.get("seq")) for e in events] == [
+            ("file_start", version_file, None),
+            ("statement_start", version_file, 0),
+            ("statement_end", version_file, 0),
+            ("statement_start", version_file, 1),
+            ("statement_end", version_file, 1),
+            ("file_end", version_file, None),
+            ("file_start", failed_file, None),
+            ("statement_start", failed_file, 0),
+        ]
+        assert [e["sql"] for e in events[2:5:2]] == [
+            "CREATE TABLE events (id INT)",
+            "INSERT INTO events (id) VALUES (1)",
+        ]
+        insert_rows = 1 if Migrate.ddl.has_row_count(events[4]["sql"]) else None
+        assert [e["rows"] for e in events[2:5:2]] == [None, insert_rows]
+        assert events[2]["start"] <= events[2]["end"]
+        assert events[5]["duration"] >= events[2]["duration"] + events[4]["duration"]
+        assert not command._listeners
+    finally:
+        await Aerich.filter(version=version_file).delete()
+        await Tortoise.get_connection("default").execute_script("DROP TABLE IF EXISTS events")
+
+
+async def test_squash(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    mocker.patch.object(Migrate, "app", "models", create=True)
+    describe = get_models_describe("models")
+    migrations = {
+        "0_20250101000000_init.py": ("CREATE TABLE squash_a (id INT);", "DROP TABLE squash_a;"),
+        "1_20250101000001_update.py": (
+            "CREATE TABLE squash_b (id INT);\n        DROP TABLE squash_a;",
+            "DROP TABLE squash_b;",
+        ),
+        "2_20250101000002_update.py": ("CREATE TABLE squash_c (id INT);", "DROP TABLE squash_c;"),
+    }
+    for version_file, (upgrade_sql, downgrade_sql) in migrations.items():
+        lock_timeout = "LOCK_TIMEOUT = 200\n" if version_file.startswith("0_") else ""
+        tmp_path.joinpath(version_file).write_text(
+            lock_timeout
+            + MIGRATE_TEMPLATE.format(upgrade_sql=upgrade_sql, downgrade_sql=downgrade_sql)
+        )
+        Migrate.write_snapshot(tmp_path / version_file, describe, "")
+    version_files = list(migrations)
+    command = Command(tortoise_config)
+    conn = Tortoise.get_connection("default")
+    try:
+        assert await command.upgrade() == version_files
+        last_pk = (await Aerich.get(version=version_files[1])).pk
+
+        squashed = await command.squash(1)
+        assert squashed.startswith("1_") and squashed.endswith("_squashed.py")
+        assert Migrate.get_all_version_files() == [squashed, version_files[2]]
+        assert Migrate.get_snapshot_file(tmp_path / squashed).exists()
+        assert not Migrate.get_snapshot_file(tmp_path / version_files[1]).exists()
+        m = import_py_file(tmp_path / squashed)
+        assert m.REPLACES == version_files[:2]
+        assert m.LOCK_TIMEOUT == 200
+        # the tables of the models instead of the history of the statements
+        upgrade_sql = await m.upgrade(None)
+        assert "squash_" not in upgrade_sql
+        assert Migrate.ddl.schema_generator.quote("category") in upgrade_sql
+        assert not (await m.downgrade(None)).strip()
+
+        # the database that has applied the squashed versions
+        assert await command.heads() == []
+        assert await command.upgrade() == []
+        assert (await Aerich.get(version=squashed)).pk == last_pk
+        assert not await Aerich.filter(version__in=m.REPLACES).exists()
+
+        # squash the squashed file again
+        resquashed = await command.squash(2)
+        m = import_py_file(tmp_path / resquashed)
+        assert m.REPLACES == [*version_files[:2], squashed, version_files[2]]
+        last_pk = (await Aerich.get(version=version_files[2])).pk
+        assert await command.heads() == []
+        assert await command.upgrade() == []
+        assert await Aerich.filter(version__in=m.REPLACES).count() == 0
+        assert (await Aerich.get(version=resquashed)).pk == last_pk
+
+        # a fresh database, whose tables are created by the squashed file
+        await Aerich.filter(version=resquashed).delete()
+        assert await command.upgrade() == [resquashed]
+
+        with pytest.raises(SquashError):
+            await command.squash(2)
+    finally:
+        await Aerich.filter(version__in=[*migrations, squashed, resquashed]).delete()
+        await conn.execute_script(
+            "DROP TABLE IF EXISTS squash_a; DROP TABLE IF EXISTS squash_b;"
+            " DROP TABLE IF EXISTS squash_c"
+        )
+
+
+async def test_squash_errors(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    mocker.patch.object(Migrate, "app", "models", create=True)
+    describe = get_models_describe("models")
+    version_files = ["0_20250101000000_init.py", "1_20250101000001_update.py"]
+    for i, version_file in enumerate(version_files):
+        tmp_path.joinpath(version_file).write_text(
+            f"LOCK_TIMEOUT = {(i + 1) * 100}\n"
+            + MIGRATE_TEMPLATE.format(upgrade_sql="SELECT 1;", downgrade_sql="")
+        )
+    command = Command(tortoise_config)
+    with pytest.raises(SquashError, match="No snapshot"):
+        await command.squash(1)
+
+    # the models have changed since the snapshot
+    config = copy.deepcopy(describe["models.Config"])
+    config["data_fields"] = [f for f in config["data_fields"] if f["name"] != "label"]
+    Migrate.write_snapshot(tmp_path / version_files[1], {**describe, "models.Config": config}, "")
+    with pytest.raises(SquashError, match="changed"):
+        await command.squash(1)
+
+    Migrate.write_snapshot(tmp_path / version_files[1], describe, "")
+    with pytest.raises(SquashError, match="LOCK_TIMEOUT"):
+        await command.squash(1)
+    assert Migrate.get_all_version_files() == version_files
+
+
+async def test_squash_partially_applied(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    version_file = "1_20250101000000_squashed.py"
+    tmp_path.joinpath(version_file).write_text(
+        "REPLACES = ['0_20250101000000_init.py', '1_20250101000000_update.py']\n"
+        + MIGRATE_TEMPLATE.format(upgrade_sql="SELECT 1;", downgrade_sql="")
+    )
+    await Aerich.create(version="0_20250101000000_init.py", app="models", content={})
+    command = Command(tortoise_config)
+    try:
+        assert await command.heads() == [version_file]
+        with pytest.raises(UpgradeError):
+            await command.upgrade()
+    finally:
+        await Aerich.filter(version="0_20250101000000_init.py").delete()
+
+
+async def test_bootstrap_db(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    # the tables of the test database are already created, keep its connection
+    mocker.patch.object(Tortoise, "init")
+    dirname = tmp_path / "models"
+    dirname.mkdir()
+    versions = ["0_20250101000000_init.py", "1_20250101000001_update.py"]
+    for version_file in versions:
+        dirname.joinpath(version_file).write_text(
+            MIGRATE_TEMPLATE.format(upgrade_sql="SELECT 1;", downgrade_sql="")
+        )
+    await Aerich.create(version=versions[0], app="models", content={})
+    command = Command(tortoise_config, location=str(tmp_path))
+    try:
+        with pytest.raises(FileExistsError):
+            await command.init_db(safe=True)
+        assert await command.bootstrap_db(safe=True) == versions[1:]
+        assert await command.heads() == []
+        assert await Aerich.filter(version__in=versions).count() == 2
+        assert await command.bootstrap_db(safe=True) == []
+    finally:
+        await Aerich.filter(version__in=versions).delete()
+
+    with pytest.raises(FileNotFoundError):
+        await Command(tortoise_config, location=str(tmp_path / "empty")).bootstrap_db(safe=True)
+
+
+async def test_fake_upgrade(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    versions = ["0_20250101000000_init.py", "1_20250101000001_update.py"]
+    for version_file in versions:
+        # the files are not imported when faking
+        tmp_path.joinpath(version_file).write_text("raise ImportError")
+    import_py_file = mocker.spy(aerich, "import_py_file")
+    bulk_create = mocker.spy(Aerich, "bulk_create")
+    command = Command(tortoise_config)
+    try:
+        events = [event async for event in command.upgrade_events(fake=True)]
+        assert [(e["event"], e["version"]) for e in events] == [
+            ("file_start", versions[0]),
+            ("file_start", versions[1]),
+            ("file_end", versions[0]),
+            ("file_end", versions[1]),
+        ]
+        assert import_py_file.call_count == 0
+        assert bulk_create.call_count == 1
+        assert await command.heads() == []
+        assert await command.upgrade(fake=True) == []
+    finally:
+        await Aerich.filter(version__in=versions).delete()
+
+
+async def test_check(mocker, tmp_path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    mocker.patch.object(Migrate, "app", "models", create=True)
+    describe = get_models_describe("models")
+    mocker.patch.object(Migrate, "_last_version_content", describe)
+    command = Command(tortoise_config)
+    # the database is created from the models
+    assert await command.check() == []
+
+    config = copy.deepcopy(describe["models.Config"])
+    label = next(field for field in config["data_fields"] if field["name"] == "label")
+    config["data_fields"].append({**label, "name": "lost", "db_column": "lost"})
+    mocker.patch.object(Migrate, "_last_version_content", {**describe, "models.Config": config})
+    differences = await command.check()
+    assert [str(difference) for difference in differences] == ["- column config.lost"]
+
+    version_file = await command.fix_drift(differences)
+    m = import_py_file(tmp_path / version_file)
+    assert "lost" in await m.upgrade(None)
+    assert "lost" in await m.downgrade(None)
+
+
+async def test_check_mysql(mocker) -> None:
+    describe = get_models_describe("models")
+    mocker.patch.object(Migrate, "_last_version_content", describe)
+    tables = get_describe_tables(describe)
+    for table in tables:
+        # MySQL indexes the foreign key columns but the first one of the through tables,
+        # which is indexed by the unique index of the table
+        through = not any(column.pk for column in table.columns)
+        foreign_keys = [foreign_key.column for foreign_key in table.foreign_keys]
+        for column in table.columns:
+            if column.name in foreign_keys[through:]:
+                column.index = True
+
+    class InspectTables(InspectMySQL):
+        async def get_tables(self, names):
+            return [table for table in copy.deepcopy(tables) if table.name in names]
+
+    mocker.patch.object(
+        Command, "_get_inspect", side_effect=lambda names: InspectTables(mocker.Mock(), names)
+    )
+    command = Command(tortoise_config)
+    assert await command.check() == []
+
+    # MySQL doesn't drop an index needed by a foreign key, the others can be dropped
+    for table in tables:
+        for column in table.columns:
+            if table.name == "user" and column.name == "is_superuser":
+                column.index = False
+    assert [str(difference) for difference in await command.check()] == [
+        "~ column user.is_superuser: index True -> False"
+    ]
@@ -1,9 +1,18 @@
+import copy
+import sqlite3
+
+import pytest
 import tortoise
+from tortoise.exceptions import OperationalError
 
+from aerich.capabilities import Capabilities
+from aerich.ddl import STATEMENT_SEPARATOR
 from aerich.ddl.mysql import MysqlDDL
 from aerich.ddl.postgres import PostgresDDL
 from aerich.ddl.sqlite import SqliteDDL
+from aerich.exceptions import NotSupportError
 from aerich.migrate import Migrate
+from aerich.operations import DropColumn, RenameColumn
 from tests.models import Category, Product, User
 
 
@@ -234,3 +243,153 @@ def test_drop_fk():
         assert ret == 'ALTER TABLE "category" DROP CONSTRAINT IF EXISTS "fk_category_user_110d4c63"'
     else:
         assert ret == 'ALTER TABLE "category" DROP FOREIGN KEY "fk_category_user_110d4c63"'
+
+
+def test_merge_alter_operators():
+    ddl = MysqlDDL(Migrate.ddl.client)
+    operators = [
+        "ALTER TABLE `configs` RENAME TO `config`",
+        "ALTER TABLE `config` ADD `user_id` INT NOT NULL COMMENT 'User'",
+        "ALTER TABLE `config` DROP COLUMN `name`",
+        "ALTER TABLE `config` MODIFY COLUMN `name` VARCHAR(100) NOT NULL",
+        "ALTER TABLE `config` ALTER COLUMN `status` DROP DEFAULT",
+        "ALTER TABLE `email` RENAME COLUMN `id` TO `email_id`",
+        "ALTER TABLE `email` ADD INDEX `idx_email_email_4a1a33` (`email`)",
+        "ALTER TABLE `email` ADD UNIQUE INDEX `uid_email_email_4a1a33` (`email_id`)",
+        "DROP TABLE IF EXISTS `email_user`",
+        "ALTER TABLE `config` ADD CONSTRAINT `fk_config_user_17daa970` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`) ON DELETE CASCADE",
+        "ALTER TABLE `config` ADD FULLTEXT INDEX `idx_config_key_5b3d39` (`key`)",
+    ]
+    assert ddl.merge_alter_operators(operators) == [
+        "ALTER TABLE `configs` RENAME TO `config`",
+        "ALTER TABLE `config` ADD `user_id` INT NOT NULL COMMENT 'User', DROP COLUMN `name`",
+        "ALTER TABLE `config` MODIFY COLUMN `name` VARCHAR(100) NOT NULL, ALTER COLUMN `status` DROP DEFAULT",
+        "ALTER TABLE `email` RENAME COLUMN `id` TO `email_id`, ADD INDEX `idx_email_email_4a1a33` (`email`)",
+        "ALTER TABLE `email` ADD UNIQUE INDEX `uid_email_email_4a1a33` (`email_id`)",
+        "DROP TABLE IF EXISTS `email_user`",
+        "ALTER TABLE `config` ADD CONSTRAINT `fk_config_user_17daa970` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`) ON DELETE CASCADE, ADD FULLTEXT INDEX `idx_config_key_5b3d39` (`key`)",
+    ]
+    if not isinstance(Migrate.ddl, MysqlDDL):
+        assert Migrate.ddl.merge_alter_operators(operators) == operators
+
+
+def test_rebuild_table():
+    new_describe = Category.describe(False)
+    old_describe = copy.deepcopy(new_describe)
+    old_describe["table"] = "old_category"
+    old_describe["data_fields"] = [f for f in old_describe["data_fields"] if f["name"] != "title"]
+    for field in old_describe["data_fields"]:
+        if field["db_column"] == "owner_id":
+            field["db_column"] = "user_id"
+    args = (Category, old_describe, new_describe, {"owner_id": "user_id"})
+    if not isinstance(Migrate.ddl, SqliteDDL):
+        with pytest.raises(NotSupportError):
+            Migrate.ddl.rebuild_table(*args, {})
+        return
+    sql = Migrate.ddl.rebuild_table(*args, {"owner_id": User.describe(False)})
+    assert sql.split(STATEMENT_SEPARATOR)[2:5] == [
+        'INSERT INTO "_aerich_tmp_category" ("id", "slug", "name", "created_at", "owner_id") SELECT "id", "slug", "name", "created_at", "user_id" FROM "old_category"',
+        'DROP TABLE IF EXISTS "old_category"',
+        'ALTER TABLE "_aerich_tmp_category" RENAME TO "category"',
+    ]
+    with sqlite3.connect(":memory:") as conn:
+        conn.executescript(
+            'CREATE TABLE "user" ("id" INTEGER PRIMARY KEY);'
+            'CREATE TABLE "old_category" ("id" INTEGER PRIMARY KEY, "slug" TEXT, "name" TEXT,'
+            ' "created_at" TIMESTAMP, "user_id" INT);'
+            'INSERT INTO "user" VALUES (1);'
+            "INSERT INTO \"old_category\" VALUES (1, 'a', 'b', '2024-01-01', 1);"
+        )
+        # the added not null column has no default to fill the existing rows
+        conn.executescript(sql.replace('"title" VARCHAR(20) NOT NULL', '"title" VARCHAR(20)'))
+        rows = conn.execute('SELECT "id", "slug", "name", "owner_id" FROM "category"').fetchall()
+        assert rows == [(1, "a", "b", 1)]
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+
+def test_requires_rebuild():
+    ddl = SqliteDDL(Migrate.ddl.client, Capabilities("sqlite", "3.24.0"))
+    assert ddl.requires_rebuild(RenameColumn(Category, "user_id", "owner_id"))
+    assert ddl.requires_rebuild(DropColumn(Category, "title"))
+    ddl = SqliteDDL(Migrate.ddl.client, Capabilities("sqlite", "3.35.5"))
+    assert not ddl.requires_rebuild(RenameColumn(Category, "user_id", "owner_id"))
+    assert not ddl.requires_rebuild(DropColumn(Category, "title"))
+    assert not PostgresDDL(Migrate.ddl.client).requires_rebuild(DropColumn(Category, "title"))
+
+
+class LockNotAvailableError(Exception):
+    sqlstate = "55P03"
+
+
+def test_lock_timeout():
+    ddl = PostgresDDL(Migrate.ddl.client)
+    # executed on its own before the statement
+    assert ddl.set_lock_timeout(500, True) == "SET LOCAL lock_timeout = '500ms'"
+    assert ddl.reset_lock_timeout(True) == ""
+    assert ddl.set_lock_timeout(500, False) == "SET lock_timeout = '500ms'"
+    assert ddl.reset_lock_timeout(False) == "RESET lock_timeout"
+    assert ddl.is_lock_timeout(LockNotAvailableError())
+    assert ddl.is_lock_timeout(OperationalError(LockNotAvailableError()))
+    assert not ddl.is_lock_timeout(OperationalError("syntax error"))
+
+    ddl = MysqlDDL(Migrate.ddl.client)
+    assert ddl.set_lock_timeout(500, False).split(";\n") == [
+        "SET SESSION lock_wait_timeout = 1",
+        "SET SESSION innodb_lock_wait_timeout = 1",
+    ]
+    assert ddl.reset_lock_timeout(True).split(";\n") == [
+        "SET SESSION lock_wait_timeout = DEFAULT",
+        "SET SESSION innodb_lock_wait_timeout = DEFAULT",
+    ]
+    assert ddl.is_lock_timeout(OperationalError(Exception(1205, "Lock wait timeout exceeded")))
+    assert not ddl.is_lock_timeout(OperationalError(Exception(1064, "syntax error")))
+
+
+def test_split_statements():
+    sql = """
+        CREATE TABLE "a;b" ("c" VARCHAR(10) DEFAULT ';' /* ; */);
+        -- comment;
+        INSERT INTO "a;b" ("c") VALUES ('it''s;');
+        ;
+    """
+    assert Migrate.ddl.split_statements(sql) == [
+        'CREATE TABLE "a;b" ("c" VARCHAR(10) DEFAULT \';\' /* ; */)',
+        "-- comment;\n        INSERT INTO \"a;b\" (\"c\") VALUES ('it''s;')",
+    ]
+    sql = "INSERT INTO `a` VALUES ('\\';', \"\\\";\");DROP TABLE `b;`"
+    assert MysqlDDL(Migrate.ddl.client).split_statements(sql) == [
+        "INSERT INTO `a` VALUES ('\\';', \"\\\";\")",
+        "DROP TABLE `b;`",
+    ]
+    sql = "CREATE FUNCTION f() RETURNS int AS $body$ SELECT 1; $body$ LANGUAGE sql; SELECT f()"
+    assert PostgresDDL(Migrate.ddl.client).split_statements(sql) == [
+        "CREATE FUNCTION f() RETURNS int AS $body$ SELECT 1; $body$ LANGUAGE sql",
+        "SELECT f()",
+    ]
+    sql = "CREATE FUNCTION f() RETURNS int AS $$ BEGIN RETURN 1; END; $$ LANGUAGE plpgsql; BEGIN;"
+    assert PostgresDDL(Migrate.ddl.client).split_statements(sql) == [
+        "CREATE FUNCTION f() RETURNS int AS $$ BEGIN RETURN 1; END; $$ LANGUAGE plpgsql",
+        "BEGIN",
+    ]
+    sql = """CREATE TRIGGER t BEFORE INSERT ON a FOR EACH ROW BEGIN
+            IF NEW.b < 0 THEN SET NEW.b = 0; END IF;
+            SET NEW.c = CASE WHEN NEW.b > 1 THEN 1 ELSE 0 END;
+        END;
+        START TRANSACTION"""
+    assert MysqlDDL(Migrate.ddl.client).split_statements(sql) == [
+        sql.split(";\n        START")[0],
+        "START TRANSACTION",
+    ]
+    sql = "CREATE TRIGGER t AFTER INSERT ON a BEGIN UPDATE b SET c = 1; END; BEGIN IMMEDIATE"
+    assert SqliteDDL(Migrate.ddl.client).split_statements(sql) == [
+        "CREATE TRIGGER t AFTER INSERT ON a BEGIN UPDATE b SET c = 1; END",
+        "BEGIN IMMEDIATE",
+    ]
+
+
+def test_has_row_count() -> None:
+    for ddl in (SqliteDDL, MysqlDDL, PostgresDDL):
+        assert ddl(Migrate.ddl.client).has_row_count('UPDATE "a" SET "b" = 1')
+        assert not ddl(Migrate.ddl.client).has_row_count('ALTER TABLE "a" ADD "b" INT')
+    assert MysqlDDL(Migrate.ddl.client).has_row_count('insert into "a" values (1)')
+    assert not PostgresDDL(Migrate.ddl.client).has_row_count('INSERT INTO "a" VALUES (1)')
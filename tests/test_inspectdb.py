@@ -0,0 +1,340 @@
+import asyncio
+import json
+from typing import Dict, List, Type
+
+import pytest
+from tortoise import Tortoise
+
+from aerich import Command
+from aerich.exceptions import SnapshotError
+from aerich.inspectdb import Column, Inspect, Table, TableForeignKey, TableIndex
+from aerich.inspectdb.mysql import InspectMySQL
+from aerich.inspectdb.postgres import InspectPostgres
+from aerich.inspectdb.snapshot import load_tables
+from aerich.inspectdb.sqlite import InspectSQLite
+from conftest import tortoise_orm as tortoise_config
+
+
+def get_inspect(tables=None) -> Inspect:
+    conn = Tortoise.get_connection("default")
+    cls: Dict[str, Type[Inspect]] = {
+        "mysql": InspectMySQL,
+        "postgres": InspectPostgres,
+        "sqlite": InspectSQLite,
+    }
+    return cls[conn.schema_generator.DIALECT](conn, tables)
+
+
+async def test_get_tables_columns(mocker) -> None:
+    inspect = get_inspect()
+    tables = await inspect.get_all_tables()
+    assert len(tables) > 1
+    execute_query_dict = mocker.spy(inspect.conn, "execute_query_dict")
+
+    tables_columns = await inspect.get_tables_columns(tables)
+    queries = execute_query_dict.call_count
+    assert queries <= 2
+    assert sorted(tables_columns) == sorted(tables)
+    for table in tables:
+        assert await inspect.get_columns(table) == tables_columns[table]
+
+    execute_query_dict.reset_mock()
+    assert list(await inspect.get_tables_columns(tables[:1])) == tables[:1]
+    assert execute_query_dict.call_count == queries
+
+
+async def test_get_tables_indexes(mocker) -> None:
+    inspect = get_inspect()
+    execute_query_dict = mocker.spy(inspect.conn, "execute_query_dict")
+    (product,) = await inspect.get_tables(["product"])
+    # a query at most for each of the columns, the indexes and the foreign keys
+    assert execute_query_dict.call_count <= 3
+    assert sorted((index.columns, index.unique) for index in product.indexes) == [
+        (["name", "type_db_alias"], False),
+        (["name", "type_db_alias"], True),
+    ]
+    columns = {column.name: column for column in product.columns}
+    assert not columns["name"].unique and not columns["name"].index
+    assert inspect.get_model(product).endswith(
+        "\n\n    class Meta:\n"
+        "        unique_together = (('name', 'type_db_alias'),)\n"
+        "        indexes = (('name', 'type_db_alias'),)"
+    )
+    (user,) = await inspect.get_tables(["user"])
+    columns = {column.name: column for column in user.columns}
+    assert columns["username"].unique and columns["is_superuser"].index
+
+
+async def test_get_tables_indexes_mysql(mocker) -> None:
+    columns = [
+        {
+            "TABLE_NAME": "t",
+            "COLUMN_NAME": name,
+            "IS_NULLABLE": "NO",
+            "DATA_TYPE": "int",
+            "COLUMN_DEFAULT": None,
+            "COLUMN_KEY": "PRI" if name == "id" else "",
+            "COLUMN_COMMENT": "",
+            "EXTRA": "",
+            "CHARACTER_MAXIMUM_LENGTH": None,
+            "NUMERIC_PRECISION": 10,
+            "NUMERIC_SCALE": 0,
+        }
+        for name in ("id", "a", "b", "c")
+    ]
+    statistics = [
+        ("idx_a", 1, "BTREE", "a"),
+        ("uid_a_b", 0, "BTREE", "a"),
+        ("uid_a_b", 0, "BTREE", "b"),
+        ("idx_c", 1, "FULLTEXT", "c"),
+        ("idx_func", 1, "BTREE", None),
+    ]
+
+    async def execute_query_dict(sql: str, values: list) -> list:
+        if "information_schema.COLUMNS" in sql:
+            return columns
+        if "information_schema.STATISTICS" in sql:
+            return [
+                {
+                    "TABLE_NAME": "t",
+                    "INDEX_NAME": name,
+                    "NON_UNIQUE": non_unique,
+                    "INDEX_TYPE": index_type,
+                    "COLUMN_NAME": column,
+                }
+                for name, non_unique, index_type, column in statistics
+            ]
+        return []
+
+    inspect = InspectMySQL(mocker.Mock(database="test", execute_query_dict=execute_query_dict))
+    (table,) = await inspect.get_tables(["t"])
+    # each column once, only the single column index sets `Column.index`
+    assert [(column.name, column.unique, column.index) for column in table.columns] == [
+        ("id", False, False),
+        ("a", False, True),
+        ("b", False, False),
+        ("c", False, False),
+    ]
+    assert [(index.name, index.columns, index.unique, index.type) for index in table.indexes] == [
+        ("uid_a_b", ["a", "b"], True, None),
+        ("idx_c", ["c"], False, "fulltext"),
+    ]
+    assert inspect.get_model(table).endswith(
+        "    class Meta:\n"
+        "        unique_together = (('a', 'b'),)\n"
+        "        indexes = (FullTextIndex(fields=('c',)),)"
+    )
+
+
+class InspectIndexes(Inspect):
+    _index_classes = InspectPostgres._index_classes
+
+    @property
+    def field_map(self):
+        return {"int": self.int_field}
+
+    async def get_tables_columns(self, tables: List[str]) -> Dict[str, List[Column]]:
+        return {
+            table: [
+                Column(
+                    name=name,
+                    data_type="int",
+                    null=False,
+                    default=None,
+                    pk=False,
+                    unique=False,
+                    index=False,
+                )
+                for name in ("a", "b", "c")
+            ]
+            for table in tables
+        }
+
+    async def get_tables_indexes(self, tables: List[str]) -> Dict[str, List[TableIndex]]:
+        return {
+            "t": [
+                TableIndex(name="uid_a", columns=["a"], unique=True),
+                TableIndex(name="idx_b", columns=["b"]),
+                TableIndex(name="idx_c", columns=["c"], type="gin"),
+                TableIndex(name="uid_a_b", columns=["a", "b"], unique=True),
+                TableIndex(name="idx_b_c", columns=["b", "c"]),
+                TableIndex(name="idx_a_c", columns=["a", "c"], type="unknown"),
+            ]
+        }
+
+
+async def test_get_model_indexes() -> None:
+    inspect = InspectIndexes(Tortoise.get_connection("default"))
+    (table,) = await inspect.get_tables(["t"])
+    assert [(column.unique, column.index) for column in table.columns] == [
+        (True, False),
+        (False, True),
+        (False, False),
+    ]
+    assert [index.name for index in table.indexes] == ["idx_c", "uid_a_b", "idx_b_c", "idx_a_c"]
+    assert inspect.get_model(table) == (
+        "from tortoise.contrib.postgres.indexes import GinIndex\n"
+        "\n"
+        "\n"
+        "class T(Model):\n"
+        "    a = fields.IntField(unique=True, )\n"
+        "    b = fields.IntField(index=True, )\n"
+        "    c = fields.IntField()\n"
+        "\n"
+        "    class Meta:\n"
+        "        unique_together = (('a', 'b'),)\n"
+        "        indexes = (GinIndex(fields=('c',)), ('b', 'c'), ('a', 'c'))"
+    )
+
+
+async def test_get_tables_foreign_keys() -> None:
+    inspect = get_inspect()
+    config, email = await inspect.get_tables(["config", "email"])
+    assert [(fk.column, fk.to_table, fk.on_delete) for fk in config.foreign_keys] == [
+        ("user_id", "user", "CASCADE")
+    ]
+    assert '    user = fields.ForeignKeyField("models.User", ' in inspect.get_model(config)
+    assert '    config = fields.OneToOneField("models.Config", ' in inspect.get_model(email)
+
+
+def test_get_model_foreign_keys() -> None:
+    inspect = InspectIndexes(Tortoise.get_connection("default"), app="legacy")
+    columns = [
+        Column(
+            name=name, data_type="int", null=null, default=None, pk=pk, unique=unique, index=False
+        )
+        for name, null, pk, unique in (
+            ("id", False, True, False),
+            ("author_id", False, False, False),
+            ("editor", True, False, False),
+            ("profile_id", False, False, True),
+            ("group_id", False, False, False),
+        )
+    ]
+    table = Table(
+        name="post",
+        columns=columns,
+        indexes=[TableIndex(name="uid_post", columns=["author_id", "group_id"], unique=True)],
+        foreign_keys=[
+            TableForeignKey(
+                column="author_id", to_table="user", to_column="id", on_delete="CASCADE"
+            ),
+            TableForeignKey(
+                column="editor", to_table="user", to_column="uid", on_delete="SET NULL"
+            ),
+            TableForeignKey(column="profile_id", to_table="profile", on_delete="RESTRICT"),
+            TableForeignKey(column="group_id", to_table="group", on_delete="NO ACTION"),
+        ],
+    )
+    assert inspect.get_model(table) == (
+        "class Post(Model):\n"
+        "    id = fields.IntField(pk=True, )\n"
+        '    author = fields.ForeignKeyField("legacy.User", related_name="post_author", )\n'
+        '    editor = fields.ForeignKeyField("legacy.User", related_name="post_editor", '
+        'source_field="editor", to_field="uid", on_delete=fields.SET_NULL, null=True, )\n'
+        '    profile = fields.OneToOneField("legacy.Profile", on_delete=fields.RESTRICT, )\n'
+        '    group = fields.ForeignKeyField("legacy.Group", on_delete=fields.NO_ACTION, )\n'
+        "\n"
+        "    class Meta:\n"
+        "        unique_together = (('author', 'group'),)"
+    )
+
+
+async def test_inspect_queries(mocker) -> None:
+    inspect = get_inspect()
+    execute_query_dict = mocker.spy(inspect.conn, "execute_query_dict")
+    ret = await inspect.inspect()
+    # all the tables + their columns, indexes and foreign keys
+    assert execute_query_dict.call_count <= 4
+    for table in await inspect.get_all_tables():
+        assert f"class {table.title().replace('_', '')}(Model):" in ret
+
+
+class InspectPerTable(Inspect):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.running = self.max_running = 0
+
+    async def get_columns(self, table: str) -> List[Column]:
+        self.running += 1
+        self.max_running = max(self.running, self.max_running)
+        # the later tables finish first
+        await asyncio.sleep(0.001 * (10 - int(table[1:])))
+        self.running -= 1
+        column = Column(
+            name=table,
+            data_type="int",
+            null=False,
+            default=None,
+            pk=True,
+            unique=False,
+            index=False,
+        )
+        return [column]
+
+
+async def test_get_tables_columns_concurrently() -> None:
+    tables = [f"t{i}" for i in range(10)]
+    inspect = InspectPerTable(Tortoise.get_connection("default"), tables, concurrency=3)
+    tables_columns = await inspect.get_tables_columns(tables)
+    assert list(tables_columns) == tables
+    assert [columns[0].name for columns in tables_columns.values()] == tables
+    assert inspect.max_running == 3
+
+
+async def test_inspect_models(mocker) -> None:
+    inspect = get_inspect()
+    tables = await inspect.get_all_tables()
+    get_tables = mocker.spy(inspect, "get_tables")
+    models = [item async for item in inspect.inspect_models(batch_size=2)]
+    assert [table for table, _ in models] == tables
+    assert get_tables.call_count == (len(tables) + 1) // 2
+    assert await inspect.inspect() == "from tortoise import Model, fields\n\n\n" + "\n\n\n".join(
+        model for _, model in models
+    )
+
+
+def test_field_map_cached() -> None:
+    inspect = get_inspect()
+    assert inspect.field_map is inspect.field_map
+    column = Column(
+        name="a", data_type="x", null=False, default=None, pk=False, unique=False, index=False
+    )
+    assert column.length is None and column.comment is None
+
+
+async def test_snapshot() -> None:
+    command = Command(tortoise_config)
+    snapshot = await command.inspectdb_snapshot()
+    inspect = get_inspect()
+    assert load_tables(snapshot) == await inspect.get_tables(await inspect.get_all_tables())
+    # the database is created from the models
+    assert await command.snapshot_diff(snapshot) == []
+    assert await command.snapshot_diff(snapshot, snapshot) == []
+
+    target = json.loads(json.dumps(snapshot))
+    tables = {table["name"]: table for table in target["tables"]}
+    target["tables"].remove(tables["newmodel"])
+    tables["config"]["columns"] = [
+        column for column in tables["config"]["columns"] if column["name"] != "label"
+    ]
+    tables["config"]["columns"][1]["null"] = True
+    tables["config"]["foreign_keys"][0]["on_delete"] = "SET NULL"
+    tables["product"]["indexes"].append(
+        {"name": "idx_product_pic_body", "columns": ["pic", "body"]}
+    )
+    assert await command.snapshot_diff(snapshot, target) == [
+        "- table newmodel",
+        "- column config.label",
+        "~ column config.key: null False -> True",
+        "- foreign key config.user_id -> user.id on delete CASCADE",
+        "+ foreign key config.user_id -> user.id on delete SET NULL",
+        "+ index product(pic, body)",
+    ]
+    assert (await command.snapshot_diff(target))[:2] == [
+        "+ table newmodel",
+        "+ column config.label",
+    ]
+
+    with pytest.raises(SnapshotError):
+        await command.snapshot_diff({**snapshot, "version": 0})
@@ -1,26 +1,34 @@
 from __future__ import annotations
 
+import copy
+import json
 from pathlib import Path
 
 import pytest
 import tortoise
 from pytest_mock import MockerFixture
+from tortoise import Tortoise
 from tortoise.indexes import Index
 
+from aerich.coder import JsonEncoder
+from aerich.ddl import STATEMENT_SEPARATOR
 from aerich.ddl.mysql import MysqlDDL
 from aerich.ddl.postgres import PostgresDDL
 from aerich.ddl.sqlite import SqliteDDL
-from aerich.exceptions import NotSupportError
+from aerich.exceptions import SnapshotError
 from aerich.migrate import MIGRATE_TEMPLATE, Migrate
+from aerich.operations import AddColumn, AddIndex, CreateTable, DropColumn, DropFK, DropIndex
 from aerich.utils import get_models_describe
+from conftest import tortoise_orm
 from tests.indexes import CustomIndex
+from tests.models import Category, Config, Email, User
 
 
 def describe_index(idx: Index) -> Index | dict:
     # tortoise-orm>=0.24 changes Index desribe to be dict
     if tortoise.__version__ < "0.24":
         return idx
-    return idx.describe()  # type:ignore
+    return idx.describe()  # type: ignore
 
 
 # tortoise-orm>=0.21 changes IntField constraints
@@ -948,17 +956,9 @@ def test_migrate(mocker: MockerFixture):
 
     models_describe = get_models_describe("models")
     Migrate.app = "models"
-    if isinstance(Migrate.ddl, SqliteDDL):
-        with pytest.raises(NotSupportError):
-            Migrate.diff_models(old_models_describe, models_describe)
-        Migrate.upgrade_operators.clear()
-        with pytest.raises(NotSupportError):
-            Migrate.diff_models(models_describe, old_models_describe, False)
-        Migrate.downgrade_operators.clear()
-    else:
-        Migrate.diff_models(old_models_describe, models_describe)
-        Migrate.diff_models(models_describe, old_models_describe, False)
-        Migrate._merge_operators()
+    Migrate.diff_models(old_models_describe, models_describe)
+    Migrate.diff_models(models_describe, old_models_describe, False)
+    Migrate._merge_operators()
     if isinstance(Migrate.ddl, MysqlDDL):
         expected_upgrade_operators = {
             "ALTER TABLE `category` MODIFY COLUMN `name` VARCHAR(200)",
@@ -1138,8 +1138,78 @@ def test_migrate(mocker: MockerFixture):
         assert not downgrade_less_than_expected
 
     elif isinstance(Migrate.ddl, SqliteDDL):
-        assert Migrate.upgrade_operators == []
-        assert Migrate.downgrade_operators == []
+        # tables that can't be altered are rebuilt
+        rebuilt_tables = ["category", "config", "email", "product", "user"]
+        upgrade_rebuilds = [i for i in Migrate.upgrade_operators if i.startswith("PRAGMA")]
+        assert [i.split(STATEMENT_SEPARATOR)[1].split("\n")[0] for i in upgrade_rebuilds] == [
+            f'CREATE TABLE "_aerich_tmp_{table}" (' for table in rebuilt_tables
+        ]
+        assert set(Migrate.upgrade_operators) - set(upgrade_rebuilds) == {
+            'DROP TABLE IF EXISTS "config_category"',
+            'CREATE TABLE IF NOT EXISTS "newmodel" (\n    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,\n    "name" VARCHAR(50) NOT NULL\n)',
+            'CREATE TABLE "config_category_map" (\n    "category_id" INT NOT NULL REFERENCES "category" ("id") ON DELETE CASCADE,\n    "config_id" INT NOT NULL REFERENCES "config" ("id") ON DELETE CASCADE\n)',
+            'CREATE TABLE "email_user" (\n    "email_id" INT NOT NULL REFERENCES "email" ("email_id") ON DELETE CASCADE,\n    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE\n)',
+            'CREATE TABLE "product_user" (\n    "product_id" INT NOT NULL REFERENCES "product" ("id") ON DELETE CASCADE,\n    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE\n)',
+        }
+        category, config, email, product, _ = upgrade_rebuilds
+        assert category.split(STATEMENT_SEPARATOR)[2:] == [
+            'INSERT INTO "_aerich_tmp_category" ("id", "slug", "name", "title", "created_at", "owner_id") SELECT "id", "slug", "name", "title", "created_at", "user_id" FROM "category"',
+            'DROP TABLE IF EXISTS "category"',
+            'ALTER TABLE "_aerich_tmp_category" RENAME TO "category"',
+            'CREATE INDEX "idx_category_slug_e9bcff" ON "category" ("slug")',
+            "PRAGMA foreign_keys=ON",
+        ]
+        assert (
+            '"owner_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE /* User */'
+            in category
+        )
+        assert 'ALTER TABLE "_aerich_tmp_config" RENAME TO "config"' in config
+        assert 'SELECT "id", "email", "is_primary" FROM "email"' in email
+        assert 'CONSTRAINT "uid_product_name_869427" UNIQUE ("name", "type_db_alias")' in product
+
+        downgrade_rebuilds = [i for i in Migrate.downgrade_operators if i.startswith("PRAGMA")]
+        assert len(downgrade_rebuilds) == len(rebuilt_tables)
+        assert set(Migrate.downgrade_operators) - set(downgrade_rebuilds) == {
+            'DROP TABLE IF EXISTS "product_user"',
+            'DROP TABLE IF EXISTS "email_user"',
+            'DROP TABLE IF EXISTS "config_category_map"',
+            'DROP TABLE IF EXISTS "newmodel"',
+            'CREATE TABLE "config_category" (\n    "config_id" INT NOT NULL REFERENCES "config" ("id") ON DELETE CASCADE,\n    "category_id" INT NOT NULL REFERENCES "category" ("id") ON DELETE CASCADE\n)',
+        }
+        assert 'ALTER TABLE "_aerich_tmp_configs" RENAME TO "configs"' in downgrade_rebuilds[1]
+
+
+def test_sort_operations():
+    category_owner = Category.describe(False)["fk_fields"][0]
+    operations = [
+        AddIndex(Email, ["email"]),
+        DropFK(Category, category_owner, User.describe(False)),
+        CreateTable(Email),
+        DropColumn(User, "avatar"),
+        CreateTable(Config),
+        DropIndex(User, ["username"], True),
+        CreateTable(User),
+        AddColumn(User, User._meta.fields_map["intro"].describe(False)),
+    ]
+    assert Migrate._sort_operations(operations) == [
+        operations[5],
+        operations[1],
+        # email refers to config, config refers to user
+        operations[6],
+        operations[3],
+        operations[4],
+        operations[2],
+        operations[7],
+        operations[0],
+    ]
+
+
+def test_render_operations():
+    operations = [DropColumn(User, "avatar"), DropColumn(User, "avatar"), DropColumn(User, "age")]
+    assert Migrate.ddl.render_operations(operations) == [
+        operations[0].render(Migrate.ddl),
+        operations[2].render(Migrate.ddl),
+    ]
 
 
 def test_sort_all_version_files(mocker):
@@ -1197,3 +1267,58 @@ async def test_empty_migration(mocker, tmp_path: Path) -> None:
 
     f = tmp_path / migration_file
     assert f.read_text() == expected_content
+
+
+async def test_offline_migration(mocker: MockerFixture, tmp_path: Path) -> None:
+    mocker.patch.object(Migrate, "migrate_location", tmp_path, create=True)
+    mocker.patch.object(Migrate, "app", "models", create=True)
+    mocker.patch.object(Migrate, "offline", True)
+    mocker.patch.object(Migrate, "_last_version_content")
+    get_last_version = mocker.patch.object(Migrate, "get_last_version")
+    version_file = tmp_path / "0_20250101000000_init.py"
+    version_file.write_text(MIGRATE_TEMPLATE.format(upgrade_sql="", downgrade_sql=""))
+    with pytest.raises(SnapshotError):
+        Migrate.load_snapshot()
+
+    models_describe = get_models_describe("models")
+    Migrate.write_snapshot(version_file, models_describe, "3.45.1")
+    snapshot = Migrate.load_snapshot()
+    assert snapshot["server_version"] == "3.45.1"
+    Migrate._last_version_content = snapshot["models"]
+    assert Migrate._last_version_content == json.loads(json.dumps(models_describe, cls=JsonEncoder))
+    assert await Migrate.migrate("update", False) == ""
+
+    last_version = copy.deepcopy(models_describe)
+    config = last_version["models.Config"]
+    config["data_fields"] = [f for f in config["data_fields"] if f["name"] != "label"]
+    Migrate._last_version_content = last_version
+    migration_file = await Migrate.migrate("update", False)
+    assert migration_file.startswith("1_") and migration_file.endswith("_update.py")
+    assert len(Migrate.upgrade_operators) == 1 and "label" in Migrate.upgrade_operators[0]
+    # the next migration is diffed with the models of this one
+    snapshot = Migrate.load_snapshot()
+    assert snapshot["server_version"] == Migrate.ddl.capabilities.version
+    assert "label" in [f["name"] for f in snapshot["models"]["models.Config"]["data_fields"]]
+    assert not get_last_version.called
+
+
+async def test_offline_init(mocker: MockerFixture, tmp_path: Path) -> None:
+    # keep the state set by init
+    for name in ("dialect", "ddl_class", "ddl", "offline", "app", "migrate_location"):
+        mocker.patch.object(Migrate, name, getattr(Migrate, name, None), create=True)
+    mocker.patch.object(Migrate, "_last_version_content")
+    # reuse the connections, reinitializing them would lose the in-memory database
+    mocker.patch.object(Tortoise, "init")
+    conn = Tortoise.get_connection("default")
+    for method in ("execute_query", "execute_query_dict", "execute_script", "execute_insert"):
+        mocker.patch.object(conn, method, side_effect=AssertionError("queried when offline"))
+    tmp_path.joinpath("models").mkdir()
+    version_file = tmp_path / "models" / "0_20250101000000_init.py"
+    version_file.write_text(MIGRATE_TEMPLATE.format(upgrade_sql="", downgrade_sql=""))
+    models_describe = get_models_describe("models")
+    Migrate.write_snapshot(version_file, models_describe, "3.45.1")
+
+    await Migrate.init(tortoise_orm, "models", str(tmp_path), offline=True)
+    assert Migrate.offline
+    assert Migrate.ddl.capabilities.version == "3.45.1"
+    assert Migrate._last_version_content == json.loads(json.dumps(models_describe, cls=JsonEncoder))
@@ -0,0 +1,39 @@
+import pstats
+from typing import Any, cast
+
+from aerich import profiler
+from aerich.profiler import Profiler, phase
+
+
+def test_phase() -> None:
+    with phase("diff"):
+        pass
+    assert profiler._profiler is None
+
+    p = Profiler()
+    p.start()
+    for _ in range(2):
+        with phase("diff"):
+            pass
+    with phase("write"):
+        pass
+    p.stop()
+    assert profiler._profiler is None
+    assert list(p.phases) == ["diff", "write"]
+    assert p.calls == {"diff": 2, "write": 1}
+    assert p.total >= sum(p.phases.values())
+    lines = p.report().splitlines()
+    assert [line.split()[0] for line in lines] == ["phase", "diff", "write", "other", "total"]
+    assert lines[1].split()[1] == "2"
+
+
+def test_cprofile_output(tmp_path) -> None:
+    output = str(tmp_path / "aerich.prof")
+    p = Profiler(output)
+    p.start()
+    with phase("describe"):
+        sorted(range(1000), key=str)
+    p.stop()
+    # total_calls isn't in the stubs, get_stats_profile() is only in python3.9+
+    assert cast(Any, pstats.Stats(output)).total_calls > 0
+    assert "hot spots" in p.report()